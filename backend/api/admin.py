@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Professor, Aluno, Turma, Matricula, Presenca
+from .models import Professor, Aluno, Turma, Matricula, Presenca, ResumoDiarioPresenca, TarefaRelatorio
 
 @admin.register(Professor)
 class ProfessorAdmin(admin.ModelAdmin):
@@ -29,7 +29,7 @@ class TurmaAdmin(admin.ModelAdmin):
 
 @admin.register(Matricula)
 class MatriculaAdmin(admin.ModelAdmin):
-    list_display = ('aluno', 'turma', 'data_matricula', 'presenca_acumulada')
+    list_display = ('aluno', 'turma', 'data_matricula', 'presenca_acumulada', 'ausencia_acumulada', 'justificado_acumulado', 'total_aulas')
     list_filter = ('turma', 'data_matricula')
     search_fields = ('aluno__nome', 'aluno__matricula', 'turma__nome')
     ordering = ('-data_matricula',)
@@ -48,4 +48,17 @@ class PresencaAdmin(admin.ModelAdmin):
     
     def turma_nome(self, obj):
         return obj.matricula.turma.nome
-    turma_nome.short_description = "Turma"
\ No newline at end of file
+    turma_nome.short_description = "Turma"
+
+@admin.register(ResumoDiarioPresenca)
+class ResumoDiarioPresencaAdmin(admin.ModelAdmin):
+    list_display = ('turma', 'data', 'presentes', 'ausentes', 'justificados')
+    list_filter = ('data', 'turma')
+    ordering = ('-data', 'turma')
+
+@admin.register(TarefaRelatorio)
+class TarefaRelatorioAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'solicitante', 'worker', 'tentativas', 'criado_em', 'concluido_em')
+    list_filter = ('status', 'criado_em')
+    readonly_fields = ('worker', 'tentativas', 'criado_em', 'iniciado_em', 'concluido_em')
+    ordering = ('-criado_em',)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+    
+    def ready(self):
+        # Registrar os sinais do app
+        from . import signals  # noqa: F401
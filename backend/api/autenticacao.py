@@ -0,0 +1,132 @@
+"""
+Autenticação por token com cache.
+
+O TokenAuthentication do DRF consulta Token + User a cada requisição. Aqui o
+usuário do token (já com os perfis de professor/aluno, usados pelo Principal)
+fica em cache por até API_TOKEN_CACHE_SEGUNDOS: requisições autenticadas
+normalmente não fazem nenhuma consulta de autenticação.
+
+Por padrão o cache é local ao processo, limitado a API_TOKEN_CACHE_MAXIMO
+tokens. Com vários processos, o logout só limpa o cache do processo que o
+atendeu e os demais aceitam o token até expirar; para invalidação imediata
+em todos, aponte API_TOKEN_CACHE_ALIAS para um cache compartilhado (ex.: Redis)
+de settings.CACHES. Logout, exclusão de token e alterações no usuário ou nos
+seus perfis invalidam o cache (sinais em api/signals.py).
+"""
+
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+def tempo_maximo():
+    """Segundos que um token fica em cache; 0 desativa o cache."""
+    return getattr(settings, 'API_TOKEN_CACHE_SEGUNDOS', 60)
+
+
+class CacheLocalTokens:
+    """
+    Cache em memória com tempo de expiração e número máximo de itens (LRU).
+    Guarda os valores serializados: cada leitura devolve uma cópia própria.
+    """
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.itens = OrderedDict()
+        self.trava = threading.Lock()
+
+    def get(self, chave):
+        with self.trava:
+            item = self.itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em <= time.monotonic():
+                del self.itens[chave]
+                return None
+            self.itens.move_to_end(chave)
+        return pickle.loads(valor)
+
+    def set(self, chave, valor, timeout):
+        valor = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        with self.trava:
+            self.itens[chave] = (time.monotonic() + timeout, valor)
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.maximo:
+                self.itens.popitem(last=False)
+
+    def delete_many(self, chaves):
+        with self.trava:
+            for chave in chaves:
+                self.itens.pop(chave, None)
+
+    def clear(self):
+        with self.trava:
+            self.itens.clear()
+
+
+_cache_local = None
+
+
+def cache_de_tokens():
+    """Cache compartilhado (API_TOKEN_CACHE_ALIAS) ou o cache local do processo."""
+    global _cache_local
+    alias = getattr(settings, 'API_TOKEN_CACHE_ALIAS', None)
+    if alias:
+        return caches[alias]
+    if _cache_local is None:
+        _cache_local = CacheLocalTokens(getattr(settings, 'API_TOKEN_CACHE_MAXIMO', 1000))
+    return _cache_local
+
+
+def chave_token(key):
+    """A chave do token não vai em claro para o cache (ex.: um Redis compartilhado)."""
+    return 'api:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def invalidar_tokens(keys):
+    """Remove os tokens do cache agora e de novo após o commit."""
+    chaves = [chave_token(key) for key in keys]
+    if not chaves:
+        return
+    cache = cache_de_tokens()
+    cache.delete_many(chaves)
+    transaction.on_commit(lambda: cache.delete_many(chaves))
+
+
+class TokenCacheAuthentication(TokenAuthentication):
+    """TokenAuthentication que consulta o banco só quando o token não está em cache."""
+
+    def authenticate_credentials(self, key):
+        timeout = tempo_maximo()
+        if not timeout:
+            return self.buscar_token(key)
+
+        cache = cache_de_tokens()
+        token = cache.get(chave_token(key))
+        if token is None:
+            token = self.buscar_token(key)[1]
+            cache.set(chave_token(key), token, timeout)
+        return (token.user, token)
+
+    def buscar_token(self, key):
+        """Token, usuário e perfis em uma consulta; mesmas validações do DRF."""
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user__professor', 'user__aluno').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
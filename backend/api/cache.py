@@ -0,0 +1,148 @@
+"""
+Cache de respostas das rotas públicas e das médias de presença por turma.
+
+As respostas ficam no cache por view e parâmetros de consulta, por no máximo
+API_CACHE_PUBLICO_SEGUNDOS. Qualquer escrita nos modelos (sinais em
+api/signals.py) troca a geração do cache, invalidando todas as respostas de uma vez.
+
+As médias por turma são compartilhadas entre os dashboards dos alunos e
+descartadas turma a turma sempre que o resumo diário da turma muda.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+
+CHAVE_GERACAO = 'api:publico:geracao'
+
+# Respostas gravadas no cache por este processo (ver invalidar_cache_publico)
+_gravacoes = 0
+
+
+def tempo_maximo():
+    """Idade máxima (segundos) de uma resposta em cache; 0 desativa o cache."""
+    return getattr(settings, 'API_CACHE_PUBLICO_SEGUNDOS', 60)
+
+
+def geracao_atual():
+    geracao = cache.get(CHAVE_GERACAO)
+    if geracao is None:
+        cache.add(CHAVE_GERACAO, 1, timeout=None)
+        geracao = cache.get(CHAVE_GERACAO, 1)
+    return geracao
+
+
+def _trocar_geracao():
+    try:
+        cache.incr(CHAVE_GERACAO)
+    except ValueError:
+        # Chave ausente (cache reiniciado ou expurgado)
+        cache.add(CHAVE_GERACAO, 1, timeout=None)
+
+
+def invalidar_cache_publico():
+    """
+    Invalida todas as respostas públicas em cache.
+
+    Troca a geração agora e de novo após o commit: uma leitura feita durante
+    a transação não deixa uma resposta antiga no cache. Em uma transação a
+    troca após o commit é agendada uma só vez, e a troca imediata só se repete
+    se alguma resposta foi gravada no cache desde a anterior: remover muitos
+    objetos em cascata (um sinal por linha) invalida o cache uma vez.
+    """
+    conexao = transaction.get_connection()
+    pendente = conexao.in_atomic_block and _troca_pendente(conexao)
+    if pendente and getattr(conexao, 'cache_publico_gravacoes', None) == _gravacoes:
+        return
+    _trocar_geracao()
+    conexao.cache_publico_gravacoes = _gravacoes
+    if not pendente:
+        transaction.on_commit(_trocar_geracao)
+
+
+def _troca_pendente(conexao):
+    """Se a transação atual já tem a troca da geração agendada para o commit."""
+    # Um rollback (da transação ou do savepoint) descarta o agendamento da lista
+    return any(funcao is _trocar_geracao for _, funcao, _ in conexao.run_on_commit)
+
+
+def chave_resposta(nome, request):
+    """Chave da resposta: geração, view e parâmetros de consulta ordenados."""
+    parametros = sorted(
+        (chave, valor)
+        for chave, valores in request.query_params.lists()
+        for valor in valores
+    )
+    resumo = hashlib.md5(repr(parametros).encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'api:publico:{geracao_atual()}:{nome}:{resumo}'
+
+
+def cache_publico(metodo):
+    """
+    Decorator para o GET de views públicas (AllowAny).
+
+    A resposta não pode depender do usuário: apenas os dados (response.data)
+    vão para o cache, e o renderer é escolhido a cada requisição.
+    """
+    @wraps(metodo)
+    def wrapper(self, request, *args, **kwargs):
+        timeout = tempo_maximo()
+        if not timeout:
+            return metodo(self, request, *args, **kwargs)
+
+        chave = chave_resposta(type(self).__name__, request)
+        dados = cache.get(chave)
+        if dados is not None:
+            return Response(dados)
+
+        response = metodo(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            global _gravacoes
+            cache.set(chave, response.data, timeout)
+            _gravacoes += 1
+        return response
+
+    return wrapper
+
+
+# ========== MÉDIAS POR TURMA ==========
+
+# Rede de segurança para escritas que não passam pelo resumo diário
+TEMPO_MEDIA_TURMA = 60 * 60
+
+
+def chave_media_turma(turma_id):
+    return f'api:media-turma:{turma_id}'
+
+
+def medias_turmas(turma_ids, calcular):
+    """
+    Média de cada turma, lida do cache.
+    `calcular(ids)` recebe só as turmas ausentes do cache e devolve {turma_id: média}.
+    """
+    chaves = {chave_media_turma(turma_id): turma_id for turma_id in turma_ids}
+    medias = {chaves[chave]: media for chave, media in cache.get_many(list(chaves)).items()}
+
+    faltando = [turma_id for turma_id in chaves.values() if turma_id not in medias]
+    if faltando:
+        calculadas = calcular(faltando)
+        cache.set_many(
+            {chave_media_turma(turma_id): media for turma_id, media in calculadas.items()},
+            TEMPO_MEDIA_TURMA
+        )
+        medias.update(calculadas)
+    return medias
+
+
+def invalidar_medias_turmas(turma_ids):
+    """Descarta as médias das turmas agora e de novo após o commit (como invalidar_cache_publico)."""
+    chaves = [chave_media_turma(turma_id) for turma_id in turma_ids]
+    if not chaves:
+        return
+    cache.delete_many(chaves)
+    transaction.on_commit(lambda: cache.delete_many(chaves))
@@ -0,0 +1,136 @@
+"""
+Registro de chamada em lote.
+Resolve matrículas e grava as presenças de uma turma com um número fixo de queries.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .cache import invalidar_cache_publico
+from .models import Aluno, Turma, Matricula, Presenca, ResumoDiarioPresenca
+
+
+STATUS_VALIDOS = {valor for valor, _ in Presenca.STATUS_CHOICES}
+
+
+def _mensagem_erro(erro):
+    """Extrai a mensagem legível de uma exceção de validação."""
+    if isinstance(erro, ValidationError):
+        return ' '.join(erro.messages)
+    return str(erro)
+
+
+def registrar_chamada(turma, data_aula, registros):
+    """
+    Marca presença para vários alunos de uma turma em uma única transação.
+
+    Retorna a lista de resultados por aluno, na ordem dos registros recebidos,
+    no mesmo formato usado por PresencaViewSet.marcar_presenca.
+    """
+    try:
+        data_aula = Presenca._meta.get_field('data').to_python(data_aula)
+    except ValidationError as e:
+        return [
+            {'aluno_id': registro.get('aluno_id'), 'status': 'erro', 'mensagem': _mensagem_erro(e)}
+            for registro in registros
+        ]
+
+    # Normalizar os registros, guardando o erro de cada aluno inválido
+    itens = []
+    for registro in registros:
+        aluno_id = registro.get('aluno_id')
+        item = {
+            'aluno_id': aluno_id,
+            'status': registro.get('status', 'Presente'),
+            'observacao': registro.get('observacao', '') or '',
+            'erro': None,
+        }
+        try:
+            item['aluno_pk'] = Aluno._meta.pk.get_prep_value(aluno_id)
+        except (TypeError, ValueError) as e:
+            item['erro'] = str(e)
+        else:
+            if item['status'] not in STATUS_VALIDOS:
+                item['erro'] = f"Status inválido: {item['status']}"
+        itens.append(item)
+
+    alunos_ids = {item['aluno_pk'] for item in itens if item['erro'] is None}
+
+    with transaction.atomic():
+        # 1 query: matrículas da turma para os alunos informados
+        matriculas = dict(
+            Matricula.objects.filter(turma=turma, aluno_id__in=alunos_ids)
+            .values_list('aluno_id', 'id')
+        )
+
+        for item in itens:
+            if item['erro'] is None and item['aluno_pk'] not in matriculas:
+                item['erro'] = 'Aluno não matriculado nesta turma'
+
+        # O último registro de um mesmo aluno prevalece, como no update_or_create
+        por_matricula = {}
+        for item in itens:
+            if item['erro'] is None:
+                por_matricula[matriculas[item['aluno_pk']]] = item
+
+        # 1 query: presenças já existentes nesta data
+        existentes = dict(
+            Presenca.objects.filter(matricula_id__in=por_matricula, data=data_aula)
+            .values_list('matricula_id', 'id')
+        )
+
+        # 1 query: upsert de todas as presenças pela chave (matricula, data)
+        presencas = [
+            Presenca(
+                matricula_id=matricula_id,
+                data=data_aula,
+                status=item['status'],
+                observacao=item['observacao']
+            )
+            for matricula_id, item in por_matricula.items()
+        ]
+        if presencas:
+            Presenca.objects.bulk_create(
+                presencas,
+                update_conflicts=True,
+                unique_fields=['matricula', 'data'],
+                update_fields=['status', 'observacao'],
+            )
+
+        ids = {presenca.matricula_id: presenca.pk for presenca in presencas}
+        if None in ids.values():
+            # Backends sem RETURNING no upsert: buscar os ids gravados
+            ids.update(
+                Presenca.objects.filter(matricula_id__in=por_matricula, data=data_aula)
+                .values_list('matricula_id', 'id')
+            )
+
+        # Contadores recalculados uma vez por matrícula afetada e resumo do dia da turma
+        if por_matricula:
+            Matricula.recalcular_contadores(list(por_matricula))
+            ResumoDiarioPresenca.recalcular(turmas=[turma.pk], datas=[data_aula])
+            Turma.incrementar_versao([turma.pk])
+            # bulk_create não dispara os sinais de post_save
+            invalidar_cache_publico()
+
+    resultados = []
+    vistos = set()
+    for item in itens:
+        if item['erro'] is not None:
+            resultados.append({
+                'aluno_id': item['aluno_id'],
+                'status': 'erro',
+                'mensagem': item['erro']
+            })
+            continue
+
+        matricula_id = matriculas[item['aluno_pk']]
+        resultados.append({
+            'aluno_id': item['aluno_id'],
+            'status': 'sucesso',
+            'presenca_id': ids[matricula_id],
+            'criado': matricula_id not in existentes and matricula_id not in vistos
+        })
+        vistos.add(matricula_id)
+
+    return resultados
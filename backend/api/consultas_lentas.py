@@ -0,0 +1,238 @@
+"""
+Captura de consultas lentas.
+
+Com API_CONSULTAS_LENTAS_MS > 0, toda consulta que passar desse tempo entra em
+um buffer circular em memória (as API_CONSULTAS_LENTAS_MAXIMO mais recentes)
+com:
+
+- o SQL e a sua impressão digital (literais trocados por "?" e listas IN por "(...)"), que
+  agrupa as execuções da mesma consulta com parâmetros diferentes;
+- uma impressão dos parâmetros (hash; os valores não ficam guardados);
+- a duração, a view/ação que a originou e o trecho do código do projeto que
+  a executou (ex.: api/views_analystics.py:512 em get).
+
+O buffer é de cada processo: com vários workers, cada um mostra as suas.
+GET /api/diagnostico/consultas-lentas/ (administradores) e o comando
+consultas_lentas mostram as impressões digitais ordenadas pelo tempo total.
+"""
+
+import hashlib
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from . import perfil
+from .metricas import rotulos_view
+
+
+# View da requisição em andamento: um dict preenchido em process_view e
+# compartilhado com as threads de api/paralelo.py
+_view_atual = ContextVar('view_atual', default=None)
+
+_buffer = deque(maxlen=500)
+_trava = threading.Lock()
+
+# Frames que não interessam na origem de uma consulta: este módulo, os outros
+# execute_wrappers do projeto, Django e DRF
+_INSTRUMENTACAO = {str(Path(__file__).resolve()), str(Path(perfil.__file__).resolve())}
+_FORA_DO_PROJETO = ('site-packages', 'dist-packages', '/django/', '/rest_framework/')
+
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_LISTAS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_ESPACOS = re.compile(r'\s+')
+
+
+def limite_ms():
+    """Duração (ms) a partir da qual a consulta é capturada; 0 desativa."""
+    return getattr(settings, 'API_CONSULTAS_LENTAS_MS', 0)
+
+
+def capacidade():
+    return getattr(settings, 'API_CONSULTAS_LENTAS_MAXIMO', 500)
+
+
+def impressao_digital(sql):
+    """SQL normalizado: mesma consulta com outros valores dá a mesma impressão."""
+    sql = _LITERAIS.sub('?', sql)
+    sql = _LISTAS.sub('IN (...)', sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+def impressao_parametros(params):
+    if params is None:
+        return None
+    return hashlib.sha1(repr(params).encode('utf-8', 'replace')).hexdigest()[:12]
+
+
+def pilha_do_projeto(limite=5):
+    """Frames do código do projeto, do mais interno ao mais externo."""
+    base = str(settings.BASE_DIR)
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        if (
+            frame.filename in _INSTRUMENTACAO
+            or not frame.filename.startswith(base)
+            or any(trecho in frame.filename for trecho in _FORA_DO_PROJETO)
+        ):
+            continue
+        caminho = Path(frame.filename).relative_to(base).as_posix()
+        frames.append(f'{caminho}:{frame.lineno} em {frame.name}')
+        if len(frames) == limite:
+            break
+    return frames
+
+
+# ========== CAPTURA ==========
+
+def registrar(sql, params, duracao, alias):
+    pilha = pilha_do_projeto()
+    visao = _view_atual.get()
+    consulta = {
+        'momento': timezone.now().isoformat(),
+        'banco': alias,
+        'duracao_ms': round(duracao * 1000, 2),
+        'sql': sql if len(sql) <= 2000 else sql[:2000] + '…',
+        'impressao': impressao_digital(sql),
+        'parametros': impressao_parametros(params),
+        'view': visao['view'] if visao else None,
+        'origem': pilha[0] if pilha else None,
+        'pilha': pilha,
+    }
+    with _trava:
+        if _buffer.maxlen != capacidade():
+            _trocar_buffer(capacidade())
+        _buffer.append(consulta)
+
+
+def _trocar_buffer(tamanho):
+    global _buffer
+    _buffer = deque(_buffer, maxlen=tamanho)
+
+
+def consultas_capturadas():
+    with _trava:
+        return list(_buffer)
+
+
+def limpar():
+    with _trava:
+        _buffer.clear()
+
+
+def _capturar(conexao):
+    """execute_wrapper de uma conexão: mede e guarda as consultas acima do limite."""
+    def capturar(execute, sql, params, many, context):
+        limite = limite_ms()
+        if limite <= 0:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            if duracao * 1000 >= limite:
+                registrar(sql, params, duracao, conexao.alias)
+
+    capturar.consultas_lentas = True
+    return capturar
+
+
+def _instalar_em(conexao):
+    if not any(getattr(wrapper, 'consultas_lentas', False) for wrapper in conexao.execute_wrappers):
+        conexao.execute_wrappers.append(_capturar(conexao))
+
+
+def _conexao_criada(sender, connection, **kwargs):
+    _instalar_em(connection)
+
+
+def instalar_captura():
+    """Captura nas conexões novas e nas já abertas nesta thread."""
+    connection_created.connect(_conexao_criada, dispatch_uid='api-consultas-lentas')
+    for conexao in connections.all(initialized_only=True):
+        _instalar_em(conexao)
+
+
+class ConsultasLentasMiddleware:
+    """Instala a captura e identifica a view de cada requisição."""
+
+    def __init__(self, get_response):
+        if limite_ms() <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instalar_captura()
+
+    def __call__(self, request):
+        # Conexões abertas antes do middleware (ex.: a do processo de testes)
+        for conexao in connections.all(initialized_only=True):
+            _instalar_em(conexao)
+        token = _view_atual.set({'view': None})
+        try:
+            return self.get_response(request)
+        finally:
+            _view_atual.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view, acao = rotulos_view(view_func, request.method)
+        _view_atual.get()['view'] = f'{view}.{acao}'
+
+
+# ========== AGREGAÇÃO ==========
+
+def agregar(consultas):
+    """Uma linha por impressão digital, da maior para a menor soma de tempo."""
+    grupos = {}
+    for consulta in consultas:
+        grupo = grupos.setdefault(consulta['impressao'], {
+            'impressao': consulta['impressao'],
+            'execucoes': 0,
+            'total_ms': 0.0,
+            'maximo_ms': 0.0,
+            'parametros_distintos': set(),
+            'views': set(),
+            'origens': set(),
+            'exemplo': consulta['sql'],
+        })
+        grupo['execucoes'] += 1
+        grupo['total_ms'] += consulta['duracao_ms']
+        if consulta['duracao_ms'] > grupo['maximo_ms']:
+            grupo['maximo_ms'] = consulta['duracao_ms']
+            grupo['exemplo'] = consulta['sql']
+        grupo['parametros_distintos'].add(consulta['parametros'])
+        if consulta['view']:
+            grupo['views'].add(consulta['view'])
+        if consulta['origem']:
+            grupo['origens'].add(consulta['origem'])
+
+    linhas = []
+    for grupo in grupos.values():
+        linhas.append({
+            **grupo,
+            'total_ms': round(grupo['total_ms'], 2),
+            'media_ms': round(grupo['total_ms'] / grupo['execucoes'], 2),
+            'parametros_distintos': len(grupo['parametros_distintos']),
+            'views': sorted(grupo['views']),
+            'origens': sorted(grupo['origens']),
+        })
+    return sorted(linhas, key=lambda linha: linha['total_ms'], reverse=True)
+
+
+def resumo():
+    """Estado do buffer e as impressões agregadas (resposta do endpoint)."""
+    consultas = consultas_capturadas()
+    return {
+        'limite_ms': limite_ms(),
+        'capacidade': capacidade(),
+        'capturadas': len(consultas),
+        'impressoes': agregar(consultas),
+    }
@@ -0,0 +1,221 @@
+"""
+Gerador determinístico de dados sintéticos para testes de carga e análises.
+Usa bulk_create em lotes (sem passar por Presenca.save) e reconstrói os
+agregados derivados ao final, em poucas queries.
+"""
+
+import random
+from datetime import date, timedelta
+
+from django.db import connections, transaction
+
+from .cache import invalidar_cache_publico
+from .models import Professor, Aluno, Turma, Matricula, Presenca, ResumoDiarioPresenca
+
+
+# Escalas pré-definidas do conjunto de dados
+ESCALAS = {
+    'small': {'professores': 5, 'alunos': 200, 'turmas': 10, 'alunos_por_turma': 30, 'dias': 30},
+    'medium': {'professores': 30, 'alunos': 2000, 'turmas': 100, 'alunos_por_turma': 40, 'dias': 60},
+    # ~1,7 milhão de presenças (um semestre de dias úteis)
+    'large': {'professores': 120, 'alunos': 10000, 'turmas': 500, 'alunos_por_turma': 40, 'dias': 120},
+}
+
+DEPARTAMENTOS = ['Matemática', 'Computação', 'Estatística', 'Física', 'Química']
+
+CURSOS = [
+    'Engenharia de Software',
+    'Ciência da Computação',
+    'Matemática',
+    'Estatística',
+    'Física',
+    'Química'
+]
+
+DISCIPLINAS = [
+    ('Cálculo I', 'Introdução ao cálculo'),
+    ('Programação Python', 'Fundamentos de Python'),
+    ('Banco de Dados', 'Modelagem de dados'),
+    ('Estatística', 'Estatística básica'),
+    ('Física I', 'Mecânica clássica'),
+    ('Química Geral', 'Conceitos fundamentais'),
+    ('Álgebra Linear', 'Vetores e matrizes'),
+    ('Estrutura de Dados', 'Algoritmos e estruturas'),
+    ('Redes de Computadores', 'Fundamentos de redes'),
+    ('Inteligência Artificial', 'IA básica')
+]
+
+# (fração dos alunos, chance de presença): 70% boa frequência, 20% média, 10% baixa
+PERFIS_FREQUENCIA = [(0.7, 0.85), (0.2, 0.70), (0.1, 0.40)]
+
+
+def _chance_presenca(rng):
+    sorteio = rng.random()
+    acumulado = 0
+    for fracao, chance in PERFIS_FREQUENCIA:
+        acumulado += fracao
+        if sorteio < acumulado:
+            return chance
+    return PERFIS_FREQUENCIA[-1][1]
+
+
+def _sufixo_email(seed):
+    """Sufixo dos e-mails dos professores e alunos gerados com a seed."""
+    return f'.s{seed}@ifb.edu'
+
+
+def dados_existentes(seed):
+    """Indica se o banco já tem os professores ou alunos gerados com esta seed."""
+    sufixo = _sufixo_email(seed)
+    return (
+        Professor.objects.filter(email__endswith=sufixo).exists()
+        or Aluno.objects.filter(email__endswith=sufixo).exists()
+    )
+
+
+def limpar_dados(seed=None):
+    """
+    Remove os dados gerados com a `seed`: professores e alunos com o e-mail da
+    seed, as turmas desses professores e as matrículas e presenças delas.
+    Dados cadastrados de outra forma ficam intactos (uma turma real com um
+    professor gerado impede a remoção: Turma.professor é PROTECT).
+
+    Sem `seed`, remove TODOS os professores, alunos, turmas, matrículas e
+    presenças do banco.
+    """
+    with transaction.atomic():
+        if seed is not None:
+            sufixo = _sufixo_email(seed)
+            # Presenças e matrículas saem em cascata; os agregados das turmas
+            # que continuam (matrículas de alunos gerados) são recalculados pelos sinais
+            Turma.objects.filter(professor__email__endswith=sufixo).delete()
+            Aluno.objects.filter(email__endswith=sufixo).delete()
+            Professor.objects.filter(email__endswith=sufixo).delete()
+            return
+
+        # DELETE direto: evita carregar as presenças no Collector, e os
+        # agregados são apagados logo em seguida
+        conexao = connections[Presenca.objects.db]
+        with conexao.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {conexao.ops.quote_name(Presenca._meta.db_table)}')
+        ResumoDiarioPresenca.objects.all().delete()
+        Matricula.objects.all().delete()
+        Turma.objects.all().delete()
+        Aluno.objects.all().delete()
+        Professor.objects.all().delete()
+
+
+def gerar_dados_sinteticos(professores, alunos, turmas, alunos_por_turma, dias, seed=42,
+                           data_final=None, tamanho_lote=5000, log=None):
+    """
+    Gera um conjunto de dados completo e reprodutível.
+
+    Mesma `seed` e mesma `data_final` produzem exatamente os mesmos registros.
+    Identificadores únicos (e-mail, matrícula) levam a seed, permitindo
+    gerar vários conjuntos no mesmo banco. Retorna o total criado por modelo.
+    """
+    rng = random.Random(seed)
+    data_final = data_final or date.today()
+    log = log or (lambda mensagem: None)
+
+    with transaction.atomic():
+        lista_professores = Professor.objects.bulk_create([
+            Professor(
+                nome=f'Professor {i + 1}',
+                email=f'professor{i + 1}{_sufixo_email(seed)}',
+                departamento=rng.choice(DEPARTAMENTOS),
+                ativo=rng.random() < 0.95
+            )
+            for i in range(professores)
+        ], batch_size=tamanho_lote)
+        log(f'Professores criados: {len(lista_professores)}')
+
+        lista_alunos = Aluno.objects.bulk_create([
+            Aluno(
+                nome=f'Aluno {i + 1}',
+                matricula=f'{seed}{i + 1:08d}'[-20:],
+                email=f'aluno{i + 1}{_sufixo_email(seed)}',
+                curso=rng.choice(CURSOS),
+                data_nascimento=date(1995 + i % 10, i % 12 + 1, i % 28 + 1),
+                genero=rng.choice(['M', 'F'])
+            )
+            for i in range(alunos)
+        ], batch_size=tamanho_lote)
+        log(f'Alunos criados: {len(lista_alunos)}')
+
+        data_inicio = data_final - timedelta(days=dias)
+        lista_turmas = Turma.objects.bulk_create([
+            Turma(
+                nome=f'{DISCIPLINAS[i % len(DISCIPLINAS)][0]} - T{i + 1}',
+                descricao=DISCIPLINAS[i % len(DISCIPLINAS)][1],
+                professor=rng.choice(lista_professores),
+                data_inicio=data_inicio,
+                data_fim=data_final + timedelta(days=rng.randint(30, 120)),
+                status=rng.choice(['Ativa', 'Ativa', 'Ativa', 'Concluída'])  # 75% ativas
+            )
+            for i in range(turmas)
+        ], batch_size=tamanho_lote)
+        log(f'Turmas criadas: {len(lista_turmas)}')
+
+        por_turma = min(alunos_por_turma, len(lista_alunos))
+        lista_matriculas = Matricula.objects.bulk_create([
+            Matricula(turma=turma, aluno=aluno)
+            for turma in lista_turmas
+            for aluno in rng.sample(lista_alunos, por_turma)
+        ], batch_size=tamanho_lote)
+        log(f'Matrículas criadas: {len(lista_matriculas)}')
+
+        # Representante em metade das turmas (um aluno só representa uma turma)
+        representantes = []
+        ja_representam = set()
+        for indice, turma in enumerate(lista_turmas[::2]):
+            inicio = 2 * indice * por_turma
+            for matricula in lista_matriculas[inicio:inicio + por_turma]:
+                if matricula.aluno_id not in ja_representam:
+                    turma.representante_id = matricula.aluno_id
+                    ja_representam.add(matricula.aluno_id)
+                    representantes.append(turma)
+                    break
+        Turma.objects.bulk_update(representantes, ['representante'], batch_size=tamanho_lote)
+
+        # Presenças em dias úteis, com frequência baseada no perfil do aluno
+        dias_aula = [
+            data_inicio + timedelta(days=i) for i in range(1, dias + 1)
+            if (data_inicio + timedelta(days=i)).weekday() < 5
+        ]
+        perfis = {aluno.id: _chance_presenca(rng) for aluno in lista_alunos}
+        total_presencas = 0
+        lote = []
+        for matricula in lista_matriculas:
+            chance_presenca = perfis[matricula.aluno_id]
+            for data_aula in dias_aula:
+                if rng.random() < chance_presenca:
+                    status_presenca = 'Presente'
+                elif rng.random() < 0.2:  # Pequena chance de justificativa
+                    status_presenca = 'Justificado'
+                else:
+                    status_presenca = 'Ausente'
+                lote.append(Presenca(matricula_id=matricula.id, data=data_aula, status=status_presenca))
+
+            if len(lote) >= tamanho_lote:
+                Presenca.objects.bulk_create(lote, batch_size=tamanho_lote)
+                total_presencas += len(lote)
+                lote = []
+        if lote:
+            Presenca.objects.bulk_create(lote, batch_size=tamanho_lote)
+            total_presencas += len(lote)
+        log(f'Presenças criadas: {total_presencas}')
+
+        # bulk_create não passa por Presenca.save: preencher os agregados em lote
+        Matricula.recalcular_contadores(Matricula.objects.filter(turma__in=lista_turmas).values('pk'))
+        ResumoDiarioPresenca.recalcular(turmas=[turma.pk for turma in lista_turmas])
+        log('Contadores e resumos diários recalculados.')
+        invalidar_cache_publico()
+
+    return {
+        'professores': len(lista_professores),
+        'alunos': len(lista_alunos),
+        'turmas': len(lista_turmas),
+        'matriculas': len(lista_matriculas),
+        'presencas': total_presencas,
+    }
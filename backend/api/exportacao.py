@@ -0,0 +1,86 @@
+"""
+Exportação linha a linha das presenças (CSV e NDJSON).
+
+As linhas vêm de um iterator() em lotes (cursor no servidor no PostgreSQL) e
+são convertidas em texto sob demanda: a memória usada não depende do tamanho
+do período exportado e os primeiros bytes saem antes do fim da consulta.
+"""
+
+import csv
+import json
+
+from .models import Presenca
+
+
+FORMATOS_EXPORTACAO = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# (coluna exportada, campo consultado)
+COLUNAS = [
+    ('aluno', 'matricula__aluno__nome'),
+    ('matricula', 'matricula__aluno__matricula'),
+    ('turma', 'matricula__turma__nome'),
+    ('professor', 'matricula__turma__professor__nome'),
+    ('data', 'data'),
+    ('status', 'status'),
+]
+
+# Linhas buscadas no banco por vez e linhas por bloco de texto enviado
+TAMANHO_LOTE = 2000
+
+
+def linhas_presenca(data_inicio, data_fim, turma_id=None, tamanho_lote=TAMANHO_LOTE):
+    """Tuplas (aluno, matrícula, turma, professor, data, status) do período, em ordem (data, id)."""
+    presencas = Presenca.objects.filter(data__gte=data_inicio, data__lte=data_fim)
+    if turma_id:
+        presencas = presencas.filter(matricula__turma_id=turma_id)
+    return presencas.order_by('data', 'id').values_list(
+        *(campo for _, campo in COLUNAS)
+    ).iterator(chunk_size=tamanho_lote)
+
+
+class _Eco:
+    """Buffer mínimo para csv.writer: devolve a linha em vez de guardá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def _em_blocos(textos, tamanho_lote):
+    """Junta os textos em blocos de `tamanho_lote` linhas para reduzir as escritas."""
+    bloco = []
+    for texto in textos:
+        bloco.append(texto)
+        if len(bloco) >= tamanho_lote:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def _formatar(linha):
+    aluno, matricula, turma, professor, data, situacao = linha
+    return [aluno, matricula, turma, professor, data.isoformat(), situacao]
+
+
+def gerar_csv(linhas, tamanho_lote=TAMANHO_LOTE):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([coluna for coluna, _ in COLUNAS])
+    yield from _em_blocos((escritor.writerow(_formatar(linha)) for linha in linhas), tamanho_lote)
+
+
+def gerar_ndjson(linhas, tamanho_lote=TAMANHO_LOTE):
+    colunas = [coluna for coluna, _ in COLUNAS]
+    yield from _em_blocos(
+        (json.dumps(dict(zip(colunas, _formatar(linha))), ensure_ascii=False) + '\n' for linha in linhas),
+        tamanho_lote
+    )
+
+
+def exportar(formato, linhas, tamanho_lote=TAMANHO_LOTE):
+    """Gerador de blocos de texto no formato pedido ('csv' ou 'ndjson')."""
+    if formato == 'csv':
+        return gerar_csv(linhas, tamanho_lote)
+    return gerar_ndjson(linhas, tamanho_lote)
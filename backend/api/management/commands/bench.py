@@ -0,0 +1,265 @@
+import json
+import statistics
+import subprocess
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import urls as api_urls
+from api.dados_sinteticos import ESCALAS, gerar_dados_sinteticos
+from api.models import Professor, Aluno, Turma, Matricula, Presenca, TarefaRelatorio
+from api.perfil import medir_requisicao
+from api.tests_queries import IGNORADAS, nomes_das_rotas
+
+
+def percentil(valores, p):
+    """Percentil com interpolação linear (p entre 0 e 100)."""
+    ordenados = sorted(valores)
+    if len(ordenados) == 1:
+        return ordenados[0]
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera um conjunto de dados sintético em um banco de teste e mede latência '
+        '(p50/p95/p99), número de queries e tamanho da resposta de cada rota de api/urls.py '
+        '(sem o cache das rotas públicas)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=ESCALAS, default='small', help='Escala pré-definida do conjunto de dados.')
+        parser.add_argument('--alunos', type=int, help='Sobrescreve o número de alunos da escala.')
+        parser.add_argument('--turmas', type=int, help='Sobrescreve o número de turmas da escala.')
+        parser.add_argument('--professores', type=int, help='Sobrescreve o número de professores da escala.')
+        parser.add_argument('--days', type=int, help='Sobrescreve o número de dias de aula com presenças.')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório.')
+        parser.add_argument('--repeat', type=int, default=5, help='Repetições medidas por endpoint.')
+        parser.add_argument('--only', action='append', help='Executa apenas endpoints cujo nome contenha o texto.')
+        parser.add_argument('--json', dest='saida_json', help='Grava os resultados em JSON neste caminho.')
+        parser.add_argument('--compare', help='JSON de uma execução anterior para comparar os resultados.')
+        parser.add_argument('--keepdb', action='store_true', help='Mantém o banco de teste entre execuções.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat deve ser pelo menos 1')
+
+        escala = dict(ESCALAS[options['scale']])
+        for chave, opcao in [('alunos', 'alunos'), ('turmas', 'turmas'), ('professores', 'professores'), ('dias', 'days')]:
+            if options[opcao] is not None:
+                escala[chave] = options[opcao]
+
+        setup_test_environment()
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not Aluno.objects.exists():
+                self.stdout.write(self.style.SUCCESS(f'Gerando dados sintéticos ({options["scale"]}): {escala}'))
+                inicio = time.perf_counter()
+                gerar_dados_sinteticos(seed=options['seed'], **escala)
+                self.stdout.write(self.style.SUCCESS(f'  Dados gerados em {time.perf_counter() - inicio:.1f}s'))
+
+            resultados = self.executar(options)
+            relatorio = {
+                'commit': self.commit_atual(),
+                'escala': options['scale'],
+                'parametros': escala,
+                'dados': {
+                    'professores': Professor.objects.count(),
+                    'alunos': Aluno.objects.count(),
+                    'turmas': Turma.objects.count(),
+                    'matriculas': Matricula.objects.count(),
+                    'presencas': Presenca.objects.count(),
+                },
+                'repeticoes': options['repeat'],
+                'resultados': resultados,
+            }
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        anteriores = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as arquivo:
+                anteriores = {item['endpoint']: item for item in json.load(arquivo)['resultados']}
+
+        self.imprimir_tabela(relatorio, anteriores)
+
+        if options['saida_json']:
+            with open(options['saida_json'], 'w', encoding='utf-8') as arquivo:
+                json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {options["saida_json"]}'))
+
+    # ========== EXECUÇÃO ==========
+
+    def requisicoes(self, admin):
+        """
+        Monta {nome da rota: (método, kwargs da url, payload)} com os dados
+        atuais, e {nome da rota: função} para desfazer uma escrita que não
+        pode se repetir (executada fora da medição).
+        """
+        professor = Professor.objects.annotate(n=Count('turmas')).order_by('-n', 'id').first()
+        aluno = Aluno.objects.annotate(n=Count('matriculas')).order_by('-n', 'id').first()
+        turma = Turma.objects.annotate(n=Count('matriculas')).order_by('-n', 'id').first()
+        matricula = Matricula.objects.filter(turma=turma).order_by('id').first()
+        presenca = Presenca.objects.filter(matricula=matricula).order_by('id').first()
+        nao_matriculado = Aluno.objects.exclude(matriculas__turma=turma).order_by('id').first()
+        tarefa = TarefaRelatorio.objects.create(parametros={'formato': 'csv'}, solicitante=admin)
+        hoje = date.today()
+
+        rotas = {
+            'professor-list': ('get', {}, None),
+            'professor-detail': ('get', {'pk': professor.pk}, None),
+            'professor-turmas': ('get', {'pk': professor.pk}, None),
+            'aluno-list': ('get', {}, None),
+            'aluno-detail': ('get', {'pk': aluno.pk}, None),
+            'aluno-presencas': ('get', {'pk': aluno.pk}, None),
+            'turma-list': ('get', {}, None),
+            'turma-detail': ('get', {'pk': turma.pk}, None),
+            'turma-alunos': ('get', {'pk': turma.pk}, None),
+            'turma-matricular-aluno': ('post', {'pk': turma.pk}, {'aluno_id': nao_matriculado.pk}),
+            'turma-representante': ('get', {'pk': turma.pk}, None),
+            'turma-dashboard': ('get', {'pk': turma.pk}, None),
+            'matricula-list': ('get', {}, None),
+            'matricula-detail': ('get', {'pk': matricula.pk}, None),
+            'presenca-list': ('get', {}, None),
+            'presenca-detail': ('get', {'pk': presenca.pk}, None),
+            'presenca-marcar-presenca': ('post', {}, {
+                'turma_id': turma.pk,
+                'data': hoje.isoformat(),
+                'registros': [
+                    {'aluno_id': aluno_id, 'status': 'Presente'}
+                    for aluno_id in turma.matriculas.values_list('aluno_id', flat=True)
+                ],
+            }),
+            'profile': ('get', {}, None),
+            'turmas-ativas': ('get', {}, None),
+            'professores-publicos': ('get', {}, None),
+            'estatisticas': ('get', {}, None),
+            'analytics-geral': ('get', {}, None),
+            'ranking-faltas': ('get', {}, None),
+            'relatorio-presenca': ('post', {}, {
+                'data_inicio': (hoje - timedelta(days=180)).isoformat(),
+                'data_fim': hoje.isoformat(),
+            }),
+            'relatorio-tarefa': ('get', {'tarefa_id': tarefa.pk}, None),
+            'dashboard-professor-id': ('get', {'professor_id': professor.pk}, None),
+            'dashboard-aluno-id': ('get', {'aluno_id': aluno.pk}, None),
+            'consultas-lentas': ('get', {}, None),
+        }
+        desfazer = {
+            'turma-matricular-aluno': lambda: Matricula.objects.filter(turma=turma, aluno=nao_matriculado).delete(),
+        }
+        return rotas, desfazer
+
+    def endpoints(self, admin):
+        """Lista (nome, método, url, payload, desfazer) de todas as rotas de api/urls.py medidas."""
+        rotas, desfazer = self.requisicoes(admin)
+        # Mesmas rotas do orçamento de queries (api/tests_queries.py)
+        for nome in sorted(nomes_das_rotas(api_urls.urlpatterns) - set(IGNORADAS)):
+            if nome not in rotas:
+                self.stderr.write(self.style.WARNING(f'  {nome}: rota sem requisição em bench.requisicoes(), não medida'))
+                continue
+            metodo, kwargs, payload = rotas[nome]
+            yield nome, metodo, reverse(nome, kwargs=kwargs), payload, desfazer.get(nome)
+
+    def executar(self, options):
+        admin = User.objects.create_superuser('bench-admin', 'bench@bench.edu', 'bench-admin')
+        token = Token.objects.create(user=admin)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        resultados = []
+        # Sem o cache das rotas públicas: cada repetição mede a consulta de verdade
+        with override_settings(API_CACHE_PUBLICO_SEGUNDOS=0):
+            cache.clear()
+            for nome, metodo, url, payload, desfazer in self.endpoints(admin):
+                if options['only'] and not any(filtro in nome for filtro in options['only']):
+                    continue
+                resultados.append(self.medir(client, nome, metodo, url, payload, desfazer, options['repeat']))
+                self.stdout.write(f'  {nome}: {resultados[-1]["p50_ms"]} ms')
+
+        return resultados
+
+    def medir(self, client, nome, metodo, url, payload, desfazer, repeticoes):
+        requisitar = getattr(client, metodo)
+        argumentos = {'format': 'json'} if payload is not None else {}
+        requisitar(url, payload, **argumentos)  # aquecimento
+        if desfazer:
+            desfazer()
+
+        tempos, queries = [], []
+        for _ in range(repeticoes):
+            # Queries de todas as conexões (réplica e threads de api/paralelo.py incluídas)
+            with medir_requisicao() as medicao:
+                inicio = time.perf_counter()
+                response = requisitar(url, payload, **argumentos)
+                corpo = b''.join(response.streaming_content) if response.streaming else response.content
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            queries.append(medicao.consultas)
+            if desfazer:
+                desfazer()
+
+        return {
+            'endpoint': nome,
+            'metodo': metodo.upper(),
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(percentil(tempos, 50), 2),
+            'p95_ms': round(percentil(tempos, 95), 2),
+            'p99_ms': round(percentil(tempos, 99), 2),
+            'media_ms': round(statistics.fmean(tempos), 2),
+            'queries': max(queries),
+            'bytes': len(corpo),
+        }
+
+    # ========== SAÍDA ==========
+
+    def imprimir_tabela(self, relatorio, anteriores=None):
+        colunas = ['endpoint', 'status', 'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'bytes']
+        if anteriores:
+            colunas += ['Δp50', 'Δqueries']
+
+        linhas = []
+        for item in relatorio['resultados']:
+            linha = [str(item[coluna]) for coluna in colunas[:7]]
+            if anteriores:
+                anterior = anteriores.get(item['endpoint'])
+                if anterior:
+                    variacao = (item['p50_ms'] - anterior['p50_ms']) / anterior['p50_ms'] * 100 if anterior['p50_ms'] else 0
+                    linha += [f'{variacao:+.1f}%', f'{item["queries"] - anterior["queries"]:+d}']
+                else:
+                    linha += ['-', '-']
+            linhas.append(linha)
+
+        larguras = [max(len(coluna), *(len(linha[i]) for linha in linhas)) for i, coluna in enumerate(colunas)] if linhas else [len(c) for c in colunas]
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'📊 Benchmark ({relatorio["escala"]}, {relatorio["repeticoes"]} repetições) - dados: {relatorio["dados"]}'
+        ))
+        self.stdout.write('  '.join(coluna.ljust(larguras[i]) for i, coluna in enumerate(colunas)))
+        self.stdout.write('  '.join('-' * largura for largura in larguras))
+        for linha in linhas:
+            self.stdout.write('  '.join(valor.ljust(larguras[i]) for i, valor in enumerate(linha)))
+
+    def commit_atual(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
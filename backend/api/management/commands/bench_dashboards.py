@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.dados_sinteticos import ESCALAS, gerar_dados_sinteticos
+from api.models import Matricula
+
+from .bench import percentil
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a latência dos dashboards pelos handlers WSGI e ASGI do Django, '
+        'com as consultas independentes em sequência e em paralelo (API_CONSULTAS_PARALELAS)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=ESCALAS, default='small', help='Escala pré-definida do conjunto de dados.')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório.')
+        parser.add_argument('--repeat', type=int, default=10, help='Rodadas medidas por combinação.')
+        parser.add_argument('--threads', type=int, default=4, help='Valor de API_CONSULTAS_PARALELAS no modo paralelo.')
+        parser.add_argument(
+            '--simultaneas', type=int, nargs='+', default=[1, 4],
+            help='Requisições disparadas ao mesmo tempo em cada rodada.'
+        )
+        parser.add_argument(
+            '--latencia-ms', type=float, default=0,
+            help='Espera somada a cada consulta, simulando a ida e volta de um banco em rede (ex.: PostgreSQL).'
+        )
+        parser.add_argument('--only', action='append', help='Executa apenas endpoints cujo nome contenha o texto.')
+        parser.add_argument('--json', dest='saida_json', help='Grava os resultados em JSON neste caminho.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['threads'] < 2 or min(options['simultaneas']) < 1:
+            raise CommandError('--repeat e --simultaneas devem ser positivos e --threads pelo menos 2')
+
+        setup_test_environment()
+        nome_original = connection.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as diretorio:
+            # Banco em arquivo: cada thread abre a sua conexão, como em produção
+            connection.settings_dict['TEST']['NAME'] = os.path.join(diretorio, 'bench.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                self.stdout.write(self.style.SUCCESS(f'Gerando dados sintéticos ({options["scale"]})'))
+                gerar_dados_sinteticos(seed=options['seed'], **ESCALAS[options['scale']])
+                if options['latencia_ms']:
+                    self.simular_latencia(options['latencia_ms'] / 1000)
+                with override_settings(API_CACHE_PUBLICO_SEGUNDOS=0):
+                    resultados = self.executar(options)
+            finally:
+                connection_created.disconnect(dispatch_uid='bench-dashboards-latencia')
+                connection.creation.destroy_test_db(nome_original, verbosity=0)
+                teardown_test_environment()
+
+        self.imprimir_tabela(resultados, options)
+
+        if options['saida_json']:
+            with open(options['saida_json'], 'w', encoding='utf-8') as arquivo:
+                json.dump({
+                    'escala': options['scale'],
+                    'threads': options['threads'],
+                    'latencia_ms': options['latencia_ms'],
+                    'repeticoes': options['repeat'],
+                    'resultados': resultados,
+                }, arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {options["saida_json"]}'))
+
+    # ========== EXECUÇÃO ==========
+
+    @staticmethod
+    def simular_latencia(segundos):
+        """Toda conexão, aberta agora ou depois (inclusive nas threads do pool), espera `segundos` por consulta."""
+        def esperar(execute, sql, params, many, context):
+            time.sleep(segundos)
+            return execute(sql, params, many, context)
+
+        def instalar(sender, connection, **kwargs):
+            connection.execute_wrappers.append(esperar)
+
+        connection_created.connect(instalar, weak=False, dispatch_uid='bench-dashboards-latencia')
+        for conexao in connections.all(initialized_only=True):
+            conexao.execute_wrappers.append(esperar)
+
+    def endpoints(self):
+        matricula = Matricula.objects.select_related('turma').order_by('id').first()
+        return [
+            ('turmas-dashboard', reverse('turma-dashboard', kwargs={'pk': matricula.turma_id})),
+            ('estatisticas', reverse('estatisticas')),
+            ('analytics-professor', reverse('dashboard-professor-id', kwargs={'professor_id': matricula.turma.professor_id})),
+            ('analytics-aluno', reverse('dashboard-aluno-id', kwargs={'aluno_id': matricula.aluno_id})),
+            ('analytics-geral', reverse('analytics-geral')),
+        ]
+
+    def executar(self, options):
+        admin = User.objects.create_superuser('bench-admin', 'bench@bench.edu', 'bench-admin')
+        cabecalho = {'Authorization': f'Token {Token.objects.create(user=admin).key}'}
+
+        resultados = []
+        for nome, url in self.endpoints():
+            if options['only'] and not any(filtro in nome for filtro in options['only']):
+                continue
+            for handler in ('wsgi', 'asgi'):
+                for modo, threads in (('sequencial', 1), ('paralelo', options['threads'])):
+                    for simultaneas in options['simultaneas']:
+                        with override_settings(API_CONSULTAS_PARALELAS=threads):
+                            tempos, rodadas = self.medir(handler, url, cabecalho, simultaneas, options['repeat'])
+                        resultados.append({
+                            'endpoint': nome,
+                            'handler': handler,
+                            'modo': modo,
+                            'simultaneas': simultaneas,
+                            'p50_ms': round(percentil(tempos, 50), 2),
+                            'p95_ms': round(percentil(tempos, 95), 2),
+                            'media_ms': round(statistics.fmean(tempos), 2),
+                            'req_por_s': round(simultaneas * len(rodadas) / (sum(rodadas) / 1000), 1),
+                        })
+                        self.stdout.write(
+                            f'  {nome} {handler}/{modo} x{simultaneas}: {resultados[-1]["p50_ms"]} ms'
+                        )
+        return resultados
+
+    def medir(self, handler, url, cabecalho, simultaneas, repeticoes):
+        """
+        Latência de cada requisição (ms) e duração de cada rodada de `simultaneas`
+        requisições disparadas juntas (ms). Uma rodada de aquecimento não entra na conta.
+        """
+        if handler == 'wsgi':
+            clientes = [Client() for _ in range(simultaneas)]
+            with ThreadPoolExecutor(max_workers=simultaneas) as executor:
+                def rodada():
+                    return list(executor.map(lambda cliente: self.requisitar(cliente, url, cabecalho), clientes))
+                return self.rodadas(rodada, repeticoes)
+
+        # Cabeçalhos por requisição: os do construtor não chegam ao escopo ASGI
+        clientes = [AsyncClient() for _ in range(simultaneas)]
+
+        async def requisitar(cliente):
+            inicio = time.perf_counter()
+            response = await cliente.get(url, headers=cabecalho)
+            self.verificar(response, url)
+            return (time.perf_counter() - inicio) * 1000
+
+        async def rodada():
+            return await asyncio.gather(*(requisitar(cliente) for cliente in clientes))
+
+        return self.rodadas(lambda: asyncio.run(rodada()), repeticoes)
+
+    @staticmethod
+    def rodadas(rodada, repeticoes):
+        rodada()  # aquecimento
+        tempos, duracoes = [], []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            tempos.extend(rodada())
+            duracoes.append((time.perf_counter() - inicio) * 1000)
+        return tempos, duracoes
+
+    def requisitar(self, cliente, url, cabecalho):
+        inicio = time.perf_counter()
+        response = cliente.get(url, headers=cabecalho)
+        self.verificar(response, url)
+        return (time.perf_counter() - inicio) * 1000
+
+    @staticmethod
+    def verificar(response, url):
+        if response.status_code != 200:
+            raise CommandError(f'{url} respondeu {response.status_code}')
+
+    # ========== SAÍDA ==========
+
+    def imprimir_tabela(self, resultados, options):
+        colunas = ['endpoint', 'handler', 'modo', 'simultaneas', 'p50_ms', 'p95_ms', 'req_por_s']
+        linhas = [[str(item[coluna]) for coluna in colunas] for item in resultados]
+        larguras = [max(len(coluna), *(len(linha[i]) for linha in linhas)) for i, coluna in enumerate(colunas)] if linhas else [len(c) for c in colunas]
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'📊 Dashboards WSGI x ASGI ({options["scale"]}, {options["repeat"]} rodadas, '
+            f'paralelo = {options["threads"]} threads, latência simulada = {options["latencia_ms"]} ms)'
+        ))
+        self.stdout.write('  '.join(coluna.ljust(larguras[i]) for i, coluna in enumerate(colunas)))
+        self.stdout.write('  '.join('-' * largura for largura in larguras))
+        for linha in linhas:
+            self.stdout.write('  '.join(valor.ljust(larguras[i]) for i, valor in enumerate(linha)))
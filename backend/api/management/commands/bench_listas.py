@@ -0,0 +1,114 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.dados_sinteticos import ESCALAS, gerar_dados_sinteticos
+from api.models import Matricula, Presenca
+from api.serializers import MatriculaRapida, MatriculaSerializer, PresencaRapida, PresencaSerializer
+from api.views import matriculas_com_relacionados, presencas_com_relacionados
+
+from .bench import percentil
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a vazão (linhas/s) das listagens de presenças e matrículas pelo serializer do DRF '
+        'e pelo caminho rápido baseado em values() (consulta + serialização)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=ESCALAS, default='small', help='Escala pré-definida do conjunto de dados.')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório.')
+        parser.add_argument('--linhas', type=int, default=2000, help='Linhas serializadas por rodada.')
+        parser.add_argument('--repeat', type=int, default=10, help='Rodadas medidas por caminho.')
+        parser.add_argument('--json', dest='saida_json', help='Grava os resultados em JSON neste caminho.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['linhas'] < 1:
+            raise CommandError('--repeat e --linhas devem ser positivos')
+
+        setup_test_environment()
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(self.style.SUCCESS(f'Gerando dados sintéticos ({options["scale"]})'))
+            gerar_dados_sinteticos(seed=options['seed'], **ESCALAS[options['scale']])
+            resultados = self.executar(options)
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        self.imprimir_tabela(resultados, options)
+
+        if options['saida_json']:
+            with open(options['saida_json'], 'w', encoding='utf-8') as arquivo:
+                json.dump({
+                    'escala': options['scale'],
+                    'linhas': options['linhas'],
+                    'repeticoes': options['repeat'],
+                    'resultados': resultados,
+                }, arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {options["saida_json"]}'))
+
+    # ========== EXECUÇÃO ==========
+
+    def caminhos(self, linhas):
+        """(lista, caminho, função que consulta e serializa `linhas` linhas)."""
+        presencas = presencas_com_relacionados().order_by('-data', '-id')
+        matriculas = matriculas_com_relacionados().order_by('-data_matricula')
+        return [
+            ('presencas', 'drf', lambda: PresencaSerializer(list(presencas[:linhas]), many=True).data),
+            ('presencas', 'rapida', lambda: self.rapida(PresencaRapida(), presencas, linhas)),
+            ('matriculas', 'drf', lambda: MatriculaSerializer(list(matriculas[:linhas]), many=True).data),
+            ('matriculas', 'rapida', lambda: self.rapida(MatriculaRapida(), matriculas, linhas)),
+        ]
+
+    @staticmethod
+    def rapida(serializador, queryset, linhas):
+        return serializador.serializar(list(serializador.valores(queryset)[:linhas]))
+
+    def executar(self, options):
+        disponiveis = {'presencas': Presenca.objects.count(), 'matriculas': Matricula.objects.count()}
+        resultados = []
+        for lista, caminho, gerar in self.caminhos(options['linhas']):
+            linhas = len(gerar())  # aquecimento
+            tempos = []
+            for _ in range(options['repeat']):
+                inicio = time.perf_counter()
+                gerar()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            p50 = percentil(tempos, 50)
+            resultados.append({
+                'lista': lista,
+                'caminho': caminho,
+                'linhas': linhas,
+                'disponiveis': disponiveis[lista],
+                'p50_ms': round(p50, 2),
+                'p95_ms': round(percentil(tempos, 95), 2),
+                'linhas_por_s': round(linhas / (p50 / 1000)) if p50 else None,
+            })
+            self.stdout.write(f'  {lista}/{caminho}: {resultados[-1]["p50_ms"]} ms')
+
+        drf = {item['lista']: item for item in resultados if item['caminho'] == 'drf'}
+        for item in resultados:
+            item['ganho'] = round(drf[item['lista']]['p50_ms'] / item['p50_ms'], 2) if item['p50_ms'] else None
+        return resultados
+
+    # ========== SAÍDA ==========
+
+    def imprimir_tabela(self, resultados, options):
+        colunas = ['lista', 'caminho', 'linhas', 'p50_ms', 'p95_ms', 'linhas_por_s', 'ganho']
+        linhas = [[str(item[coluna]) for coluna in colunas] for item in resultados]
+        larguras = [max(len(coluna), *(len(linha[i]) for linha in linhas)) for i, coluna in enumerate(colunas)] if linhas else [len(c) for c in colunas]
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'📊 Listagens: serializer do DRF x values() ({options["scale"]}, {options["repeat"]} rodadas)'
+        ))
+        self.stdout.write('  '.join(coluna.ljust(larguras[i]) for i, coluna in enumerate(colunas)))
+        self.stdout.write('  '.join('-' * largura for largura in larguras))
+        for linha in linhas:
+            self.stdout.write('  '.join(valor.ljust(larguras[i]) for i, valor in enumerate(linha)))
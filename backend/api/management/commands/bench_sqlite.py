@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config.sqlite.base import PRAGMAS_PADRAO, aplicar_pragmas
+
+from .bench import percentil
+
+
+# Configuração de cada modo: PRAGMAs e forma de abrir a transação
+MODOS = {
+    # O que o backend padrão do Django usa: journal DELETE, synchronous FULL, BEGIN DEFERRED
+    'padrao': ({'busy_timeout': 5000}, 'BEGIN'),
+    # Backend config.sqlite
+    'ajustado': (PRAGMAS_PADRAO, 'BEGIN IMMEDIATE'),
+}
+
+ESQUEMA = """
+CREATE TABLE matricula (
+    id INTEGER PRIMARY KEY,
+    turma_id INTEGER NOT NULL,
+    presenca_acumulada INTEGER NOT NULL DEFAULT 0,
+    total_aulas INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX matricula_turma ON matricula (turma_id);
+CREATE TABLE presenca (
+    id INTEGER PRIMARY KEY,
+    matricula_id INTEGER NOT NULL REFERENCES matricula (id),
+    data TEXT NOT NULL,
+    status TEXT NOT NULL,
+    UNIQUE (matricula_id, data)
+);
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão de chamadas gravadas por N escritores simultâneos no SQLite, '
+        'com os PRAGMAs padrão e com os do backend config.sqlite (WAL, BEGIN IMMEDIATE)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, nargs='+', default=[1, 2, 4, 8], help='Números de escritores simultâneos a medir.')
+        parser.add_argument('--leitores', type=int, default=2, help='Leitores simultâneos (consultas agregadas) em cada rodada.')
+        parser.add_argument('--segundos', type=float, default=3.0, help='Duração de cada rodada.')
+        parser.add_argument('--turmas', type=int, default=20, help='Turmas no banco de teste.')
+        parser.add_argument('--alunos', type=int, default=30, help='Alunos por turma.')
+        parser.add_argument('--modo', choices=MODOS, action='append', help='Mede apenas este modo (pode ser repetido).')
+        parser.add_argument('--json', dest='saida_json', help='Grava os resultados em JSON neste caminho.')
+
+    def handle(self, *args, **options):
+        if options['segundos'] <= 0 or min(options['escritores']) < 1:
+            raise CommandError('--segundos e --escritores devem ser positivos')
+
+        resultados = []
+        with tempfile.TemporaryDirectory() as diretorio:
+            for modo in options['modo'] or list(MODOS):
+                for escritores in options['escritores']:
+                    caminho = os.path.join(diretorio, f'{modo}-{escritores}.sqlite3')
+                    self.criar_banco(caminho, modo, options['turmas'], options['alunos'])
+                    resultado = self.rodada(caminho, modo, escritores, options)
+                    resultados.append(resultado)
+                    self.stdout.write(
+                        f'  {modo} / {escritores} escritores: {resultado["chamadas_por_s"]} chamadas/s, '
+                        f'{resultado["erros_lock"]} erros'
+                    )
+
+        self.imprimir_tabela(resultados, options)
+
+        if options['saida_json']:
+            with open(options['saida_json'], 'w', encoding='utf-8') as arquivo:
+                json.dump({'parametros': {
+                    chave: options[chave] for chave in ('leitores', 'segundos', 'turmas', 'alunos')
+                }, 'resultados': resultados}, arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {options["saida_json"]}'))
+
+    # ========== BANCO ==========
+
+    def conectar(self, caminho, modo):
+        pragmas, _ = MODOS[modo]
+        conexao = sqlite3.connect(caminho, timeout=pragmas.get('busy_timeout', 5000) / 1000, isolation_level=None, check_same_thread=False)
+        aplicar_pragmas(conexao, pragmas)
+        return conexao
+
+    def criar_banco(self, caminho, modo, turmas, alunos):
+        conexao = self.conectar(caminho, modo)
+        conexao.executescript(ESQUEMA)
+        conexao.executemany(
+            'INSERT INTO matricula (turma_id) VALUES (?)',
+            [(turma,) for turma in range(turmas) for _ in range(alunos)]
+        )
+        conexao.close()
+
+    # ========== RODADA ==========
+
+    def rodada(self, caminho, modo, escritores, options):
+        """Escritores gravam chamadas de turmas e dias diferentes enquanto leitores agregam."""
+        _, begin = MODOS[modo]
+        fim = time.monotonic() + options['segundos']
+        tempos, erros, leituras = [], [], []
+        trava = threading.Lock()
+
+        def escritor(numero):
+            conexao = self.conectar(caminho, modo)
+            dia = date(2025, 1, 1) + timedelta(days=numero * 10000)
+            turma = numero
+            while time.monotonic() < fim:
+                inicio = time.perf_counter()
+                try:
+                    self.registrar_chamada(conexao, begin, turma % options['turmas'], dia.isoformat())
+                except sqlite3.OperationalError as erro:
+                    if conexao.in_transaction:
+                        conexao.execute('ROLLBACK')
+                    with trava:
+                        erros.append(str(erro))
+                    continue
+                with trava:
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+                turma += escritores
+                if turma >= options['turmas']:
+                    turma, dia = numero, dia + timedelta(days=1)
+            conexao.close()
+
+        def leitor():
+            conexao = self.conectar(caminho, modo)
+            total = 0
+            while time.monotonic() < fim:
+                try:
+                    conexao.execute(
+                        'SELECT m.turma_id, COUNT(*), SUM(p.status = ?) FROM presenca p '
+                        'JOIN matricula m ON m.id = p.matricula_id GROUP BY m.turma_id',
+                        ['Presente']
+                    ).fetchall()
+                    total += 1
+                except sqlite3.OperationalError:
+                    pass
+            conexao.close()
+            with trava:
+                leituras.append(total)
+
+        threads = [threading.Thread(target=escritor, args=(i,)) for i in range(escritores)]
+        threads += [threading.Thread(target=leitor) for _ in range(options['leitores'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return {
+            'modo': modo,
+            'escritores': escritores,
+            'leitores': options['leitores'],
+            'chamadas': len(tempos),
+            'chamadas_por_s': round(len(tempos) / options['segundos'], 1),
+            'p50_ms': round(percentil(tempos, 50), 2) if tempos else None,
+            'p95_ms': round(percentil(tempos, 95), 2) if tempos else None,
+            'media_ms': round(statistics.fmean(tempos), 2) if tempos else None,
+            'erros_lock': len(erros),
+            'leituras_por_s': round(sum(leituras) / options['segundos'], 1),
+        }
+
+    @staticmethod
+    def registrar_chamada(conexao, begin, turma, dia):
+        """Uma chamada: lê as matrículas da turma e grava presenças e contadores na mesma transação."""
+        conexao.execute(begin)
+        matriculas = [linha[0] for linha in conexao.execute('SELECT id FROM matricula WHERE turma_id = ?', [turma])]
+        conexao.executemany(
+            'INSERT INTO presenca (matricula_id, data, status) VALUES (?, ?, ?) '
+            'ON CONFLICT (matricula_id, data) DO UPDATE SET status = excluded.status',
+            [(matricula, dia, 'Presente' if matricula % 5 else 'Ausente') for matricula in matriculas]
+        )
+        conexao.execute(
+            'UPDATE matricula SET total_aulas = total_aulas + 1, '
+            'presenca_acumulada = presenca_acumulada + (id % 5 != 0) WHERE turma_id = ?',
+            [turma]
+        )
+        conexao.execute('COMMIT')
+
+    # ========== SAÍDA ==========
+
+    def imprimir_tabela(self, resultados, options):
+        colunas = ['modo', 'escritores', 'chamadas_por_s', 'p50_ms', 'p95_ms', 'erros_lock', 'leituras_por_s']
+        linhas = [[str(item[coluna]) for coluna in colunas] for item in resultados]
+        larguras = [max(len(coluna), *(len(linha[i]) for linha in linhas)) for i, coluna in enumerate(colunas)]
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'📊 SQLite com escritores simultâneos ({options["segundos"]}s por rodada, '
+            f'{options["leitores"]} leitores, {options["turmas"]} turmas x {options["alunos"]} alunos)'
+        ))
+        self.stdout.write('  '.join(coluna.ljust(larguras[i]) for i, coluna in enumerate(colunas)))
+        self.stdout.write('  '.join('-' * largura for largura in larguras))
+        for linha in linhas:
+            self.stdout.write('  '.join(valor.ljust(larguras[i]) for i, valor in enumerate(linha)))
@@ -0,0 +1,108 @@
+import json
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.consultas_lentas import instalar_captura, limite_ms, limpar, resumo
+
+
+class Command(BaseCommand):
+    help = (
+        'Mostra as consultas lentas agrupadas por impressão digital, da maior para a menor soma de tempo. '
+        'Lê o buffer de um servidor em execução (--servidor) ou executa requisições neste processo (--requisitar).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servidor', help='Endereço da API em execução (ex.: https://sistema.onrender.com).')
+        parser.add_argument('--token', help='Token de um administrador para --servidor.')
+        parser.add_argument(
+            '--requisitar', action='append', metavar='CAMINHO',
+            help='GET executado neste processo, no banco configurado (ex.: /api/analytics/geral/). Pode repetir.'
+        )
+        parser.add_argument('--usuario', help='Administrador usado em --requisitar (padrão: o primeiro superusuário).')
+        parser.add_argument(
+            '--limite-ms', type=float,
+            help='Limite de captura em --requisitar (padrão: API_CONSULTAS_LENTAS_MS, ou 0 para capturar todas).'
+        )
+        parser.add_argument('--top', type=int, default=20, help='Impressões digitais mostradas.')
+        parser.add_argument('--json', dest='saida_json', help='Grava o resultado completo em JSON neste caminho.')
+
+    def handle(self, *args, **options):
+        if bool(options['servidor']) == bool(options['requisitar']):
+            raise CommandError('Informe --servidor ou --requisitar')
+
+        if options['servidor']:
+            dados = self.ler_servidor(options['servidor'], options['token'])
+        else:
+            dados = self.requisitar(options)
+
+        self.imprimir_tabela(dados, options['top'])
+
+        if options['saida_json']:
+            with open(options['saida_json'], 'w', encoding='utf-8') as arquivo:
+                json.dump(dados, arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Resultado gravado em {options["saida_json"]}'))
+
+    # ========== FONTES ==========
+
+    def ler_servidor(self, servidor, token):
+        """O buffer é do worker que atender a requisição."""
+        url = servidor.rstrip('/') + reverse('consultas-lentas')
+        requisicao = urllib.request.Request(url, headers={'Authorization': f'Token {token}'} if token else {})
+        try:
+            with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+                return json.load(resposta)
+        except urllib.error.HTTPError as erro:
+            raise CommandError(f'{url} respondeu {erro.code}')
+        except urllib.error.URLError as erro:
+            raise CommandError(f'Não foi possível acessar {url}: {erro.reason}')
+
+    def requisitar(self, options):
+        if options['usuario']:
+            admin = User.objects.filter(username=options['usuario'], is_superuser=True).first()
+        else:
+            admin = User.objects.filter(is_superuser=True).order_by('id').first()
+        if admin is None:
+            raise CommandError('Nenhum superusuário encontrado (use --usuario)')
+
+        limite = options['limite_ms'] if options['limite_ms'] is not None else limite_ms()
+        # Limite mínimo positivo: com 0 a captura ficaria desativada
+        with override_settings(
+            API_CONSULTAS_LENTAS_MS=max(limite, 0.001),
+            API_CACHE_PUBLICO_SEGUNDOS=0,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ):
+            limpar()
+            instalar_captura()
+            cliente = APIClient()
+            cliente.force_authenticate(admin)
+            for caminho in options['requisitar']:
+                response = cliente.get(caminho)
+                self.stdout.write(f'  GET {caminho}: {response.status_code}')
+            return resumo()
+
+    # ========== SAÍDA ==========
+
+    def imprimir_tabela(self, dados, top):
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'🐢 Consultas lentas: {dados["capturadas"]} capturadas (limite {dados["limite_ms"]} ms, '
+            f'buffer de {dados["capacidade"]})'
+        ))
+        for posicao, linha in enumerate(dados['impressoes'][:top], start=1):
+            self.stdout.write(
+                f'{posicao:>3}. total {linha["total_ms"]} ms | {linha["execucoes"]}x | '
+                f'média {linha["media_ms"]} ms | máx {linha["maximo_ms"]} ms | '
+                f'{linha["parametros_distintos"]} parâmetros distintos'
+            )
+            self.stdout.write(f'     {linha["impressao"][:200]}')
+            if linha['views']:
+                self.stdout.write(f'     views: {", ".join(linha["views"])}')
+            for origem in linha['origens'][:3]:
+                self.stdout.write(f'     em {origem}')
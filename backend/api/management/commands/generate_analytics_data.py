@@ -1,135 +1,71 @@
-from django.core.management.base import BaseCommand
-import random
-from datetime import date, timedelta
-from django.utils import timezone
+from django.core.management.base import BaseCommand, CommandError
+from datetime import datetime
+import time
 from api.models import Professor, Aluno, Turma, Matricula, Presenca
-from django.contrib.auth.models import User
+from api.dados_sinteticos import ESCALAS, dados_existentes, gerar_dados_sinteticos, limpar_dados
 
 
 class Command(BaseCommand):
-    help = 'Gera dados de teste para análises estatísticas'
-    
+    help = 'Gera dados de teste para análises estatísticas (em lote e de forma reprodutível)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=ESCALAS, default='small', help='Escala pré-definida do conjunto de dados.')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador (mesma semente, mesmos dados).')
+        parser.add_argument('--days', type=int, help='Número de dias (corridos) com presenças registradas.')
+        parser.add_argument('--alunos', type=int, help='Sobrescreve o número de alunos da escala.')
+        parser.add_argument('--turmas', type=int, help='Sobrescreve o número de turmas da escala.')
+        parser.add_argument('--professores', type=int, help='Sobrescreve o número de professores da escala.')
+        parser.add_argument('--alunos-por-turma', type=int, help='Sobrescreve o número de alunos matriculados por turma.')
+        parser.add_argument('--end-date', help='Última data de aula (AAAA-MM-DD). Padrão: hoje.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Tamanho dos lotes do bulk_create.')
+        limpeza = parser.add_mutually_exclusive_group()
+        limpeza.add_argument('--clear', action='store_true', help='Remove os dados gerados antes com a mesma --seed.')
+        limpeza.add_argument(
+            '--clear-all', action='store_true',
+            help='Remove TODOS os professores, alunos, turmas, matrículas e presenças do banco, inclusive os reais.'
+        )
+
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('Gerando dados para análises...'))
-        
-        # Limpar dados existentes (opcional)
-        # Presenca.objects.all().delete()
-        # Matricula.objects.all().delete()
-        # Turma.objects.all().delete()
-        # Aluno.objects.all().delete()
-        # Professor.objects.all().delete()
-        
-        # Criar mais professores
-        departamentos = ['Matemática', 'Computação', 'Estatística', 'Física', 'Química']
-        for i in range(5):
-            Professor.objects.get_or_create(
-                nome=f'Professor {i+1}',
-                email=f'professor{i+1}@ifb.edu',
-                departamento=random.choice(departamentos),
-                ativo=True
-            )
-        
-        # Criar mais alunos
-        cursos = [
-            'Engenharia de Software',
-            'Ciência da Computação',
-            'Matemática',
-            'Estatística',
-            'Física',
-            'Química'
-        ]
-        
-        for i in range(50):
-            Aluno.objects.get_or_create(
-                nome=f'Aluno {i+1}',
-                matricula=f'2024{i+1:04d}',
-                email=f'aluno{i+1}@ifb.edu',
-                curso=random.choice(cursos),
-                data_nascimento=date(1998 + (i % 5), (i % 12) + 1, (i % 28) + 1),
-                genero=random.choice(['M', 'F'])
-            )
-        
-        self.stdout.write(self.style.SUCCESS('Professores e alunos criados.'))
-        
-        # Criar mais turmas
-        professores = Professor.objects.all()
-        disciplinas = [
-            ('Cálculo I', 'Introdução ao cálculo'),
-            ('Programação Python', 'Fundamentos de Python'),
-            ('Banco de Dados', 'Modelagem de dados'),
-            ('Estatística', 'Estatística básica'),
-            ('Física I', 'Mecânica clássica'),
-            ('Química Geral', 'Conceitos fundamentais'),
-            ('Álgebra Linear', 'Vetores e matrizes'),
-            ('Estrutura de Dados', 'Algoritmos e estruturas'),
-            ('Redes de Computadores', 'Fundamentos de redes'),
-            ('Inteligência Artificial', 'IA básica')
-        ]
-        
-        for i, (nome, desc) in enumerate(disciplinas):
-            Turma.objects.get_or_create(
-                nome=nome,
-                descricao=desc,
-                professor=random.choice(professores),
-                data_inicio=date.today() - timedelta(days=random.randint(0, 60)),
-                data_fim=date.today() + timedelta(days=random.randint(30, 120)),
-                status=random.choice(['Ativa', 'Ativa', 'Ativa', 'Concluída'])  # 75% ativas
+        parametros = dict(ESCALAS[options['scale']])
+        for chave, opcao in [
+            ('dias', 'days'), ('alunos', 'alunos'), ('turmas', 'turmas'),
+            ('professores', 'professores'), ('alunos_por_turma', 'alunos_por_turma'),
+        ]:
+            if options[opcao] is not None:
+                parametros[chave] = options[opcao]
+
+        data_final = None
+        if options['end_date']:
+            try:
+                data_final = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--end-date deve estar no formato AAAA-MM-DD')
+
+        if options['clear_all']:
+            limpar_dados()
+            self.stdout.write(self.style.WARNING('Todos os dados existentes removidos.'))
+        elif options['clear']:
+            limpar_dados(options['seed'])
+            self.stdout.write(self.style.WARNING(f'Dados gerados com a seed {options["seed"]} removidos.'))
+        elif dados_existentes(options['seed']):
+            raise CommandError(
+                f'O banco já tem dados gerados com a seed {options["seed"]}. '
+                'Use --clear para substituí-los ou outra --seed para gerar um conjunto adicional.'
             )
-        
-        self.stdout.write(self.style.SUCCESS('Turmas criadas.'))
-        
-        # Matricular alunos em turmas
-        turmas = Turma.objects.all()
-        alunos = Aluno.objects.all()
-        
-        for turma in turmas:
-            # Matricular 10-20 alunos em cada turma
-            alunos_turma = random.sample(list(alunos), random.randint(10, 20))
-            for aluno in alunos_turma:
-                Matricula.objects.get_or_create(turma=turma, aluno=aluno)
-        
-        self.stdout.write(self.style.SUCCESS('Matrículas criadas.'))
-        
-        # Criar presenças realistas
-        matriculas = Matricula.objects.all()
-        hoje = timezone.now().date()
-        
-        for matricula in matriculas:
-            # Criar presenças para os últimos 60 dias (dias de semana)
-            for dias_atras in range(60):
-                data_aula = hoje - timedelta(days=dias_atras)
-                
-                # Apenas dias de semana (segunda a sexta)
-                if data_aula.weekday() < 5:
-                    # Taxa de presença baseada no "perfil" do aluno
-                    # Alguns alunos têm melhor frequência que outros
-                    perfil_aluno = hash(str(matricula.aluno_id)) % 10
-                    
-                    if perfil_aluno < 7:  # 70% dos alunos têm boa frequência
-                        chance_presenca = 0.85  # 85% de chance de estar presente
-                    elif perfil_aluno < 9:  # 20% têm frequência média
-                        chance_presenca = 0.70  # 70% de chance
-                    else:  # 10% têm baixa frequência
-                        chance_presenca = 0.40  # 40% de chance
-                    
-                    # Status baseado na chance
-                    if random.random() < chance_presenca:
-                        status_presenca = 'Presente'
-                    else:
-                        status_presenca = 'Ausente'
-                    
-                    # Pequena chance de justificativa
-                    if status_presenca == 'Ausente' and random.random() < 0.2:
-                        status_presenca = 'Justificado'
-                    
-                    Presenca.objects.get_or_create(
-                        matricula=matricula,
-                        data=data_aula,
-                        defaults={'status': status_presenca}
-                    )
-        
-        self.stdout.write(self.style.SUCCESS('Presenças criadas.'))
-        
+
+        self.stdout.write(self.style.SUCCESS(f'Gerando dados para análises ({options["scale"]}): {parametros}'))
+        inicio = time.perf_counter()
+
+        gerar_dados_sinteticos(
+            seed=options['seed'],
+            data_final=data_final,
+            tamanho_lote=options['batch_size'],
+            log=lambda mensagem: self.stdout.write(self.style.SUCCESS(f'  {mensagem}')),
+            **parametros
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Concluído em {time.perf_counter() - inicio:.1f}s'))
+
         # Estatísticas finais
         self.stdout.write(self.style.SUCCESS('\n📊 DADOS GERADOS:'))
         self.stdout.write(self.style.SUCCESS(f'  Professores: {Professor.objects.count()}'))
@@ -137,10 +73,10 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'  Turmas: {Turma.objects.count()}'))
         self.stdout.write(self.style.SUCCESS(f'  Matrículas: {Matricula.objects.count()}'))
         self.stdout.write(self.style.SUCCESS(f'  Presenças: {Presenca.objects.count()}'))
-        
+
         # Calcular taxa de presença geral
         total_presencas = Presenca.objects.count()
         if total_presencas > 0:
             presentes = Presenca.objects.filter(status='Presente').count()
             taxa = (presentes / total_presencas) * 100
-            self.stdout.write(self.style.SUCCESS(f'  Taxa de presença geral: {taxa:.2f}%'))
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS(f'  Taxa de presença geral: {taxa:.2f}%'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from api.models import Matricula, ResumoDiarioPresenca
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os resumos diários de presença (e os contadores das matrículas) a partir da tabela Presenca'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--turma',
+            type=int,
+            action='append',
+            dest='turmas',
+            help='ID da turma a reconstruir (pode ser repetido). Padrão: todas.'
+        )
+        parser.add_argument(
+            '--sem-contadores',
+            action='store_true',
+            help='Não recalcula os contadores acumulados das matrículas.'
+        )
+
+    def handle(self, *args, **options):
+        turmas = options['turmas']
+
+        self.stdout.write(self.style.SUCCESS('Reconstruindo resumos diários de presença...'))
+        total_resumos = ResumoDiarioPresenca.recalcular(turmas=turmas)
+        self.stdout.write(self.style.SUCCESS(f'  Resumos gerados: {total_resumos}'))
+
+        if not options['sem_contadores']:
+            matriculas = None
+            if turmas:
+                matriculas = Matricula.objects.filter(turma__in=turmas).values('pk')
+            total_matriculas = Matricula.recalcular_contadores(matriculas)
+            self.stdout.write(self.style.SUCCESS(f'  Matrículas recalculadas: {total_matriculas}'))
@@ -0,0 +1,74 @@
+import os
+import signal
+import socket
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from api.models import TarefaRelatorio
+from api.relatorios import executar_proxima
+
+
+class Command(BaseCommand):
+    help = (
+        'Processa a fila de relatórios em segundo plano (TarefaRelatorio). '
+        'Vários workers podem rodar ao mesmo tempo; cada tarefa é reivindicada por um só.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Processa as tarefas pendentes e encerra.')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera quando a fila está vazia.')
+        parser.add_argument('--max-tarefas', type=int, help='Encerra após processar este número de tarefas.')
+        parser.add_argument(
+            '--tempo-limite',
+            type=int,
+            default=int(TarefaRelatorio.TEMPO_LIMITE.total_seconds() // 60),
+            help='Minutos sem renovação após os quais uma tarefa em processamento volta para a fila.'
+        )
+        parser.add_argument(
+            '--max-tentativas',
+            type=int,
+            default=TarefaRelatorio.MAXIMO_TENTATIVAS,
+            help='Tentativas interrompidas após as quais uma tarefa abandonada vai para Erro.'
+        )
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('--intervalo deve ser positivo')
+        if options['tempo_limite'] <= 0 or options['max_tentativas'] < 1:
+            raise CommandError('--tempo-limite e --max-tentativas devem ser positivos')
+
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        tempo_limite = timedelta(minutes=options['tempo_limite'])
+        self.encerrar = False
+        # Encerramento gracioso: termina a tarefa atual antes de sair
+        signal.signal(signal.SIGTERM, self.pedir_encerramento)
+        signal.signal(signal.SIGINT, self.pedir_encerramento)
+
+        self.stdout.write(self.style.SUCCESS(f'Worker de relatórios {worker} iniciado'))
+        processadas = 0
+        while not self.encerrar:
+            close_old_connections()
+            tarefa = executar_proxima(worker, tempo_limite, options['max_tentativas'])
+
+            if tarefa is None:
+                if options['once']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            processadas += 1
+            if tarefa.status == 'Erro':
+                self.stdout.write(self.style.ERROR(f'  Relatório #{tarefa.pk}: erro - {tarefa.erro}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'  Relatório #{tarefa.pk}: {tarefa.arquivo.name}'))
+
+            if options['max_tarefas'] and processadas >= options['max_tarefas']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Worker encerrado ({processadas} tarefas processadas)'))
+
+    def pedir_encerramento(self, signum, frame):
+        self.encerrar = True
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api.replica import alias_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia o banco SQLite principal para o arquivo da réplica (SQLITE_REPLICA_NAME). '
+        'Simula a replicação em ambiente local; com --intervalo, repete a cópia até ser interrompido.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, help='Segundos entre as cópias (atraso simulado da réplica).')
+
+    def handle(self, *args, **options):
+        alias = alias_replica()
+        if alias is None:
+            raise CommandError('Réplica não configurada (defina SQLITE_REPLICA_NAME)')
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite' or connections[alias].vendor != 'sqlite':
+            raise CommandError('sincronizar_replica só copia bancos SQLite; use a replicação do servidor de banco')
+        if options['intervalo'] is not None and options['intervalo'] <= 0:
+            raise CommandError('--intervalo deve ser positivo')
+
+        while True:
+            inicio = time.perf_counter()
+            self.copiar(alias)
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Réplica atualizada em {(time.perf_counter() - inicio) * 1000:.0f} ms'
+            ))
+            if options['intervalo'] is None:
+                return
+            time.sleep(options['intervalo'])
+
+    def copiar(self, alias):
+        """Cópia consistente com a API de backup do SQLite (o principal continua aceitando escritas)."""
+        principal = connections[DEFAULT_DB_ALIAS]
+        replica = connections[alias]
+        principal.ensure_connection()
+        replica.ensure_connection()
+        principal.connection.backup(replica.connection)
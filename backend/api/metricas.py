@@ -0,0 +1,182 @@
+"""
+Métricas da API no formato do Prometheus.
+
+Com API_METRICAS ativo e o pacote prometheus_client instalado,
+MetricasMiddleware registra, por view e ação do DRF (ex.: PresencaViewSet /
+marcar_presenca, AnalyticsGeralView / get):
+
+- api_requisicoes_total: requisições por método e classe de status (2xx, 4xx,
+  5xx), de onde sai a taxa de erros;
+- api_requisicao_segundos: histograma da latência;
+- api_requisicao_consultas: histograma do número de consultas ao banco
+  (contadas por api/perfil.py, inclusive nas threads de api/paralelo.py).
+
+Os caminhos críticos são instrumentados à parte com @instrumentar(operacao):
+a chamada (marcar_presenca) e cada view de análise, com latência, consultas e
+exceções por operação, e os registros da chamada por resultado.
+
+GET /metrics devolve tudo em texto. Com vários workers do gunicorn, cada
+processo grava suas métricas em arquivos em PROMETHEUS_MULTIPROC_DIR
+(definido em gunicorn.conf.py) e o endpoint soma os de todos os processos.
+API_METRICAS_TOKEN, se definido, exige o cabeçalho
+"Authorization: Bearer <token>".
+"""
+
+import os
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from .perfil import medir_requisicao
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, multiprocess
+except ImportError:  # dependência opcional: sem ela as métricas ficam desativadas
+    prometheus_client = None
+
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def metricas_ativas():
+    return prometheus_client is not None and getattr(settings, 'API_METRICAS', False)
+
+
+if prometheus_client is not None:
+    REQUISICOES = Counter(
+        'api_requisicoes', 'Requisições atendidas',
+        ['view', 'acao', 'metodo', 'status'],
+    )
+    LATENCIA = Histogram(
+        'api_requisicao_segundos', 'Latência das requisições',
+        ['view', 'acao'], buckets=BUCKETS_SEGUNDOS,
+    )
+    CONSULTAS = Histogram(
+        'api_requisicao_consultas', 'Consultas ao banco por requisição',
+        ['view', 'acao'], buckets=BUCKETS_CONSULTAS,
+    )
+    OPERACAO_LATENCIA = Histogram(
+        'api_operacao_segundos', 'Latência das operações instrumentadas',
+        ['operacao'], buckets=BUCKETS_SEGUNDOS,
+    )
+    OPERACAO_CONSULTAS = Histogram(
+        'api_operacao_consultas', 'Consultas ao banco por operação instrumentada',
+        ['operacao'], buckets=BUCKETS_CONSULTAS,
+    )
+    OPERACAO_ERROS = Counter(
+        'api_operacao_erros', 'Exceções nas operações instrumentadas',
+        ['operacao', 'tipo'],
+    )
+    CHAMADA_REGISTROS = Counter(
+        'api_chamada_registros', 'Registros recebidos em marcar_presenca',
+        ['resultado'],
+    )
+
+
+# ========== MIDDLEWARE ==========
+
+def rotulos_view(view_func, metodo):
+    """(view, ação) de uma view do Django/DRF; a ação de um ViewSet vem do roteador."""
+    classe = getattr(view_func, 'cls', None)
+    if classe is None:
+        return getattr(view_func, '__name__', 'desconhecida'), metodo.lower()
+    acoes = getattr(view_func, 'actions', None) or {}
+    return classe.__name__, acoes.get(metodo.lower(), metodo.lower())
+
+
+class MetricasMiddleware:
+    """Contagem, latência e consultas de cada requisição, por view e ação."""
+
+    def __init__(self, get_response):
+        if not metricas_ativas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inicio = time.perf_counter()
+        with medir_requisicao() as medicao:
+            consultas_antes = medicao.consultas
+            response = self.get_response(request)
+        duracao = time.perf_counter() - inicio
+
+        # Sem process_view (ex.: 404 antes de achar a rota) a requisição não tem view
+        view, acao = getattr(request, 'metricas_rotulos', ('sem_rota', request.method.lower()))
+        REQUISICOES.labels(view, acao, request.method, f'{response.status_code // 100}xx').inc()
+        LATENCIA.labels(view, acao).observe(duracao)
+        CONSULTAS.labels(view, acao).observe(medicao.consultas - consultas_antes)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metricas_rotulos = rotulos_view(view_func, request.method)
+
+
+# ========== OPERAÇÕES ==========
+
+def instrumentar(operacao):
+    """
+    Decorator para métodos de views: latência, consultas e exceções do método
+    com o rótulo `operacao`, independentemente da rota que o chamou.
+    """
+    def decorator(metodo):
+        @wraps(metodo)
+        def wrapper(*args, **kwargs):
+            if not metricas_ativas():
+                return metodo(*args, **kwargs)
+
+            inicio = time.perf_counter()
+            with medir_requisicao() as medicao:
+                consultas_antes = medicao.consultas
+                try:
+                    return metodo(*args, **kwargs)
+                except Exception as erro:
+                    OPERACAO_ERROS.labels(operacao, type(erro).__name__).inc()
+                    raise
+                finally:
+                    OPERACAO_LATENCIA.labels(operacao).observe(time.perf_counter() - inicio)
+                    OPERACAO_CONSULTAS.labels(operacao).observe(medicao.consultas - consultas_antes)
+
+        return wrapper
+
+    return decorator
+
+
+def contar_registros_chamada(resultados):
+    """Conta os registros de uma chamada por resultado ('sucesso'/'erro')."""
+    if not metricas_ativas():
+        return
+    for item in resultados:
+        CHAMADA_REGISTROS.labels(item['status']).inc()
+
+
+# ========== ENDPOINT ==========
+
+def registro_coletor():
+    """Registro com as métricas de todos os workers (modo multiprocesso) ou só deste processo."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registro = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return registro
+    return prometheus_client.REGISTRY
+
+
+def exportar_metricas(request):
+    """GET /metrics no formato de texto do Prometheus."""
+    if not metricas_ativas():
+        raise Http404
+
+    token = getattr(settings, 'API_METRICAS_TOKEN', '')
+    if token:
+        cabecalho = request.headers.get('Authorization', '')
+        if not constant_time_compare(cabecalho, f'Bearer {token}'):
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+
+    return HttpResponse(
+        prometheus_client.generate_latest(registro_coletor()),
+        content_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
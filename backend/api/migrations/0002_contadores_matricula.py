@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-16 22:27
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    """Preenche os contadores das matrículas existentes a partir das presenças."""
+    Matricula = apps.get_model('api', 'Matricula')
+    Presenca = apps.get_model('api', 'Presenca')
+    
+    def contagem(**filtros):
+        subquery = Presenca.objects.filter(
+            matricula=OuterRef('pk'), **filtros
+        ).order_by().values('matricula').annotate(total=Count('id')).values('total')
+        return Coalesce(Subquery(subquery), Value(0))
+    
+    Matricula.objects.update(
+        presenca_acumulada=contagem(status='Presente'),
+        ausencia_acumulada=contagem(status='Ausente'),
+        justificado_acumulado=contagem(status='Justificado'),
+        total_aulas=contagem(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matricula',
+            name='ausencia_acumulada',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Ausências Acumuladas'),
+        ),
+        migrations.AddField(
+            model_name='matricula',
+            name='justificado_acumulado',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Faltas Justificadas Acumuladas'),
+        ),
+        migrations.AddField(
+            model_name='matricula',
+            name='total_aulas',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Total de Aulas Registradas'),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-16 22:30
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def preencher_resumos(apps, schema_editor):
+    """Gera os resumos diários a partir das presenças existentes."""
+    Presenca = apps.get_model('api', 'Presenca')
+    ResumoDiarioPresenca = apps.get_model('api', 'ResumoDiarioPresenca')
+    
+    agregados = Presenca.objects.order_by().values('matricula__turma_id', 'data').annotate(
+        presentes=Count('id', filter=Q(status='Presente')),
+        ausentes=Count('id', filter=Q(status='Ausente')),
+        justificados=Count('id', filter=Q(status='Justificado')),
+    )
+    ResumoDiarioPresenca.objects.bulk_create(
+        (
+            ResumoDiarioPresenca(
+                turma_id=item['matricula__turma_id'],
+                data=item['data'],
+                presentes=item['presentes'],
+                ausentes=item['ausentes'],
+                justificados=item['justificados'],
+            )
+            for item in agregados.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_contadores_matricula'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiarioPresenca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data da Aula')),
+                ('presentes', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Presentes')),
+                ('ausentes', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Ausentes')),
+                ('justificados', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Justificados')),
+                ('turma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_diarios', to='api.turma')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Presenças',
+                'verbose_name_plural': 'Resumos Diários de Presenças',
+                'ordering': ['-data'],
+                'unique_together': {('turma', 'data')},
+            },
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
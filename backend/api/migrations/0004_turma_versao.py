@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-16 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_resumo_diario_presenca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='turma',
+            name='versao',
+            field=models.PositiveBigIntegerField(default=1, editable=False, verbose_name='Versão'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-16 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_turma_versao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='presenca',
+            index=models.Index(fields=['data', 'id'], name='presenca_data_id_idx'),
+        ),
+    ]
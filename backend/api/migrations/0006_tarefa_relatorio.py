@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-16 23:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_presenca_data_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaRelatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parametros', models.JSONField(verbose_name='Parâmetros')),
+                ('status', models.CharField(choices=[('Pendente', 'Pendente'), ('Processando', 'Processando'), ('Concluída', 'Concluída'), ('Erro', 'Erro')], default='Pendente', max_length=20, verbose_name='Status')),
+                ('arquivo', models.FileField(blank=True, upload_to='relatorios/', verbose_name='Arquivo')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('tentativas', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('solicitante', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tarefas_relatorio', to=settings.AUTH_USER_MODEL, verbose_name='Solicitante')),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Relatório',
+                'verbose_name_plural': 'Tarefas de Relatório',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='tarefa_fila_idx')],
+            },
+        ),
+    ]
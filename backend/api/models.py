@@ -1,8 +1,29 @@
-from django.db import models
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .cache import invalidar_cache_publico, invalidar_medias_turmas
+
+
+def alteracoes_contadores(contadores_por_status, status_removido=None, status_adicionado=None, campo_total=None):
+    """
+    Monta as expressões F() que aplicam a remoção/adição de uma presença
+    aos campos contadores de um modelo agregado.
+    """
+    deltas = Counter()
+    for status_presenca, delta in ((status_removido, -1), (status_adicionado, 1)):
+        if status_presenca is not None:
+            deltas[contadores_por_status[status_presenca]] += delta
+            if campo_total:
+                deltas[campo_total] += delta
+    return {campo: F(campo) + delta for campo, delta in deltas.items() if delta}
+
 class Professor(models.Model):
     """
     Entidade A: Representa os docentes responsáveis por turmas.
@@ -121,6 +142,9 @@ class Turma(models.Model):
         verbose_name="Aluno Representante"
     )
     
+    # Incrementada a cada alteração da turma, de suas matrículas ou presenças (ETag)
+    versao = models.PositiveBigIntegerField(default=1, editable=False, verbose_name="Versão")
+    
     class Meta:
         verbose_name = "Turma"
         verbose_name_plural = "Turmas"
@@ -129,6 +153,30 @@ class Turma(models.Model):
     def __str__(self):
         return f"{self.nome} - {self.professor.nome}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda o professor carregado: trocar de professor muda o total de turmas dos dois
+        instance._professor_original = instance.__dict__.get('professor_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Incrementa a versão da turma a cada alteração"""
+        alterando = not self._state.adding
+        if alterando:
+            self.versao = F('versao') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'versao'}
+        super().save(*args, **kwargs)
+        if alterando:
+            self.refresh_from_db(fields=['versao'])
+        self._professor_original = self.professor_id
+    
+    @classmethod
+    def incrementar_versao(cls, turmas):
+        """Incrementa a versão das turmas indicadas (lista de ids ou queryset) em um UPDATE."""
+        return cls.objects.filter(pk__in=turmas).update(versao=F('versao') + 1)
+    
     @property
     def esta_ativa(self):
         """Verifica se a turma está ativa"""
@@ -157,6 +205,30 @@ class Matricula(models.Model):
         validators=[MinValueValidator(0)]
     )
     
+    # Contadores mantidos incrementalmente pelas escritas em Presenca
+    ausencia_acumulada = models.IntegerField(
+        default=0,
+        verbose_name="Ausências Acumuladas",
+        validators=[MinValueValidator(0)]
+    )
+    justificado_acumulado = models.IntegerField(
+        default=0,
+        verbose_name="Faltas Justificadas Acumuladas",
+        validators=[MinValueValidator(0)]
+    )
+    total_aulas = models.IntegerField(
+        default=0,
+        verbose_name="Total de Aulas Registradas",
+        validators=[MinValueValidator(0)]
+    )
+    
+    # Campo contador correspondente a cada status de Presenca
+    CONTADORES_POR_STATUS = {
+        'Presente': 'presenca_acumulada',
+        'Ausente': 'ausencia_acumulada',
+        'Justificado': 'justificado_acumulado',
+    }
+    
     class Meta:
         verbose_name = "Matrícula"
         verbose_name_plural = "Matrículas"
@@ -166,11 +238,105 @@ class Matricula(models.Model):
     def __str__(self):
         return f"{self.aluno.nome} em {self.turma.nome}"
     
-    def taxa_presenca(self, total_aulas):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda a turma carregada: trocar de turma move as presenças de resumo
+        instance._turma_original = instance.__dict__.get('turma_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Na troca de turma, refaz os resumos diários das duas turmas nos dias com presença"""
+        turma_antiga = None
+        if not self._state.adding:
+            turma_antiga = getattr(self, '_turma_original', None)
+            if turma_antiga is None:
+                turma_antiga = Matricula.objects.filter(pk=self.pk).values_list('turma_id', flat=True).first()
+        
+        if turma_antiga is None or turma_antiga == self.turma_id:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                datas = list(self.presencas.order_by().values_list('data', flat=True).distinct())
+                if datas:
+                    ResumoDiarioPresenca.recalcular(turmas=[turma_antiga, self.turma_id], datas=datas)
+                # A versão da turma nova é incrementada pelo sinal post_save
+                Turma.incrementar_versao([turma_antiga])
+        
+        self._turma_original = self.turma_id
+    
+    def taxa_presenca(self, total_aulas=None):
         """Calcula a taxa de presença do aluno na turma"""
+        if total_aulas is None:
+            total_aulas = self.total_aulas
+        return self.calcular_taxa_presenca(self.presenca_acumulada, total_aulas)
+    
+    @staticmethod
+    def calcular_taxa_presenca(presencas, total_aulas):
+        """Taxa de presença a partir dos contadores (também usada sem instância, ex.: linhas de values())"""
         if total_aulas > 0:
-            return (self.presenca_acumulada / total_aulas) * 100
+            return (presencas / total_aulas) * 100
         return 0
+    
+    @classmethod
+    def atualizar_contadores(cls, matricula_id, status_removido=None, status_adicionado=None):
+        """
+        Aplica o delta de uma escrita em Presenca aos contadores da matrícula.
+        Usa expressões F() para que a atualização seja um único UPDATE atômico.
+        """
+        alteracoes = alteracoes_contadores(
+            cls.CONTADORES_POR_STATUS, status_removido, status_adicionado, campo_total='total_aulas'
+        )
+        if alteracoes:
+            cls.objects.filter(pk=matricula_id).update(**alteracoes)
+    
+    @classmethod
+    def recalcular_contadores(cls, matriculas=None):
+        """
+        Recalcula os contadores a partir da tabela Presenca em um único UPDATE.
+        Aceita um queryset ou lista de ids; sem argumento, recalcula todas.
+        """
+        queryset = cls.objects.all()
+        if matriculas is not None:
+            queryset = queryset.filter(pk__in=matriculas)
+        
+        def contagem(**filtros):
+            subquery = Presenca.objects.filter(
+                matricula=OuterRef('pk'), **filtros
+            ).order_by().values('matricula').annotate(total=Count('id')).values('total')
+            return Coalesce(Subquery(subquery), Value(0))
+        
+        alteracoes = {
+            campo: contagem(status=status_presenca)
+            for status_presenca, campo in cls.CONTADORES_POR_STATUS.items()
+        }
+        alteracoes['total_aulas'] = contagem()
+        return queryset.update(**alteracoes)
+
+class PresencaQuerySet(models.QuerySet):
+    
+    def delete(self):
+        """
+        Remoção em lote: os contadores das matrículas e os resumos dos dias
+        afetados são recalculados uma vez, e não presença por presença.
+        """
+        with transaction.atomic():
+            afetadas = list(
+                self.order_by().values_list('matricula_id', 'matricula__turma_id', 'data').distinct()
+            )
+            resultado = super().delete()
+            if afetadas:
+                matriculas, turmas, datas = (set(coluna) for coluna in zip(*afetadas))
+                Matricula.recalcular_contadores(matriculas)
+                ResumoDiarioPresenca.recalcular(turmas=turmas, datas=datas)
+                Turma.incrementar_versao(turmas)
+                invalidar_cache_publico()
+        return resultado
+    
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class Presenca(models.Model):
     """
@@ -198,33 +364,343 @@ class Presenca(models.Model):
     observacao = models.TextField(blank=True, verbose_name="Observação")
     data_registro = models.DateTimeField(auto_now_add=True, verbose_name="Data do Registro")
     
+    objects = PresencaQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Presença"
         verbose_name_plural = "Presenças"
         unique_together = ['matricula', 'data']  # Um aluno só pode ter um registro por dia
         ordering = ['-data', 'matricula__aluno__nome']
+        indexes = [
+            # Chave da paginação por cursor (PresencaPaginacao)
+            models.Index(fields=['data', 'id'], name='presenca_data_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.matricula.aluno.nome} - {self.data} - {self.status}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda o estado carregado para calcular deltas sem um SELECT extra
+        instance._estado_original = (
+            instance.__dict__.get('matricula_id'),
+            instance.__dict__.get('data'),
+            instance.__dict__.get('status'),
+        )
+        return instance
+    
+    def estado_atual(self):
+        """Retorna a chave (matricula_id, data, status) usada pelos agregados."""
+        return (self.matricula_id, self._meta.get_field('data').to_python(self.data), self.status)
+    
+    def estado_persistido(self):
+        """Retorna o estado gravado no banco, preferindo o capturado ao carregar."""
+        estado = getattr(self, '_estado_original', None)
+        if estado is None or None in estado:
+            estado = Presenca.objects.filter(pk=self.pk).values_list(
+                'matricula_id', 'data', 'status'
+            ).get()
+        return estado
+    
     def save(self, *args, **kwargs):
-        """Atualiza presenca_acumulada quando status é alterado"""
-        is_new = self.pk is None
-        old_status = None
+        """Atualiza os contadores da matrícula e o resumo diário da turma"""
+        antigo = None if self._state.adding else self.estado_persistido()
         
-        if not is_new:
-            old_presenca = Presenca.objects.get(pk=self.pk)
-            old_status = old_presenca.status
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            novo = self.estado_atual()
+            if antigo != novo:
+                self.atualizar_agregados(antigo, novo)
         
-        super().save(*args, **kwargs)
+        self._estado_original = novo
+    
+    def delete(self, *args, **kwargs):
+        """Desconta a presença removida dos contadores da matrícula e do resumo diário"""
+        estado = getattr(self, '_estado_original', None)
+        if estado is None or None in estado:
+            estado = self.estado_atual()
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            self.atualizar_agregados(estado, None)
+            invalidar_cache_publico()
+        return resultado
+    
+    def atualizar_agregados(self, antigo, novo):
+        """
+        Propaga a troca do estado `antigo` pelo `novo` aos agregados derivados.
+        Qualquer um dos dois pode ser None (criação ou remoção).
+        """
+        matricula_antiga, data_antiga, status_antigo = antigo or (None, None, None)
+        matricula_nova, data_nova, status_novo = novo or (None, None, None)
+        
+        # Contadores da matrícula
+        if matricula_antiga == matricula_nova:
+            Matricula.atualizar_contadores(matricula_nova, status_antigo, status_novo)
+        else:
+            if antigo:
+                Matricula.atualizar_contadores(matricula_antiga, status_removido=status_antigo)
+            if novo:
+                Matricula.atualizar_contadores(matricula_nova, status_adicionado=status_novo)
         
-        # Atualiza contador acumulado
-        if is_new or old_status != self.status:
-            self.atualizar_presenca_acumulada()
+        # Resumo diário da turma
+        turma_antiga = self._turma_da_matricula(matricula_antiga) if antigo else None
+        if matricula_nova == matricula_antiga:
+            turma_nova = turma_antiga
+        else:
+            turma_nova = self._turma_da_matricula(matricula_nova) if novo else None
+        
+        if antigo and novo and (turma_antiga, data_antiga) == (turma_nova, data_nova):
+            ResumoDiarioPresenca.aplicar_delta(turma_nova, data_nova, status_antigo, status_novo)
+        else:
+            if antigo:
+                ResumoDiarioPresenca.aplicar_delta(turma_antiga, data_antiga, status_removido=status_antigo)
+            if novo:
+                ResumoDiarioPresenca.aplicar_delta(turma_nova, data_nova, status_adicionado=status_novo)
+        
+        # Versão (ETag) das turmas afetadas
+        Turma.incrementar_versao({turma_antiga, turma_nova} - {None})
+    
+    def _turma_da_matricula(self, matricula_id):
+        """Obtém o turma_id da matrícula, reaproveitando a relação já carregada."""
+        if matricula_id == self.matricula_id and self._meta.get_field('matricula').is_cached(self):
+            return self.matricula.turma_id
+        return Matricula.objects.filter(pk=matricula_id).values_list('turma_id', flat=True).first()
+
+
+class ResumoDiarioPresenca(models.Model):
+    """
+    Agregado materializado das presenças de uma turma em um dia.
+    Mantido incrementalmente a cada escrita em Presenca e reconstruível
+    pelo comando `rebuild_resumo_diario`.
+    """
+    turma = models.ForeignKey(
+        Turma,
+        on_delete=models.CASCADE,
+        related_name='resumos_diarios'
+    )
+    data = models.DateField(verbose_name="Data da Aula")
+    presentes = models.IntegerField(default=0, validators=[MinValueValidator(0)], verbose_name="Presentes")
+    ausentes = models.IntegerField(default=0, validators=[MinValueValidator(0)], verbose_name="Ausentes")
+    justificados = models.IntegerField(default=0, validators=[MinValueValidator(0)], verbose_name="Justificados")
+    
+    CONTADORES_POR_STATUS = {
+        'Presente': 'presentes',
+        'Ausente': 'ausentes',
+        'Justificado': 'justificados',
+    }
+    
+    class Meta:
+        verbose_name = "Resumo Diário de Presenças"
+        verbose_name_plural = "Resumos Diários de Presenças"
+        unique_together = ['turma', 'data']
+        ordering = ['-data']
+    
+    def __str__(self):
+        return f"{self.turma_id} - {self.data}: {self.presentes}/{self.total}"
+    
+    @property
+    def total(self):
+        return self.presentes + self.ausentes + self.justificados
+    
+    @classmethod
+    def somas(cls, prefixo=''):
+        """
+        Expressões de soma dos contadores, para aggregate() ou annotate().
+        Gera as chaves total_presentes, total_ausentes, total_justificados e total.
+        `prefixo` permite somar a partir de outro modelo (ex.: 'resumos_diarios__').
+        """
+        expressoes = {
+            f'total_{campo}': Coalesce(Sum(f'{prefixo}{campo}'), Value(0))
+            for campo in cls.CONTADORES_POR_STATUS.values()
+        }
+        expressoes['total'] = Coalesce(
+            Sum(F(f'{prefixo}presentes') + F(f'{prefixo}ausentes') + F(f'{prefixo}justificados')),
+            Value(0)
+        )
+        return expressoes
+    
+    @classmethod
+    def aplicar_delta(cls, turma_id, data, status_removido=None, status_adicionado=None):
+        """Aplica a remoção/adição de uma presença ao resumo do dia com um UPDATE atômico."""
+        alteracoes = alteracoes_contadores(cls.CONTADORES_POR_STATUS, status_removido, status_adicionado)
+        if not alteracoes or turma_id is None:
+            return
+        invalidar_medias_turmas([turma_id])
+        
+        atualizados = cls.objects.filter(turma_id=turma_id, data=data).update(**alteracoes)
+        if atualizados or status_removido is not None:
+            return
+        
+        # Primeira presença da turma no dia: criar a linha do resumo
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    turma_id=turma_id,
+                    data=data,
+                    **{cls.CONTADORES_POR_STATUS[status_adicionado]: 1}
+                )
+        except IntegrityError:
+            # Outra escrita concorrente criou a linha primeiro
+            cls.objects.filter(turma_id=turma_id, data=data).update(**alteracoes)
+    
+    @classmethod
+    def recalcular(cls, turmas=None, datas=None):
+        """
+        Reconstrói os resumos a partir da tabela Presenca.
+        Restringe a reconstrução às turmas e/ou datas informadas.
+        """
+        presencas = Presenca.objects.all()
+        resumos = cls.objects.all()
+        if turmas is not None:
+            presencas = presencas.filter(matricula__turma__in=turmas)
+            resumos = resumos.filter(turma__in=turmas)
+        if datas is not None:
+            presencas = presencas.filter(data__in=datas)
+            resumos = resumos.filter(data__in=datas)
+        
+        agregados = presencas.order_by().values('matricula__turma_id', 'data').annotate(
+            **{
+                campo: Count('id', filter=Q(status=status_presenca))
+                for status_presenca, campo in cls.CONTADORES_POR_STATUS.items()
+            }
+        )
+        
+        with transaction.atomic():
+            resumos.delete()
+            criados = cls.objects.bulk_create(
+                (
+                    cls(
+                        turma_id=item['matricula__turma_id'],
+                        data=item['data'],
+                        presentes=item['presentes'],
+                        ausentes=item['ausentes'],
+                        justificados=item['justificados']
+                    )
+                    for item in agregados.iterator(chunk_size=2000)
+                ),
+                batch_size=1000
+            )
+        invalidar_medias_turmas(
+            turmas if turmas is not None else Turma.objects.values_list('pk', flat=True)
+        )
+        return len(criados)
+
+
+class TarefaRelatorio(models.Model):
+    """
+    Relatório de presenças gerado em segundo plano.
+    Criada pela API como Pendente e processada pelo comando run_report_worker,
+    que grava o resultado em `arquivo`.
+    """
+    STATUS_CHOICES = [
+        ('Pendente', 'Pendente'),
+        ('Processando', 'Processando'),
+        ('Concluída', 'Concluída'),
+        ('Erro', 'Erro'),
+    ]
+    
+    # Tarefa sem renovação (iniciado_em) há mais tempo que isso volta para a fila (worker interrompido)
+    TEMPO_LIMITE = timedelta(minutes=30)
+    # Intervalo máximo com que o worker renova iniciado_em durante o processamento
+    INTERVALO_RENOVACAO = timedelta(minutes=1)
+    # Tarefa que interrompeu o worker em todas essas tentativas vai para Erro em vez de voltar à fila
+    MAXIMO_TENTATIVAS = 3
+    
+    parametros = models.JSONField(verbose_name="Parâmetros")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='Pendente',
+        verbose_name="Status"
+    )
+    solicitante = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tarefas_relatorio',
+        verbose_name="Solicitante"
+    )
+    arquivo = models.FileField(upload_to='relatorios/', blank=True, verbose_name="Arquivo")
+    erro = models.TextField(blank=True, verbose_name="Erro")
+    worker = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    tentativas = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    # Renovado pelo worker enquanto processa: é o último sinal de vida da tarefa
+    iniciado_em = models.DateTimeField(null=True, blank=True, verbose_name="Iniciado em")
+    concluido_em = models.DateTimeField(null=True, blank=True, verbose_name="Concluído em")
+    
+    class Meta:
+        verbose_name = "Tarefa de Relatório"
+        verbose_name_plural = "Tarefas de Relatório"
+        ordering = ['-criado_em']
+        indexes = [
+            # Busca da próxima tarefa da fila
+            models.Index(fields=['status', 'criado_em'], name='tarefa_fila_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Relatório #{self.pk} ({self.status})"
+    
+    @classmethod
+    def reivindicar(cls, worker, tempo_limite=TEMPO_LIMITE, maximo_tentativas=MAXIMO_TENTATIVAS):
+        """
+        Marca a próxima tarefa da fila como Processando para este worker.
+        
+        No PostgreSQL, SELECT ... FOR UPDATE SKIP LOCKED deixa vários workers
+        buscarem em paralelo sem esperar uns pelos outros. A troca de status é
+        condicional ao estado lido, então mesmo sem o lock (SQLite) só um worker
+        fica com cada tarefa.
+        
+        Uma tarefa Processando sem renovação há `tempo_limite` perdeu o seu
+        worker: volta para a fila ou, depois de `maximo_tentativas`, vai para Erro.
+        """
+        agora = timezone.now()
+        abandonadas = Q(status='Processando', iniciado_em__lt=agora - tempo_limite)
+        cls.objects.filter(abandonadas, tentativas__gte=maximo_tentativas).update(
+            status='Erro',
+            erro=f'O processamento foi interrompido em {maximo_tentativas} tentativas',
+            concluido_em=agora
+        )
+        fila = cls.objects.filter(
+            Q(status='Pendente') | (abandonadas & Q(tentativas__lt=maximo_tentativas))
+        ).order_by('criado_em', 'id')
+        
+        while True:
+            with transaction.atomic():
+                tarefa = fila.select_for_update(skip_locked=True).first()
+                if tarefa is None:
+                    return None
+                reivindicada = cls.objects.filter(
+                    pk=tarefa.pk, status=tarefa.status, iniciado_em=tarefa.iniciado_em
+                ).update(
+                    status='Processando',
+                    worker=worker,
+                    iniciado_em=agora,
+                    tentativas=F('tentativas') + 1
+                )
+            if reivindicada:
+                tarefa.refresh_from_db()
+                return tarefa
+            # Outro worker levou esta tarefa: tentar a seguinte
+    
+    def renovar(self):
+        """
+        Renova iniciado_em enquanto este worker ainda detém a tarefa, adiando a
+        volta dela para a fila. Retorna False se a tarefa foi reivindicada por outro.
+        """
+        agora = timezone.now()
+        renovada = TarefaRelatorio.objects.filter(
+            pk=self.pk, status='Processando', worker=self.worker, iniciado_em=self.iniciado_em
+        ).update(iniciado_em=agora)
+        if renovada:
+            self.iniciado_em = agora
+        return bool(renovada)
     
-    def atualizar_presenca_acumulada(self):
-        """Atualiza o contador de presenças na matrícula"""
-        matricula = self.matricula
-        total_presente = matricula.presencas.filter(status='Presente').count()
-        matricula.presenca_acumulada = total_presente
-        matricula.save()
\ No newline at end of file
+    def concluir(self, erro=''):
+        """Registra o fim do processamento (com ou sem erro)."""
+        self.status = 'Erro' if erro else 'Concluída'
+        self.erro = erro
+        self.concluido_em = timezone.now()
+        self.save(update_fields=['status', 'erro', 'arquivo', 'concluido_em'])
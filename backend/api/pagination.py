@@ -0,0 +1,138 @@
+"""
+Paginação das listagens da API.
+"""
+
+import json
+from types import SimpleNamespace
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+
+class PaginacaoKeyset(CursorPagination):
+    """
+    Paginação por cursor (keyset) sobre uma chave composta e única, ex.: (data, id).
+
+    O CursorPagination do DRF posiciona o cursor apenas pelo primeiro campo da
+    ordenação e resolve empates com OFFSET. Aqui o cursor guarda todos os campos
+    da chave e cada página é um `WHERE (data, id) < (d, i) ORDER BY ... LIMIT n`,
+    com o mesmo custo em qualquer profundidade. O cursor continua opaco (base64)
+    e a ordenação do cliente (?ordering=) não se aplica.
+    """
+
+    ordering = ('-id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.modelo = queryset.model
+        self.cursor = self.decode_cursor(request)
+        reverso = self.cursor is not None and self.cursor.reverse
+
+        # Página anterior: percorre a chave no sentido inverso e desinverte o resultado
+        ordenacao = [self.inverter(campo) for campo in self.ordering] if reverso else list(self.ordering)
+        queryset = queryset.order_by(*ordenacao)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.depois_de(ordenacao, self.decodificar_posicao(self.cursor.position)))
+
+        # Uma linha a mais indica se existe outra página no mesmo sentido
+        resultados = list(queryset[:self.page_size + 1])
+        tem_mais = len(resultados) > self.page_size
+        self.page = resultados[:self.page_size]
+        if reverso:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, tem_mais
+        else:
+            self.has_next, self.has_previous = tem_mais, self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            posicao = self.posicao_de(self.page[-1])
+        else:
+            # Página vazia vinda de um link "anterior": recomeça do cursor
+            posicao = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=posicao))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            posicao = self.posicao_de(self.page[0])
+        else:
+            posicao = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=posicao))
+
+    # ========== CHAVE ==========
+
+    @staticmethod
+    def inverter(campo):
+        return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+    def campos(self):
+        return [campo.lstrip('-') for campo in self.ordering]
+
+    def posicao_de(self, instancia):
+        """Valores da chave de uma linha (instância ou dict de values()), serializados para o cursor."""
+        if isinstance(instancia, dict):
+            instancia = SimpleNamespace(**{
+                self.modelo._meta.get_field(campo).attname: instancia[campo] for campo in self.campos()
+            })
+        return json.dumps([
+            self.modelo._meta.get_field(campo).value_to_string(instancia)
+            for campo in self.campos()
+        ])
+
+    def decodificar_posicao(self, posicao):
+        """Converte a posição do cursor de volta para os tipos dos campos."""
+        try:
+            valores = json.loads(posicao)
+            if not isinstance(valores, list) or len(valores) != len(self.ordering):
+                raise ValueError(posicao)
+            return [
+                self.modelo._meta.get_field(campo).to_python(valor)
+                for campo, valor in zip(self.campos(), valores)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def depois_de(ordenacao, valores):
+        """
+        Filtro das linhas posteriores à posição na ordenação dada, ex.:
+        (data < d) OR (data = d AND id < i) para ('-data', '-id').
+        """
+        condicao = Q()
+        iguais = {}
+        for campo, valor in zip(ordenacao, valores):
+            nome = campo.lstrip('-')
+            comparacao = 'lt' if campo.startswith('-') else 'gt'
+            condicao |= Q(**iguais, **{f'{nome}__{comparacao}': valor})
+            iguais[nome] = valor
+        return condicao
+
+
+class PresencaPaginacao(PaginacaoKeyset):
+    """Presenças da mais recente para a mais antiga, desempatando pelo id."""
+
+    ordering = ('-data', '-id')
+    page_size = 50
+
+
+class RankingPaginacao(PageNumberPagination):
+    """Páginas do ranking de faltas; a posição de cada linha vem do próprio ranking."""
+
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
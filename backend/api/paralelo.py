@@ -0,0 +1,92 @@
+"""
+Consultas independentes executadas em paralelo.
+
+Os dashboards fazem várias consultas agregadas que não dependem umas das
+outras. executar_em_paralelo() roda cada bloco em uma thread de um pool, cada
+uma com a sua conexão com o banco: a resposta leva o tempo do bloco mais
+lento, e não a soma de todos. Funciona no WSGI e no ASGI (no ASGI a view
+síncrona roda na thread do Django e os blocos saem dela para o pool); o
+banco faz o trabalho e libera o GIL enquanto isso.
+
+Os blocos rodam em sequência, na thread da requisição, quando
+API_CONSULTAS_PARALELAS <= 1 ou dentro de uma transação: as conexões das
+outras threads não veriam as escritas ainda não confirmadas (nos testes,
+tudo roda dentro de uma transação).
+
+O pool é compartilhado pelas requisições do processo, mas um bloco só vai
+para ele se houver uma thread livre: com o pool ocupado por outras
+requisições, o bloco roda na thread da própria requisição em vez de entrar
+na fila atrás das outras.
+
+Cada bloco deve devolver dados já avaliados (ex.: list(queryset)): um
+queryset preguiçoso seria consultado de volta na thread da requisição.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+
+_pool = None
+# Threads livres do pool (um bloco só é enviado se reservar uma)
+_livres = None
+_trava = threading.Lock()
+_local = threading.local()
+
+
+def maximo_threads():
+    """Threads do pool; 1 (ou 0) desativa o paralelismo."""
+    return getattr(settings, 'API_CONSULTAS_PARALELAS', 4)
+
+
+def pool():
+    global _pool, _livres
+    with _trava:
+        if _pool is None:
+            _livres = threading.Semaphore(maximo_threads())
+            _pool = ThreadPoolExecutor(max_workers=maximo_threads(), thread_name_prefix='consultas')
+    return _pool
+
+
+def em_transacao():
+    return any(conexao.in_atomic_block for conexao in connections.all(initialized_only=True))
+
+
+def _executar_bloco(bloco):
+    _local.no_pool = True
+    try:
+        return bloco()
+    finally:
+        # Como ao fim de uma requisição: fecha as conexões vencidas (CONN_MAX_AGE) ou com erro
+        close_old_connections()
+        _livres.release()
+
+
+def executar_em_paralelo(**blocos):
+    """
+    Executa os blocos (funções sem argumentos) e devolve {nome: resultado}.
+    A exceção de um bloco é relançada na thread da requisição.
+    """
+    if (
+        len(blocos) < 2
+        or maximo_threads() <= 1
+        or getattr(_local, 'no_pool', False)  # bloco chamando blocos: evita esperar pelo próprio pool
+        or em_transacao()
+    ):
+        return {nome: bloco() for nome, bloco in blocos.items()}
+
+    executor = pool()
+    futuros = {}
+    for nome, bloco in blocos.items():
+        if not _livres.acquire(blocking=False):
+            break
+        # copy_context(): os blocos herdam o contexto da requisição (ex.: ler_da_replica)
+        futuros[nome] = executor.submit(copy_context().run, _executar_bloco, bloco)
+
+    # Pool ocupado: os blocos que sobraram rodam aqui, enquanto os enviados executam
+    locais = {nome: bloco() for nome, bloco in blocos.items() if nome not in futuros}
+    resultados = {nome: futuro.result() for nome, futuro in futuros.items()}
+    return {nome: resultados[nome] if nome in resultados else locais[nome] for nome in blocos}
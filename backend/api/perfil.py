@@ -0,0 +1,179 @@
+"""
+Perfil das requisições: onde o tempo de cada resposta foi gasto.
+
+Com API_PERFIL_REQUISICOES ativo, PerfilRequisicaoMiddleware mede cada
+requisição e devolve o resultado no cabeçalho Server-Timing (visível na aba
+Network do navegador) e em uma linha JSON no logger 'api.perfil':
+
+- total: do início ao fim do middleware (sem o envio do corpo em streaming);
+- db: tempo somado das consultas e número de consultas, inclusive as feitas
+  nas threads de api/paralelo.py (a soma pode passar do total);
+- render: renderização da resposta do DRF (JSON, HTML navegável);
+- app: o restante (autenticação, lógica da view e serializers);
+- mem: pico de memória alocada durante a requisição, só com
+  API_PERFIL_MEMORIA (tracemalloc deixa o processo mais lento e mede o
+  processo inteiro: com requisições simultâneas o pico é aproximado).
+
+Desativado, o middleware sai da pilha (MiddlewareNotUsed) e não custa nada.
+"""
+
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger('api.perfil')
+
+# Medição da requisição em andamento (herdada pelas threads de api/paralelo.py)
+_medicao_atual = ContextVar('medicao_atual', default=None)
+
+
+class Medicao:
+    """Tempos (segundos) e contagens de uma requisição."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.total = 0.0
+        self.db = 0.0
+        self.consultas = 0
+        self.render = 0.0
+        self.pico_memoria = None
+        self._trava = threading.Lock()
+
+    def somar_consulta(self, duracao):
+        with self._trava:
+            self.db += duracao
+            self.consultas += 1
+
+    @property
+    def app(self):
+        return max(self.total - self.db - self.render, 0.0)
+
+    def server_timing(self):
+        metricas = [
+            f'total;dur={self.total * 1000:.1f}',
+            f'db;dur={self.db * 1000:.1f};desc="{self.consultas} consultas"',
+            f'app;dur={self.app * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+        ]
+        if self.pico_memoria is not None:
+            metricas.append(f'mem;desc="{self.pico_memoria // 1024} KiB"')
+        return ', '.join(metricas)
+
+    def como_dict(self):
+        return {
+            'total_ms': round(self.total * 1000, 2),
+            'db_ms': round(self.db * 1000, 2),
+            'consultas': self.consultas,
+            'app_ms': round(self.app * 1000, 2),
+            'render_ms': round(self.render * 1000, 2),
+            'pico_memoria_kib': self.pico_memoria // 1024 if self.pico_memoria is not None else None,
+        }
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    """execute_wrapper instalado em todas as conexões; só mede dentro de uma requisição medida."""
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.somar_consulta(time.perf_counter() - inicio)
+
+
+def _instalar_em(conexao):
+    if _medir_consulta not in conexao.execute_wrappers:
+        conexao.execute_wrappers.append(_medir_consulta)
+
+
+def _conexao_criada(sender, connection, **kwargs):
+    _instalar_em(connection)
+
+
+def instalar_medidor():
+    """Mede as consultas de toda conexão nova e das já abertas nesta thread."""
+    connection_created.connect(_conexao_criada, dispatch_uid='api-perfil-medidor')
+    for conexao in connections.all(initialized_only=True):
+        _instalar_em(conexao)
+
+
+def medicao_atual():
+    """Medição da requisição em andamento, ou None."""
+    return _medicao_atual.get()
+
+
+@contextmanager
+def medir_requisicao():
+    """
+    Mede o bloco (uma requisição). Se a requisição já está sendo medida (ex.:
+    perfil e métricas ativos juntos), devolve a mesma medição sem reiniciá-la;
+    o total só é preenchido por quem a iniciou.
+    """
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        yield medicao
+        return
+
+    instalar_medidor()
+    medicao = Medicao()
+    token = _medicao_atual.set(medicao)
+    try:
+        yield medicao
+    finally:
+        _medicao_atual.reset(token)
+        medicao.total = time.perf_counter() - medicao.inicio
+
+
+class PerfilRequisicaoMiddleware:
+    """Mede cada requisição; deve ser o primeiro de MIDDLEWARE para o total incluir os demais."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_PERFIL_REQUISICOES', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.memoria = getattr(settings, 'API_PERFIL_MEMORIA', False)
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __call__(self, request):
+        if self.memoria:
+            tracemalloc.reset_peak()
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+        with medir_requisicao() as medicao:
+            response = self.get_response(request)
+
+        if self.memoria:
+            medicao.pico_memoria = max(tracemalloc.get_traced_memory()[1] - memoria_inicial, 0)
+
+        response['Server-Timing'] = medicao.server_timing()
+        logger.info(json.dumps({
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'usuario': getattr(getattr(request, 'user', None), 'pk', None),
+            **medicao.como_dict(),
+        }))
+        return response
+
+    def process_template_response(self, request, response):
+        """Chamado logo antes de response.render(): mede a renderização até o fim dela."""
+        medicao = _medicao_atual.get()
+        if medicao is not None:
+            inicio = time.perf_counter()
+
+            def fim_render(resposta):
+                medicao.render += time.perf_counter() - inicio
+
+            response.add_post_render_callback(fim_render)
+        return response
@@ -1,10 +1,14 @@
 """
 Permissões personalizadas para o Sistema de Chamada de Alunos.
 Define regras de acesso baseadas nos perfis: Admin, Professor, Aluno.
+
+O perfil vem de obter_principal(request), resolvido uma vez por requisição;
+as comparações usam os ids (obj.professor_id) para não carregar relações.
 """
 
 from rest_framework import permissions
-from .models import Professor, Aluno, Turma, Matricula
+from .models import Professor, Aluno, Matricula
+from .principal import obter_principal
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -35,11 +39,7 @@ class IsProfessor(permissions.BasePermission):
     Verifica se o usuário é um Professor
     """
     def has_permission(self, request, view):
-        return bool(
-            request.user and 
-            request.user.is_authenticated and 
-            hasattr(request.user, 'professor')
-        )
+        return obter_principal(request).is_professor
 
 
 class IsAluno(permissions.BasePermission):
@@ -47,11 +47,7 @@ class IsAluno(permissions.BasePermission):
     Verifica se o usuário é um Aluno
     """
     def has_permission(self, request, view):
-        return bool(
-            request.user and 
-            request.user.is_authenticated and 
-            hasattr(request.user, 'aluno')
-        )
+        return obter_principal(request).is_aluno
 
 
 class IsProfessorOrAdmin(permissions.BasePermission):
@@ -59,34 +55,29 @@ class IsProfessorOrAdmin(permissions.BasePermission):
     Permissão para Professores OU Administradores
     """
     def has_permission(self, request, view):
-        return bool(
-            request.user and 
-            request.user.is_authenticated and 
-            (request.user.is_staff or hasattr(request.user, 'professor'))
-        )
+        principal = obter_principal(request)
+        return principal.is_admin or principal.is_professor
     
     def has_object_permission(self, request, view, obj):
+        principal = obter_principal(request)
+        
         # Administradores têm acesso total
-        if request.user.is_staff:
+        if principal.is_admin:
             return True
         
         # Professores só podem acessar seus próprios dados
-        if hasattr(request.user, 'professor'):
+        if principal.is_professor:
             # Se o objeto for um Professor
             if isinstance(obj, Professor):
-                return obj == request.user.professor
+                return obj.pk == principal.professor_id
             
-            # Se o objeto tiver relação com Professor
-            if hasattr(obj, 'professor'):
-                return obj.professor == request.user.professor
-            
-            # Se o objeto for uma Turma
-            if isinstance(obj, Turma):
-                return obj.professor == request.user.professor
+            # Se o objeto tiver relação com Professor (ex.: Turma)
+            if hasattr(obj, 'professor_id'):
+                return obj.professor_id == principal.professor_id
             
             # Se o objeto for Matricula (acesso à turma do professor)
             if isinstance(obj, Matricula):
-                return obj.turma.professor == request.user.professor
+                return obj.turma.professor_id == principal.professor_id
         
         return False
 
@@ -96,30 +87,25 @@ class IsAlunoOrAdmin(permissions.BasePermission):
     Permissão para Alunos OU Administradores
     """
     def has_permission(self, request, view):
-        return bool(
-            request.user and 
-            request.user.is_authenticated and 
-            (request.user.is_staff or hasattr(request.user, 'aluno'))
-        )
+        principal = obter_principal(request)
+        return principal.is_admin or principal.is_aluno
     
     def has_object_permission(self, request, view, obj):
+        principal = obter_principal(request)
+        
         # Administradores têm acesso total
-        if request.user.is_staff:
+        if principal.is_admin:
             return True
         
         # Alunos só podem acessar seus próprios dados
-        if hasattr(request.user, 'aluno'):
+        if principal.is_aluno:
             # Se o objeto for um Aluno
             if isinstance(obj, Aluno):
-                return obj == request.user.aluno
+                return obj.pk == principal.aluno_id
             
-            # Se o objeto tiver relação com Aluno
-            if hasattr(obj, 'aluno'):
-                return obj.aluno == request.user.aluno
-            
-            # Se o objeto for Matricula do aluno
-            if isinstance(obj, Matricula):
-                return obj.aluno == request.user.aluno
+            # Se o objeto tiver relação com Aluno (ex.: Matricula)
+            if hasattr(obj, 'aluno_id'):
+                return obj.aluno_id == principal.aluno_id
         
         return False
 
@@ -131,31 +117,21 @@ class CanMarcarPresenca(permissions.BasePermission):
     - Professores: Apenas em suas próprias turmas
     """
     def has_permission(self, request, view):
-        # Apenas usuários autenticados podem marcar presenças
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        # Se for administrador ou professor
-        return request.user.is_staff or hasattr(request.user, 'professor')
+        # Apenas administradores ou professores autenticados podem marcar presenças
+        principal = obter_principal(request)
+        return principal.is_admin or principal.is_professor
     
     def has_object_permission(self, request, view, obj):
-        # Métodos de leitura permitidos para professores do curso
-        if request.method in permissions.SAFE_METHODS:
-            if request.user.is_staff:
-                return True
-            if hasattr(request.user, 'professor'):
-                # Verificar se o professor é dono da turma relacionada
-                if hasattr(obj, 'matricula') and hasattr(obj.matricula, 'turma'):
-                    return obj.matricula.turma.professor == request.user.professor
+        principal = obter_principal(request)
         
-        # Métodos de escrita
-        if request.user.is_staff:
+        # Administradores: leitura e escrita em qualquer turma
+        if principal.is_admin:
             return True
         
-        # Professor só pode marcar presença em suas turmas
-        if hasattr(request.user, 'professor'):
+        # Professor só lê e marca presença em suas turmas
+        if principal.is_professor:
             if hasattr(obj, 'matricula') and hasattr(obj.matricula, 'turma'):
-                return obj.matricula.turma.professor == request.user.professor
+                return obj.matricula.turma.professor_id == principal.professor_id
         
         return False
 
@@ -167,25 +143,25 @@ class CanGerenciarTurma(permissions.BasePermission):
     - Professores: Apenas suas próprias turmas (exceto criação)
     """
     def has_permission(self, request, view):
-        # Apenas usuários autenticados
-        if not request.user or not request.user.is_authenticated:
-            return False
+        principal = obter_principal(request)
         
         # Método POST (criar) apenas para administradores
         if request.method == 'POST':
-            return request.user.is_staff
+            return principal.is_admin
         
         # Outros métodos para admin ou professor
-        return request.user.is_staff or hasattr(request.user, 'professor')
+        return principal.is_admin or principal.is_professor
     
     def has_object_permission(self, request, view, obj):
+        principal = obter_principal(request)
+        
         # Administradores têm acesso total
-        if request.user.is_staff:
+        if principal.is_admin:
             return True
         
         # Professores só podem gerenciar suas próprias turmas
-        if hasattr(request.user, 'professor'):
-            return obj.professor == request.user.professor
+        if principal.is_professor:
+            return obj.professor_id == principal.professor_id
         
         return False
 
@@ -206,27 +182,29 @@ class CanVisualizarTurma(permissions.BasePermission):
         return request.user and request.user.is_authenticated
     
     def has_object_permission(self, request, view, obj):
+        principal = obter_principal(request)
+        
         # Métodos de leitura
         if request.method in permissions.SAFE_METHODS:
             # Se for acesso público (sem autenticação)
-            if not request.user or not request.user.is_authenticated:
+            if not principal.autenticado:
                 # Apenas dados básicos da turma
                 return True
             
             # Usuários autenticados podem ver detalhes
             # 1. Administradores veem tudo
-            if request.user.is_staff:
+            if principal.is_admin:
                 return True
             
             # 2. Professores veem suas turmas
-            if hasattr(request.user, 'professor'):
-                return obj.professor == request.user.professor
+            if principal.is_professor:
+                return obj.professor_id == principal.professor_id
             
             # 3. Alunos veem turmas onde estão matriculados
-            if hasattr(request.user, 'aluno'):
+            if principal.is_aluno:
                 return Matricula.objects.filter(
                     turma=obj, 
-                    aluno=request.user.aluno
+                    aluno_id=principal.aluno_id
                 ).exists()
             
             # 4. Outros usuários autenticados veem dados básicos
@@ -234,11 +212,11 @@ class CanVisualizarTurma(permissions.BasePermission):
         
         # Métodos de escrita (update, delete)
         # Apenas admin ou professor dono da turma
-        if request.user.is_staff:
+        if principal.is_admin:
             return True
         
-        if hasattr(request.user, 'professor'):
-            return obj.professor == request.user.professor
+        if principal.is_professor:
+            return obj.professor_id == principal.professor_id
         
         return False
 
@@ -264,26 +242,31 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     Permissão genérica: Dono do objeto OU Administrador
     """
     def has_object_permission(self, request, view, obj):
+        principal = obter_principal(request)
+        
         # Administradores têm acesso total
-        if request.user.is_staff:
+        if principal.is_admin:
             return True
         
+        if not principal.autenticado:
+            return False
+        
         # Verificar se o usuário é dono do objeto
         # 1. Objeto tem atributo 'usuario'
-        if hasattr(obj, 'usuario') and obj.usuario == request.user:
+        if hasattr(obj, 'usuario_id') and obj.usuario_id == principal.usuario.pk:
             return True
         
         # 2. Objeto tem atributo 'user'
-        if hasattr(obj, 'user') and obj.user == request.user:
+        if hasattr(obj, 'user_id') and obj.user_id == principal.usuario.pk:
             return True
         
         # 3. Objeto é um Professor
-        if isinstance(obj, Professor) and hasattr(request.user, 'professor'):
-            return obj == request.user.professor
+        if isinstance(obj, Professor) and principal.is_professor:
+            return obj.pk == principal.professor_id
         
         # 4. Objeto é um Aluno
-        if isinstance(obj, Aluno) and hasattr(request.user, 'aluno'):
-            return obj == request.user.aluno
+        if isinstance(obj, Aluno) and principal.is_aluno:
+            return obj.pk == principal.aluno_id
         
         return False
 
@@ -341,10 +324,11 @@ class AlunoPermission(permissions.BasePermission):
             return True
         
         # Modificação apenas para admin ou aluno dono
-        if request.user.is_staff:
+        principal = obter_principal(request)
+        if principal.is_admin:
             return True
         
-        if hasattr(request.user, 'aluno'):
-            return obj == request.user.aluno
+        if principal.is_aluno:
+            return obj.pk == principal.aluno_id
         
         return False
\ No newline at end of file
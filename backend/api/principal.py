@@ -0,0 +1,99 @@
+"""
+Papel do usuário da requisição (admin, professor, aluno).
+
+O perfil é resolvido uma vez por requisição, com uma consulta (select_related
+de professor e aluno), e guardado na própria requisição: permissões e views
+consultam o Principal em vez de repetir hasattr(request.user, 'professor'),
+que custa uma consulta a cada chamada. A resolução é feita sob demanda, e não
+em um middleware, porque a autenticação por token do DRF só acontece dentro
+da view; administradores nem chegam a consultar os perfis.
+"""
+
+from django.contrib.auth.models import User
+
+
+class Principal:
+    """
+    Usuário autenticado e seus perfis de professor/aluno (ou None).
+    Os perfis são carregados no primeiro acesso: verificar is_admin não custa consulta.
+    """
+
+    __slots__ = ('usuario', '_perfis')
+
+    def __init__(self, usuario=None):
+        self.usuario = usuario
+        self._perfis = None if usuario is not None else (None, None)
+
+    def _carregar_perfis(self):
+        """Professor e aluno do usuário, com no máximo uma consulta."""
+        if self._perfis is None:
+            usuario = self.usuario
+            if not _perfis_carregados(usuario):
+                usuario = User.objects.select_related('professor', 'aluno').get(pk=usuario.pk)
+            self._perfis = (getattr(usuario, 'professor', None), getattr(usuario, 'aluno', None))
+        return self._perfis
+
+    @property
+    def autenticado(self):
+        return self.usuario is not None
+
+    @property
+    def is_admin(self):
+        return self.autenticado and self.usuario.is_staff
+
+    @property
+    def professor(self):
+        return self._carregar_perfis()[0]
+
+    @property
+    def aluno(self):
+        return self._carregar_perfis()[1]
+
+    @property
+    def is_professor(self):
+        return self.professor is not None
+
+    @property
+    def is_aluno(self):
+        return self.aluno is not None
+
+    @property
+    def professor_id(self):
+        return self.professor.pk if self.professor is not None else None
+
+    @property
+    def aluno_id(self):
+        return self.aluno.pk if self.aluno is not None else None
+
+    @property
+    def papel(self):
+        if self.is_admin:
+            return 'admin'
+        if self.is_professor:
+            return 'professor'
+        if self.is_aluno:
+            return 'aluno'
+        return 'usuario' if self.autenticado else 'anonimo'
+
+    def __repr__(self):
+        return f'<Principal {self.papel} usuario={getattr(self.usuario, "pk", None)}>'
+
+
+def _perfis_carregados(usuario):
+    """True se professor e aluno já vieram com o usuário (ex.: select_related na autenticação)."""
+    return User.professor.related.is_cached(usuario) and User.aluno.related.is_cached(usuario)
+
+
+def obter_principal(request):
+    """Principal da requisição, resolvido na primeira chamada e reutilizado nas seguintes."""
+    usuario = _usuario(request)
+    principal = getattr(request, '_principal', None)
+    if principal is None or principal.usuario is not usuario:
+        principal = Principal(usuario)
+        request._principal = principal
+    return principal
+
+
+def _usuario(request):
+    usuario = getattr(request, 'user', None)
+    return usuario if usuario is not None and usuario.is_authenticated else None
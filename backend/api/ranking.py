@@ -0,0 +1,78 @@
+"""
+Ranking de faltas calculado no banco sobre todos os alunos.
+
+As taxas vêm dos contadores das matrículas (ausencia_acumulada e total_aulas),
+agrupados por aluno ou lidos por matrícula, e as posições de funções de janela:
+RANK() para a posição (taxas iguais dividem a posição) e ROW_NUMBER() para o
+corte dos N primeiros de cada turma. Cada ranking é uma única consulta,
+qualquer que seja o número de alunos.
+
+O corte por taxa mínima não altera as posições: a ordenação é pela própria
+taxa, então o corte só remove o fim do ranking.
+"""
+
+from django.db.models import ExpressionWrapper, F, FloatField, Sum, Window
+from django.db.models.functions import Rank, RowNumber
+
+from .models import Matricula
+
+
+def taxa_ausencia(faltas, aulas):
+    """Percentual de faltas; `aulas` nunca é zero (aulas_minimas >= 1)."""
+    return ExpressionWrapper(faltas * 100.0 / aulas, output_field=FloatField())
+
+
+def ranking_alunos(taxa_minima=0, aulas_minimas=1):
+    """
+    Alunos ordenados pela taxa de ausência somada em todas as turmas.
+    Linhas: aluno_id, aluno__nome, aluno__matricula, aluno__curso,
+    aulas, faltas, taxa_ausencia e posicao.
+    """
+    return Matricula.objects.order_by().values(
+        'aluno_id', 'aluno__nome', 'aluno__matricula', 'aluno__curso'
+    ).annotate(
+        aulas=Sum('total_aulas'),
+        faltas=Sum('ausencia_acumulada'),
+    ).filter(
+        aulas__gte=max(aulas_minimas, 1)
+    ).annotate(
+        taxa_ausencia=taxa_ausencia(F('faltas'), F('aulas')),
+    ).annotate(
+        posicao=Window(Rank(), order_by=F('taxa_ausencia').desc()),
+    ).filter(
+        taxa_ausencia__gte=taxa_minima
+    ).order_by('posicao', '-faltas', 'aluno_id')
+
+
+def ranking_por_turma(taxa_minima=0, aulas_minimas=1, por_turma=None, turma_id=None):
+    """
+    Matrículas ordenadas pela taxa de ausência dentro de cada turma.
+    `por_turma` limita o resultado aos N primeiros de cada turma.
+    Linhas: turma_id, turma__nome, aluno_id, aluno__nome, aluno__matricula,
+    aulas, faltas, taxa_ausencia, posicao e ordem.
+    """
+    matriculas = Matricula.objects.filter(total_aulas__gte=max(aulas_minimas, 1))
+    if turma_id is not None:
+        matriculas = matriculas.filter(turma_id=turma_id)
+
+    ranking = matriculas.annotate(
+        aulas=F('total_aulas'),
+        faltas=F('ausencia_acumulada'),
+        taxa_ausencia=taxa_ausencia(F('ausencia_acumulada'), F('total_aulas')),
+    ).annotate(
+        posicao=Window(Rank(), partition_by=F('turma_id'), order_by=F('taxa_ausencia').desc()),
+        ordem=Window(
+            RowNumber(),
+            partition_by=F('turma_id'),
+            order_by=[F('taxa_ausencia').desc(), F('faltas').desc(), F('aluno_id').asc()]
+        ),
+    ).filter(
+        taxa_ausencia__gte=taxa_minima
+    )
+    if por_turma is not None:
+        ranking = ranking.filter(ordem__lte=por_turma)
+
+    return ranking.values(
+        'turma_id', 'turma__nome', 'aluno_id', 'aluno__nome', 'aluno__matricula',
+        'aulas', 'faltas', 'taxa_ausencia', 'posicao', 'ordem'
+    ).order_by('turma__nome', 'turma_id', 'ordem')
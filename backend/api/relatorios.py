@@ -0,0 +1,189 @@
+"""
+Relatório de presenças: interpretação dos parâmetros, montagem e gravação em arquivo.
+Usado pela RelatorioPresencaView (modo síncrono) e pelo comando run_report_worker.
+"""
+
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.core.files import File
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .exportacao import FORMATOS_EXPORTACAO, exportar, linhas_presenca
+from .models import Turma, ResumoDiarioPresenca, TarefaRelatorio
+from .replica import ler_da_replica
+
+
+def interpretar_parametros(dados):
+    """
+    Valida e normaliza os parâmetros do relatório.
+    Levanta ValueError (datas) ou Turma.DoesNotExist (turma_id).
+    """
+    data_inicio = dados.get('data_inicio')
+    data_fim = dados.get('data_fim')
+    turma_id = dados.get('turma_id')
+    formato = dados.get('formato', 'json')  # json, csv, ndjson
+
+    # Converter datas
+    if data_inicio:
+        data_inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+    else:
+        data_inicio = timezone.now().date() - timedelta(days=30)
+
+    if data_fim:
+        data_fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
+    else:
+        data_fim = timezone.now().date()
+
+    if turma_id:
+        turma = Turma.objects.get(id=turma_id)
+        titulo = f"Relatório de Presenças - {turma.nome}"
+    else:
+        titulo = "Relatório Geral de Presenças"
+
+    return {
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'turma_id': turma_id,
+        'formato': formato,
+        'titulo': titulo,
+    }
+
+
+def montar_relatorio(parametros, gerado_por):
+    """Totais e agregados por turma do período, a partir do resumo diário."""
+    filtros = Q(data__gte=parametros['data_inicio'], data__lte=parametros['data_fim'])
+    if parametros['turma_id']:
+        filtros &= Q(turma_id=parametros['turma_id'])
+
+    resumos = ResumoDiarioPresenca.objects.filter(filtros)
+
+    # Agrupar por turma
+    presencas_por_turma = resumos.values(
+        'turma__id',
+        'turma__nome',
+        'turma__professor__nome'
+    ).annotate(
+        **ResumoDiarioPresenca.somas()
+    ).order_by('turma__nome')
+
+    # Calcular totais
+    somas = resumos.aggregate(**ResumoDiarioPresenca.somas())
+    totais = {
+        'total': somas['total'],
+        'presentes': somas['total_presentes'],
+        'ausentes': somas['total_ausentes'],
+        'justificados': somas['total_justificados']
+    }
+
+    if totais['total'] > 0:
+        totais['taxa_presenca'] = (totais['presentes'] / totais['total']) * 100
+        totais['taxa_ausencia'] = (totais['ausentes'] / totais['total']) * 100
+        totais['taxa_justificados'] = (totais['justificados'] / totais['total']) * 100
+    else:
+        totais['taxa_presenca'] = 0
+        totais['taxa_ausencia'] = 0
+        totais['taxa_justificados'] = 0
+
+    return {
+        'titulo': parametros['titulo'],
+        'periodo': {
+            'inicio': parametros['data_inicio'].isoformat(),
+            'fim': parametros['data_fim'].isoformat()
+        },
+        'parametros': {
+            'turma_id': parametros['turma_id'],
+            'formato': parametros['formato']
+        },
+        'totais': totais,
+        'detalhes_por_turma': [
+            {
+                'turma_id': item['turma__id'],
+                'turma_nome': item['turma__nome'],
+                'professor': item['turma__professor__nome'],
+                'total': item['total'],
+                'presentes': item['total_presentes'],
+                'ausentes': item['total_ausentes'],
+                'justificados': item['total_justificados'],
+                'taxa_presenca': round((item['total_presentes'] / item['total'] * 100), 2) if item['total'] > 0 else 0
+            }
+            for item in presencas_por_turma
+        ],
+        'gerado_em': timezone.now().isoformat(),
+        'gerado_por': gerado_por
+    }
+
+
+def nome_arquivo(parametros):
+    formato = parametros['formato'] if parametros['formato'] in FORMATOS_EXPORTACAO else 'json'
+    return f"presencas_{parametros['data_inicio'].isoformat()}_{parametros['data_fim'].isoformat()}.{formato}"
+
+
+# ========== TAREFAS EM SEGUNDO PLANO ==========
+
+@contextmanager
+def renovando(tarefa, intervalo):
+    """Renova a tarefa (TarefaRelatorio.renovar) a cada `intervalo` em uma thread enquanto o bloco executa."""
+    parar = threading.Event()
+    
+    def renovar():
+        try:
+            while not parar.wait(intervalo.total_seconds()):
+                try:
+                    tarefa.renovar()
+                except DatabaseError:
+                    pass  # Tenta de novo no próximo intervalo
+        finally:
+            connection.close()
+    
+    thread = threading.Thread(target=renovar, name=f'relatorio-{tarefa.pk}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        parar.set()
+        thread.join()
+
+
+def processar_tarefa(tarefa, intervalo_renovacao=TarefaRelatorio.INTERVALO_RENOVACAO):
+    """
+    Gera o arquivo de uma tarefa já reivindicada e registra o resultado.
+    O conteúdo passa por um arquivo temporário: a memória usada não depende do tamanho do relatório.
+    Durante a geração a tarefa é renovada, para não voltar à fila enquanto o worker está vivo.
+    """
+    try:
+        with renovando(tarefa, intervalo_renovacao), tempfile.TemporaryFile() as temporario:
+            # Só leituras até o arquivo estar pronto: podem ir para a réplica
+            with ler_da_replica():
+                parametros = interpretar_parametros(tarefa.parametros)
+                gerado_por = tarefa.solicitante.username if tarefa.solicitante else 'Sistema'
+
+                if parametros['formato'] in FORMATOS_EXPORTACAO:
+                    linhas = linhas_presenca(parametros['data_inicio'], parametros['data_fim'], parametros['turma_id'])
+                    for bloco in exportar(parametros['formato'], linhas):
+                        temporario.write(bloco.encode('utf-8'))
+                else:
+                    relatorio = montar_relatorio(parametros, gerado_por)
+                    temporario.write(json.dumps(relatorio, ensure_ascii=False).encode('utf-8'))
+            temporario.seek(0)
+            tarefa.arquivo.save(f'{tarefa.pk}_{nome_arquivo(parametros)}', File(temporario), save=False)
+    except Exception as e:
+        tarefa.concluir(erro=str(e) or e.__class__.__name__)
+    else:
+        tarefa.concluir()
+    return tarefa
+
+
+def executar_proxima(worker, tempo_limite=TarefaRelatorio.TEMPO_LIMITE,
+                     maximo_tentativas=TarefaRelatorio.MAXIMO_TENTATIVAS):
+    """Reivindica e processa a próxima tarefa da fila. Retorna a tarefa ou None se a fila estiver vazia."""
+    tarefa = TarefaRelatorio.reivindicar(worker, tempo_limite, maximo_tentativas)
+    if tarefa is not None:
+        # Algumas renovações dentro do tempo limite, mesmo com um --tempo-limite curto
+        processar_tarefa(tarefa, min(TarefaRelatorio.INTERVALO_RENOVACAO, tempo_limite / 3))
+    return tarefa
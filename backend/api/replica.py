@@ -0,0 +1,194 @@
+"""
+Leituras em uma réplica do banco.
+
+Views somente leitura (análises, listagens públicas e exportações de
+relatório) marcadas com @usar_replica fazem suas consultas no alias
+DATABASE_REPLICA_ALIAS ('replica'), quando ele existe em settings.DATABASES.
+Todo o resto, inclusive qualquer escrita e qualquer leitura dentro de uma
+transação, continua no banco principal ('default').
+
+Ler o que acabou de escrever: depois de uma requisição de escrita bem-sucedida
+o usuário fica preso ao principal por DATABASE_REPLICA_FIXACAO_SEGUNDOS, tempo
+que deve cobrir o atraso da replicação (FixacaoPrimarioMiddleware). A fixação
+fica no cache DATABASE_REPLICA_FIXACAO_CACHE, que precisa ser visto por todos
+os workers (em produção, um DatabaseCache no banco principal): fora do DEBUG,
+com réplica configurada, um cache local do processo é recusado na inicialização.
+
+As respostas das rotas públicas continuam no cache (api/cache.py); uma leitura
+na réplica logo após uma escrita pode deixar no cache, por até
+API_CACHE_PUBLICO_SEGUNDOS, dados com o atraso da réplica.
+
+Localmente, a réplica pode ser um segundo arquivo SQLite (SQLITE_REPLICA_NAME),
+atualizado pelo comando sincronizar_replica.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import StreamingHttpResponse
+
+
+# True enquanto as leituras podem ir para a réplica
+_leitura_na_replica = ContextVar('leitura_na_replica', default=False)
+
+
+def alias_replica():
+    """Alias da réplica, ou None se ela não estiver configurada."""
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def tempo_fixacao():
+    """Segundos que um usuário fica no principal depois de uma escrita; 0 desativa."""
+    return getattr(settings, 'DATABASE_REPLICA_FIXACAO_SEGUNDOS', 5)
+
+
+@contextmanager
+def ler_da_replica():
+    """Leituras do bloco vão para a réplica (se configurada)."""
+    token = _leitura_na_replica.set(True)
+    try:
+        yield
+    finally:
+        _leitura_na_replica.reset(token)
+
+
+@contextmanager
+def ler_do_primario():
+    """Leituras do bloco voltam para o principal, mesmo dentro de ler_da_replica()."""
+    token = _leitura_na_replica.set(False)
+    try:
+        yield
+    finally:
+        _leitura_na_replica.reset(token)
+
+
+# ========== FIXAÇÃO NO PRINCIPAL ==========
+
+def cache_fixacao():
+    """Cache das fixações (DATABASE_REPLICA_FIXACAO_CACHE), compartilhado entre os workers."""
+    return caches[getattr(settings, 'DATABASE_REPLICA_FIXACAO_CACHE', 'default')]
+
+
+def chave_fixacao(usuario_id):
+    return f'api:primario:{usuario_id}'
+
+
+def fixar_no_primario(usuario):
+    timeout = tempo_fixacao()
+    if timeout and usuario is not None and usuario.is_authenticated:
+        cache_fixacao().set(chave_fixacao(usuario.pk), True, timeout)
+
+
+def fixado_no_primario(usuario):
+    if usuario is None or not usuario.is_authenticated or not tempo_fixacao():
+        return False
+    return cache_fixacao().get(chave_fixacao(usuario.pk), False)
+
+
+def verificar_cache_fixacao():
+    """
+    Com réplica e fixação ativas, recusa um cache que só o próprio processo vê:
+    a leitura seguinte a uma escrita pode cair em outro worker e ir para a réplica.
+    O DEBUG (runserver, um processo) aceita o cache local.
+    """
+    if alias_replica() is None or not tempo_fixacao() or settings.DEBUG:
+        return
+    if isinstance(cache_fixacao(), (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            'DATABASE_REPLICA_FIXACAO_CACHE deve apontar para um cache compartilhado entre os '
+            'processos (ex.: DatabaseCache ou Redis) quando há réplica de leitura'
+        )
+
+
+class FixacaoPrimarioMiddleware:
+    """
+    Prende ao principal o usuário que acabou de escrever (POST/PUT/PATCH/DELETE
+    com resposta de sucesso). Requisições atendidas por views @usar_replica
+    (ex.: o POST de relatórios) não escrevem e não contam.
+    """
+
+    METODOS_ESCRITA = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+    def __init__(self, get_response):
+        verificar_cache_fixacao()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method in self.METODOS_ESCRITA
+            and response.status_code < 400
+            and not getattr(request, 'somente_leitura', False)
+        ):
+            # A autenticação do DRF (token) também define request.user aqui
+            fixar_no_primario(getattr(request, 'user', None))
+        return response
+
+
+# ========== VIEWS ==========
+
+def usar_replica(metodo):
+    """
+    Decorator para métodos de views somente leitura: as consultas do método
+    (e do conteúdo de uma resposta em streaming) vão para a réplica, exceto
+    para usuários fixados no principal.
+    """
+    @wraps(metodo)
+    def wrapper(self, request, *args, **kwargs):
+        request._request.somente_leitura = True
+        if alias_replica() is None or fixado_no_primario(request.user):
+            return metodo(self, request, *args, **kwargs)
+
+        with ler_da_replica():
+            response = metodo(self, request, *args, **kwargs)
+        if isinstance(response, StreamingHttpResponse):
+            response.streaming_content = _iterar_na_replica(response.streaming_content)
+        return response
+
+    return wrapper
+
+
+def _iterar_na_replica(iteravel):
+    """Cada bloco é gerado dentro de ler_da_replica(), sem vazar o contexto entre os yields."""
+    iterador = iter(iteravel)
+    while True:
+        with ler_da_replica():
+            try:
+                bloco = next(iterador)
+            except StopIteration:
+                return
+        yield bloco
+
+
+# ========== ROTEADOR ==========
+
+class RoteadorReplica:
+    """Envia para a réplica as leituras marcadas; escritas e migrações ficam no principal."""
+
+    def db_for_read(self, model, **hints):
+        if not _leitura_na_replica.get():
+            return DEFAULT_DB_ALIAS
+        alias = alias_replica()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Dentro de uma transação a leitura precisa ver as escritas dela
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Principal e réplica têm os mesmos dados
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o esquema pela replicação (ou por sincronizar_replica)
+        return db != alias_replica()
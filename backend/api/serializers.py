@@ -1,18 +1,116 @@
 from rest_framework import serializers
-from .models import Professor, Aluno, Turma, Matricula, Presenca
+from .models import Professor, Aluno, Turma, Matricula, Presenca, TarefaRelatorio
+from django.urls import reverse
 from django.contrib.auth.models import User
 
-class UserSerializer(serializers.ModelSerializer):
+class ContagemField(serializers.IntegerField):
+    """
+    Contagem de uma relação reversa (somente leitura).
+    Lê a anotação de mesmo nome feita na queryset da view; sem ela, conta no banco.
+    """
+    
+    def __init__(self, relacao, **kwargs):
+        self.relacao = relacao
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, obj):
+        valor = getattr(obj, self.field_name, None)
+        if valor is None:
+            valor = getattr(obj, self.relacao).count()
+        return valor
+
+def selecao_de_campos(request):
+    """
+    Campos pedidos em ?fields=id,nome e/ou omitidos em ?omit=usuario, como
+    (pedidos ou None, omitidos). None quando não há seleção: só leituras (GET,
+    HEAD) aceitam seleção, para que as escritas validem todos os campos.
+    """
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    parametros = getattr(request, 'query_params', request.GET)
+    pedidos, omitidos = parametros.get('fields'), parametros.get('omit')
+    if pedidos is None and omitidos is None:
+        return None
+
+    def nomes(valor):
+        return {nome.strip() for nome in (valor or '').split(',') if nome.strip()}
+
+    return (nomes(pedidos) if pedidos is not None else None), nomes(omitidos)
+
+class CamposDinamicosMixin:
+    """
+    Seleção de campos pela URL (?fields= e ?omit=) para o serializer raiz da
+    requisição. Os campos fora da seleção saem do serializer e não são
+    calculados (SerializerMethodField, contagens, serializers aninhados).
+    Serializers aninhados e os criados sem o request no contexto ficam
+    completos.
+    
+    `dependencias` lista as colunas lidas por campos calculados (métodos e
+    propriedades do modelo); com elas, colunas_do_modelo() diz quais colunas
+    a view precisa carregar.
+    """
+    
+    dependencias = {}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selecao = selecao_de_campos(self.context.get('request'))
+        if selecao is not None:
+            mantidos = self.campos_mantidos(self.fields, selecao)
+            for nome in list(self.fields):
+                if nome not in mantidos:
+                    self.fields.pop(nome)
+    
+    @staticmethod
+    def campos_mantidos(nomes, selecao):
+        pedidos, omitidos = selecao
+        desconhecidos = ((pedidos or set()) | omitidos) - set(nomes)
+        if desconhecidos:
+            raise serializers.ValidationError({
+                'error': f'Campos desconhecidos: {", ".join(sorted(desconhecidos))}'
+            })
+        return [nome for nome in nomes if (pedidos is None or nome in pedidos) and nome not in omitidos]
+    
+    @classmethod
+    def colunas_do_modelo(cls, request):
+        """
+        Caminhos (lookups do ORM) lidos pelos campos selecionados na requisição:
+        'nome', 'professor__nome', 'professor_id' (só a chave estrangeira) ou
+        'usuario' (a relação inteira, para um serializer aninhado). None quando
+        não há seleção ou quando um campo calculado não declara dependências.
+        """
+        selecao = selecao_de_campos(request)
+        if selecao is None:
+            return None
+        campos = cls().fields
+        colunas = set()
+        for nome in cls.campos_mantidos(campos, selecao):
+            campo = campos[nome]
+            if nome in cls.dependencias:
+                colunas.update(cls.dependencias[nome])
+            elif isinstance(campo, ContagemField):
+                continue  # anotação da queryset
+            elif campo.source == '*':
+                return None
+            elif isinstance(campo, serializers.PrimaryKeyRelatedField):
+                colunas.add(f'{campo.source}_id')
+            else:
+                colunas.add(campo.source.replace('.', '__'))
+        return colunas
+
+class UserSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo User do Django"""
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'date_joined']
         read_only_fields = ['id', 'is_staff', 'date_joined']
 
-class ProfessorSerializer(serializers.ModelSerializer):
+class ProfessorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo Professor"""
     usuario = UserSerializer(read_only=True)
-    total_turmas = serializers.IntegerField(source='turmas.count', read_only=True)
+    total_turmas = ContagemField('turmas')
     
     class Meta:
         model = Professor
@@ -22,11 +120,13 @@ class ProfessorSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'data_cadastro']
 
-class AlunoSerializer(serializers.ModelSerializer):
+class AlunoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo Aluno"""
     usuario = UserSerializer(read_only=True)
     idade = serializers.IntegerField(read_only=True)
-    total_turmas = serializers.IntegerField(source='matriculas.count', read_only=True)
+    total_turmas = ContagemField('matriculas')
+    
+    dependencias = {'idade': ['data_nascimento']}
     
     class Meta:
         model = Aluno
@@ -37,12 +137,14 @@ class AlunoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'data_cadastro', 'idade']
 
-class TurmaSerializer(serializers.ModelSerializer):
+class TurmaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo Turma"""
     professor_nome = serializers.CharField(source='professor.nome', read_only=True)
     professor_email = serializers.CharField(source='professor.email', read_only=True)
     representante_nome = serializers.CharField(source='representante.nome', read_only=True)
-    total_alunos = serializers.IntegerField(source='matriculas.count', read_only=True)
+    total_alunos = ContagemField('matriculas')
+    
+    dependencias = {'esta_ativa': ['status', 'data_inicio', 'data_fim']}
     
     class Meta:
         model = Turma
@@ -53,29 +155,32 @@ class TurmaSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'data_cadastro', 'esta_ativa']
 
-class MatriculaSerializer(serializers.ModelSerializer):
+class MatriculaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo Matricula"""
     aluno_nome = serializers.CharField(source='aluno.nome', read_only=True)
     aluno_matricula = serializers.CharField(source='aluno.matricula', read_only=True)
     turma_nome = serializers.CharField(source='turma.nome', read_only=True)
     taxa_presenca = serializers.SerializerMethodField()
     
+    dependencias = {'taxa_presenca': ['presenca_acumulada', 'total_aulas']}
+    
     class Meta:
         model = Matricula
         fields = [
             'id', 'turma', 'turma_nome', 'aluno', 'aluno_nome', 'aluno_matricula',
-            'data_matricula', 'presenca_acumulada', 'taxa_presenca'
+            'data_matricula', 'presenca_acumulada', 'ausencia_acumulada',
+            'justificado_acumulado', 'total_aulas', 'taxa_presenca'
+        ]
+        read_only_fields = [
+            'id', 'data_matricula', 'presenca_acumulada', 'ausencia_acumulada',
+            'justificado_acumulado', 'total_aulas'
         ]
-        read_only_fields = ['id', 'data_matricula']
     
     def get_taxa_presenca(self, obj):
-        """Calcula a taxa de presença do aluno"""
-        total_presencas = obj.presencas.count()
-        if total_presencas > 0:
-            return (obj.presenca_acumulada / total_presencas) * 100
-        return 0
+        """Calcula a taxa de presença do aluno a partir dos contadores da matrícula"""
+        return obj.taxa_presenca()
 
-class PresencaSerializer(serializers.ModelSerializer):
+class PresencaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo Presenca"""
     aluno_nome = serializers.CharField(source='matricula.aluno.nome', read_only=True)
     aluno_matricula = serializers.CharField(source='matricula.aluno.matricula', read_only=True)
@@ -130,6 +235,130 @@ class DashboardTurmaSerializer(serializers.Serializer):
     alunos = MatriculaSerializer(many=True)
     estatisticas = EstatisticaTurmaSerializer()
 
+class TarefaRelatorioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Serializer para o status de um relatório em segundo plano"""
+    download_url = serializers.SerializerMethodField()
+    
+    dependencias = {'download_url': ['status']}
+    
+    class Meta:
+        model = TarefaRelatorio
+        fields = [
+            'id', 'status', 'parametros', 'erro', 'tentativas',
+            'criado_em', 'iniciado_em', 'concluido_em', 'download_url'
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        """Link de download, disponível apenas quando a tarefa foi concluída"""
+        if obj.status != 'Concluída':
+            return None
+        url = reverse('relatorio-tarefa-download', kwargs={'tarefa_id': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+# ========== LISTAGENS RÁPIDAS ==========
+
+class SerializadorRapido:
+    """
+    Serialização somente leitura para listagens grandes: monta o mesmo JSON de
+    `serializer` direto das linhas de queryset.values(), sem instanciar um
+    modelo nem percorrer os campos do DRF para cada linha.
+    
+    `colunas` mapeia cada campo da resposta (na ordem do serializer) para o
+    caminho do ORM; `conversores` formata valores (datas no formato do DRF);
+    `calculados` são campos obtidos de outras colunas: campo -> (colunas, função).
+    Respeita ?fields= e ?omit= como o CamposDinamicosMixin.
+    """
+    
+    serializer = None
+    colunas = {}
+    conversores = {}
+    calculados = {}
+    
+    def __init__(self, request=None):
+        nomes = list(self.colunas) + list(self.calculados)
+        selecao = selecao_de_campos(request)
+        mantidos = set(CamposDinamicosMixin.campos_mantidos(nomes, selecao)) if selecao else set(nomes)
+        ordem = [campo for campo in self.serializer.Meta.fields if campo in mantidos]
+        
+        # (campo, caminho, conversor) ou (campo, None, função de cálculo)
+        self.plano = [
+            (campo, None, self.calculados[campo][1]) if campo in self.calculados
+            else (campo, self.colunas[campo], self.conversores.get(campo))
+            for campo in ordem
+        ]
+        caminhos = {caminho for _, caminho, _ in self.plano if caminho}
+        for campo in ordem:
+            if campo in self.calculados:
+                caminhos.update(self.calculados[campo][0])
+        self.caminhos = sorted(caminhos)
+    
+    def incluir(self, caminhos):
+        """Colunas lidas mesmo fora da resposta (ex.: a chave do cursor da paginação)."""
+        self.caminhos = sorted({*self.caminhos, *caminhos})
+    
+    def valores(self, queryset):
+        """Queryset de dicts com as colunas necessárias (aceita paginação e filtros)."""
+        return queryset.values(*self.caminhos)
+    
+    def serializar(self, linhas):
+        plano = self.plano
+        return [
+            {
+                campo: (
+                    funcao(linha) if caminho is None
+                    else funcao(linha[caminho]) if funcao is not None and linha[caminho] is not None
+                    else linha[caminho]
+                )
+                for campo, caminho, funcao in plano
+            }
+            for linha in linhas
+        ]
+
+_DATA = serializers.DateField()
+_DATA_HORA = serializers.DateTimeField()
+
+class PresencaRapida(SerializadorRapido):
+    """Mesmo JSON do PresencaSerializer, a partir de values()"""
+    serializer = PresencaSerializer
+    colunas = {
+        'id': 'id',
+        'matricula': 'matricula',
+        'aluno_nome': 'matricula__aluno__nome',
+        'aluno_matricula': 'matricula__aluno__matricula',
+        'turma_nome': 'matricula__turma__nome',
+        'data': 'data',
+        'status': 'status',
+        'observacao': 'observacao',
+        'data_registro': 'data_registro',
+    }
+    conversores = {'data': _DATA.to_representation, 'data_registro': _DATA_HORA.to_representation}
+
+class MatriculaRapida(SerializadorRapido):
+    """Mesmo JSON do MatriculaSerializer, a partir de values()"""
+    serializer = MatriculaSerializer
+    colunas = {
+        'id': 'id',
+        'turma': 'turma',
+        'turma_nome': 'turma__nome',
+        'aluno': 'aluno',
+        'aluno_nome': 'aluno__nome',
+        'aluno_matricula': 'aluno__matricula',
+        'data_matricula': 'data_matricula',
+        'presenca_acumulada': 'presenca_acumulada',
+        'ausencia_acumulada': 'ausencia_acumulada',
+        'justificado_acumulado': 'justificado_acumulado',
+        'total_aulas': 'total_aulas',
+    }
+    conversores = {'data_matricula': _DATA_HORA.to_representation}
+    calculados = {
+        'taxa_presenca': (
+            ['presenca_acumulada', 'total_aulas'],
+            lambda linha: Matricula.calcular_taxa_presenca(linha['presenca_acumulada'], linha['total_aulas']),
+        ),
+    }
+
 # ========== SERIALIZERS PARA AUTENTICAÇÃO ==========
 # (Adicione estas classes no FINAL do arquivo)
 
@@ -205,7 +434,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         
         return data
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para perfil do usuário"""
     class Meta:
         model = User
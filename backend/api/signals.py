@@ -0,0 +1,149 @@
+"""
+Sinais do app api.
+Mantêm dados derivados sincronizados com as escritas nos modelos.
+"""
+
+import threading
+
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .autenticacao import invalidar_tokens
+from .cache import invalidar_cache_publico, invalidar_medias_turmas
+from .models import Professor, Aluno, Turma, Matricula, Presenca, ResumoDiarioPresenca
+
+
+# Presenca não tem receptores de remoção: assim as presenças de uma matrícula
+# ou turma removida saem em um único DELETE (fast delete do Collector). A remoção
+# de uma presença ou de uma queryset de presenças atualiza os agregados em
+# Presenca.delete() e PresencaQuerySet.delete().
+
+# Turmas com matrículas removidas em cascata ou em lote, por origem da remoção:
+# acumuladas no pre_delete e atualizadas uma vez quando a remoção chega ao
+# modelo de origem (depois de todas as matrículas e presenças)
+_remocoes = threading.local()
+
+
+def _turmas_pendentes():
+    if not hasattr(_remocoes, 'turmas'):
+        _remocoes.turmas = {}
+    return _remocoes.turmas
+
+
+@receiver(pre_delete, sender=Matricula)
+def matricula_sera_removida(sender, instance, origin=None, **kwargs):
+    """Guarda a turma da matrícula; as presenças dela saem junto, sem sinais."""
+    # A origem fica guardada com as turmas: o id() dela não é reaproveitado antes da atualização
+    _turmas_pendentes().setdefault(id(origin), (origin, set()))[1].add(instance.turma_id)
+
+
+# Modelos cuja remoção chega às matrículas (User -> Professor/Aluno -> Turma -> Matricula).
+# Um receptor sem sender impediria o fast delete de todos os modelos
+@receiver(post_delete, sender=Matricula)
+@receiver(post_delete, sender=Turma)
+@receiver(post_delete, sender=Aluno)
+@receiver(post_delete, sender=Professor)
+@receiver(post_delete, sender=User)
+def remocao_concluida(sender, instance, origin=None, **kwargs):
+    """Refaz os resumos e a versão das turmas que perderam matrículas e continuam existindo."""
+    pendentes = _turmas_pendentes()
+    if id(origin) not in pendentes:
+        return
+    modelo_origem = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if sender is not modelo_origem:
+        return
+    _, turmas = pendentes.pop(id(origin))
+    turmas = list(Turma.objects.filter(pk__in=turmas).values_list('pk', flat=True))
+    if turmas:
+        ResumoDiarioPresenca.recalcular(turmas=turmas)
+        Turma.incrementar_versao(turmas)
+
+
+@receiver(post_save, sender=Professor)
+@receiver(post_save, sender=Aluno)
+@receiver(post_save, sender=Turma)
+@receiver(post_save, sender=Matricula)
+@receiver(post_save, sender=Presenca)
+@receiver(post_delete, sender=Professor)
+@receiver(post_delete, sender=Aluno)
+@receiver(post_delete, sender=Turma)
+@receiver(post_delete, sender=Matricula)
+def dados_alterados(sender, **kwargs):
+    """Invalida as respostas públicas em cache (estatísticas, turmas ativas, professores)."""
+    invalidar_cache_publico()
+
+
+@receiver(post_save, sender=Matricula)
+def matricula_alterada(sender, instance, **kwargs):
+    """Nova versão da turma: a lista de alunos mudou (na remoção, em remocao_concluida)."""
+    Turma.incrementar_versao([instance.turma_id])
+
+
+@receiver(post_save, sender=Aluno)
+def aluno_alterado(sender, instance, created, **kwargs):
+    """Nova versão das turmas do aluno: nome e matrícula aparecem nas listas da turma."""
+    if not created:
+        Turma.incrementar_versao(Matricula.objects.filter(aluno=instance).values('turma_id'))
+
+
+@receiver(post_save, sender=Professor)
+def professor_alterado(sender, instance, created, **kwargs):
+    """Nova versão das turmas do professor: seus dados aparecem no dashboard."""
+    if not created:
+        Turma.incrementar_versao(Turma.objects.filter(professor=instance).values('pk'))
+
+
+@receiver(post_save, sender=Turma)
+@receiver(post_delete, sender=Turma)
+def turmas_do_professor_alteradas(sender, instance, created=False, **kwargs):
+    """Nova versão das outras turmas do professor: o total de turmas dele aparece no dashboard."""
+    professores = {instance.professor_id}
+    if kwargs['signal'] is post_save and not created:
+        anterior = getattr(instance, '_professor_original', None)
+        if anterior == instance.professor_id:
+            return
+        professores.add(anterior)
+    Turma.incrementar_versao(
+        Turma.objects.filter(professor_id__in=professores - {None}).exclude(pk=instance.pk).values('pk')
+    )
+
+
+@receiver(post_delete, sender=Turma)
+def turma_removida(sender, instance, **kwargs):
+    """Descarta a média em cache da turma removida: o id pode ser reaproveitado."""
+    invalidar_medias_turmas([instance.pk])
+
+
+@receiver(post_delete, sender=Token)
+def token_removido(sender, instance, **kwargs):
+    """Logout, troca de senha ou exclusão no admin: o token sai do cache de autenticação."""
+    invalidar_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def usuario_alterado(sender, instance, created, **kwargs):
+    """Usuário alterado (ex.: desativado ou promovido a admin): o token em cache fica desatualizado."""
+    if not created:
+        invalidar_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+@receiver(post_save, sender=User)
+def usuario_do_professor_alterado(sender, instance, created, update_fields=None, **kwargs):
+    """Nova versão das turmas do professor: o usuário dele aparece aninhado no dashboard."""
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        # Login só altera last_login, que não faz parte do UserSerializer
+        return
+    Turma.incrementar_versao(Turma.objects.filter(professor__usuario=instance).values('pk'))
+
+
+@receiver(post_save, sender=Professor)
+@receiver(post_delete, sender=Professor)
+@receiver(post_save, sender=Aluno)
+@receiver(post_delete, sender=Aluno)
+def perfil_alterado(sender, instance, **kwargs):
+    """Perfil de professor/aluno alterado: o papel guardado com o token muda."""
+    if instance.usuario_id:
+        invalidar_tokens(Token.objects.filter(user_id=instance.usuario_id).values_list('key', flat=True))
@@ -1,3 +1,1188 @@
-from django.test import TestCase
+"""
+Testes para os modelos e views principais da API.
+"""
 
-# Create your tests here.
+import io
+import json
+import tracemalloc
+import unittest
+import warnings
+from unittest import mock
+
+from django.core.paginator import UnorderedObjectListWarning
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.urls import reverse
+from django.contrib.auth.models import AnonymousUser, User
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework import status
+from datetime import date, timedelta
+
+from .models import Professor, Aluno, Turma, Matricula, Presenca, ResumoDiarioPresenca
+from .autenticacao import CacheLocalTokens
+from .dados_sinteticos import gerar_dados_sinteticos, limpar_dados
+from .metricas import prometheus_client
+from .principal import obter_principal
+from .replica import (
+    RoteadorReplica, chave_fixacao, fixado_no_primario, fixar_no_primario, ler_da_replica, ler_do_primario,
+    verificar_cache_fixacao,
+)
+
+
+class ContadoresMatriculaTestCase(TestCase):
+    """Testes para os contadores de presença mantidos em Matricula."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.professor = Professor.objects.create(
+            nome='Professor Teste',
+            email='professor@test.com',
+            departamento='Computação'
+        )
+        self.aluno = Aluno.objects.create(
+            nome='Aluno Teste',
+            matricula='20240001',
+            email='aluno@test.com',
+            curso='Engenharia de Software',
+            data_nascimento=date(2000, 1, 1),
+            genero='M'
+        )
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=self.professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        self.matricula = Matricula.objects.create(turma=self.turma, aluno=self.aluno)
+
+    def assertContadores(self, presentes, ausentes, justificados):
+        self.matricula.refresh_from_db()
+        self.assertEqual(self.matricula.presenca_acumulada, presentes)
+        self.assertEqual(self.matricula.ausencia_acumulada, ausentes)
+        self.assertEqual(self.matricula.justificado_acumulado, justificados)
+        self.assertEqual(self.matricula.total_aulas, presentes + ausentes + justificados)
+
+    def test_criacao_incrementa_contadores(self):
+        """Testa que novas presenças incrementam o contador do status."""
+        Presenca.objects.create(matricula=self.matricula, data=date.today(), status='Presente')
+        Presenca.objects.create(
+            matricula=self.matricula, data=date.today() - timedelta(days=1), status='Ausente'
+        )
+        self.assertContadores(presentes=1, ausentes=1, justificados=0)
+        self.assertEqual(self.matricula.taxa_presenca(), 50)
+
+    def test_alteracao_de_status_move_contador(self):
+        """Testa que mudar o status transfere a contagem sem recontar."""
+        presenca = Presenca.objects.create(
+            matricula=self.matricula, data=date.today(), status='Ausente'
+        )
+        presenca = Presenca.objects.get(pk=presenca.pk)
+        presenca.status = 'Justificado'
+        # UPDATE presença, UPDATE matrícula, turma da matrícula, UPDATE resumo,
+        # UPDATE versão da turma + SAVEPOINT/RELEASE
+        with self.assertNumQueries(7):
+            presenca.save()
+        self.assertContadores(presentes=0, ausentes=0, justificados=1)
+
+    def test_update_or_create_nao_duplica_contagem(self):
+        """Testa que regravar o mesmo status não altera os contadores."""
+        for _ in range(2):
+            Presenca.objects.update_or_create(
+                matricula=self.matricula, data=date.today(), defaults={'status': 'Presente'}
+            )
+        self.assertContadores(presentes=1, ausentes=0, justificados=0)
+
+    def test_remocao_decrementa_contadores(self):
+        """Testa que remover presenças (individual ou em lote) desconta os contadores."""
+        for i, status_presenca in enumerate(['Presente', 'Presente', 'Ausente']):
+            Presenca.objects.create(
+                matricula=self.matricula,
+                data=date.today() - timedelta(days=i),
+                status=status_presenca
+            )
+        Presenca.objects.filter(status='Ausente').get().delete()
+        self.assertContadores(presentes=2, ausentes=0, justificados=0)
+
+        Presenca.objects.all().delete()
+        self.assertContadores(presentes=0, ausentes=0, justificados=0)
+
+    def test_recalcular_contadores(self):
+        """Testa a reconstrução dos contadores a partir da tabela Presenca."""
+        Presenca.objects.create(matricula=self.matricula, data=date.today(), status='Presente')
+        Matricula.objects.update(presenca_acumulada=0, total_aulas=7)
+
+        Matricula.recalcular_contadores([self.matricula.pk])
+        self.assertContadores(presentes=1, ausentes=0, justificados=0)
+
+    def test_contadores_somente_leitura_na_api(self):
+        """Testa que a API não permite sobrescrever os contadores."""
+        Presenca.objects.create(matricula=self.matricula, data=date.today(), status='Presente')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@test.com', 'admin123'))
+        response = self.client.patch(
+            reverse('matricula-detail', kwargs={'pk': self.matricula.pk}),
+            {'presenca_acumulada': 40, 'total_aulas': 40}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContadores(presentes=1, ausentes=0, justificados=0)
+
+
+class MarcarPresencaTestCase(APITestCase):
+    """Testes para o registro de chamada em lote."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.professor_user = User.objects.create_user(username='professor', password='prof12345')
+        self.professor = Professor.objects.create(
+            nome='Professor Teste',
+            email='professor@test.com',
+            departamento='Computação',
+            usuario=self.professor_user
+        )
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=self.professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        self.alunos = [self.criar_aluno(i, matricular=True) for i in range(3)]
+        self.client.force_authenticate(user=self.professor_user)
+
+    def criar_aluno(self, i, matricular):
+        aluno = Aluno.objects.create(
+            nome=f'Aluno {i}',
+            matricula=f'2024{i:04d}',
+            email=f'aluno{i}@test.com',
+            curso='Engenharia de Software',
+            data_nascimento=date(2000, 1, 1),
+            genero='F'
+        )
+        if matricular:
+            Matricula.objects.create(turma=self.turma, aluno=aluno)
+        return aluno
+
+    def marcar(self, registros, data_aula=None):
+        payload = {'turma_id': self.turma.id, 'registros': registros}
+        if data_aula:
+            payload['data'] = data_aula
+        return self.client.post(reverse('presenca-marcar-presenca'), payload, format='json')
+
+    def test_marcar_presenca_cria_e_atualiza(self):
+        """Testa criação, atualização e contadores da chamada em lote."""
+        registros = [{'aluno_id': aluno.id, 'status': 'Presente'} for aluno in self.alunos]
+        response = self.marcar(registros)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resultados = response.data['resultados']
+        self.assertTrue(all(r['status'] == 'sucesso' and r['criado'] for r in resultados))
+
+        registros[0]['status'] = 'Ausente'
+        resultados = self.marcar(registros).data['resultados']
+        self.assertFalse(any(r['criado'] for r in resultados))
+        self.assertEqual(Presenca.objects.count(), 3)
+        self.assertEqual(Presenca.objects.get(pk=resultados[0]['presenca_id']).status, 'Ausente')
+
+        matricula = Matricula.objects.get(turma=self.turma, aluno=self.alunos[0])
+        self.assertEqual(matricula.presenca_acumulada, 0)
+        self.assertEqual(matricula.ausencia_acumulada, 1)
+        self.assertEqual(matricula.total_aulas, 1)
+
+    def test_marcar_presenca_erros_por_aluno(self):
+        """Testa que erros são reportados por aluno sem afetar os demais."""
+        nao_matriculado = self.criar_aluno(99, matricular=False)
+        response = self.marcar([
+            {'aluno_id': self.alunos[0].id},
+            {'aluno_id': nao_matriculado.id, 'status': 'Presente'},
+            {'aluno_id': 'abc', 'status': 'Presente'},
+            {'aluno_id': self.alunos[1].id, 'status': 'Talvez'},
+        ])
+        resultados = response.data['resultados']
+        self.assertEqual([r['status'] for r in resultados], ['sucesso', 'erro', 'erro', 'erro'])
+        self.assertEqual(resultados[1]['mensagem'], 'Aluno não matriculado nesta turma')
+        self.assertEqual(Presenca.objects.get().status, 'Presente')
+
+    def test_marcar_presenca_queries_constantes(self):
+        """Testa que o número de queries não cresce com o tamanho da turma."""
+        def contar_queries(data_aula):
+            registros = [{'aluno_id': m.aluno_id} for m in self.turma.matriculas.all()]
+            with CaptureQueriesContext(connection) as contexto:
+                self.marcar(registros, data_aula)
+            return len(contexto)
+
+        poucos = contar_queries('2024-03-01')
+        for i in range(10, 40):
+            self.criar_aluno(i, matricular=True)
+        self.assertEqual(contar_queries('2024-03-02'), poucos)
+
+
+class ResumoDiarioPresencaTestCase(TestCase):
+    """Testes para o resumo diário de presenças por turma."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        professor = Professor.objects.create(
+            nome='Professor Teste', email='professor@test.com', departamento='Computação'
+        )
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        self.matriculas = []
+        for i in range(3):
+            aluno = Aluno.objects.create(
+                nome=f'Aluno {i}',
+                matricula=f'2024{i:04d}',
+                email=f'aluno{i}@test.com',
+                curso='Matemática',
+                data_nascimento=date(2000, 1, 1),
+                genero='M'
+            )
+            self.matriculas.append(Matricula.objects.create(turma=self.turma, aluno=aluno))
+        self.hoje = date.today()
+
+    def resumo(self, data_aula=None):
+        resumo = ResumoDiarioPresenca.objects.get(turma=self.turma, data=data_aula or self.hoje)
+        return resumo.presentes, resumo.ausentes, resumo.justificados
+
+    def test_resumo_acompanha_escritas(self):
+        """Testa que criação, alteração e remoção mantêm o resumo do dia."""
+        presencas = [
+            Presenca.objects.create(matricula=m, data=self.hoje, status='Presente')
+            for m in self.matriculas
+        ]
+        self.assertEqual(self.resumo(), (3, 0, 0))
+
+        presencas[0].status = 'Ausente'
+        presencas[0].save()
+        self.assertEqual(self.resumo(), (2, 1, 0))
+
+        ontem = self.hoje - timedelta(days=1)
+        presencas[1].data = ontem
+        presencas[1].save()
+        self.assertEqual(self.resumo(), (1, 1, 0))
+        self.assertEqual(self.resumo(ontem), (1, 0, 0))
+
+        presencas[2].delete()
+        self.assertEqual(self.resumo(), (0, 1, 0))
+
+    def test_recalcular_reconstroi_resumos(self):
+        """Testa que a reconstrução reproduz os valores mantidos incrementalmente."""
+        for i, m in enumerate(self.matriculas):
+            Presenca.objects.create(matricula=m, data=self.hoje, status=['Presente', 'Ausente', 'Justificado'][i])
+        esperado = self.resumo()
+
+        ResumoDiarioPresenca.objects.update(presentes=0, ausentes=0, justificados=0)
+        self.assertEqual(ResumoDiarioPresenca.recalcular(), 1)
+        self.assertEqual(self.resumo(), esperado)
+
+    def test_troca_de_turma_move_resumo(self):
+        """Testa que mudar a turma da matrícula leva as presenças ao resumo da nova turma."""
+        outra = Turma.objects.create(
+            nome='Django', professor=self.turma.professor,
+            data_inicio=self.turma.data_inicio, data_fim=self.turma.data_fim
+        )
+        for m in self.matriculas:
+            Presenca.objects.create(matricula=m, data=self.hoje, status='Presente')
+        versoes = {turma.pk: turma.versao for turma in (self.turma, outra)}
+        
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@test.com', 'admin123'))
+        response = self.client.patch(
+            reverse('matricula-detail', kwargs={'pk': self.matriculas[0].pk}),
+            {'turma': outra.pk}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(self.resumo(), (2, 0, 0))
+        self.assertEqual(ResumoDiarioPresenca.objects.get(turma=outra, data=self.hoje).presentes, 1)
+        incrementais = list(ResumoDiarioPresenca.objects.values_list('turma_id', 'data', 'presentes', 'ausentes', 'justificados'))
+        ResumoDiarioPresenca.recalcular()
+        reconstruidos = list(ResumoDiarioPresenca.objects.values_list('turma_id', 'data', 'presentes', 'ausentes', 'justificados'))
+        self.assertCountEqual(incrementais, reconstruidos)
+        for turma in Turma.objects.all():
+            self.assertGreater(turma.versao, versoes[turma.pk])
+    
+    def test_remocao_de_matricula_e_aluno_atualiza_resumo(self):
+        """Testa que matrículas removidas (diretamente ou com o aluno) saem do resumo."""
+        for m in self.matriculas:
+            Presenca.objects.create(matricula=m, data=self.hoje, status='Presente')
+        versao = Turma.objects.get(pk=self.turma.pk).versao
+        
+        self.matriculas[0].delete()
+        self.assertEqual(self.resumo(), (2, 0, 0))
+        self.matriculas[1].aluno.delete()
+        self.assertEqual(self.resumo(), (1, 0, 0))
+        self.assertEqual(Turma.objects.get(pk=self.turma.pk).versao, versao + 2)
+    
+    def test_remocao_da_turma_em_lote(self):
+        """Testa que remover uma turma com presenças custa um número fixo de queries."""
+        gerar_dados_sinteticos(professores=1, alunos=30, turmas=2, alunos_por_turma=20, dias=30)
+        turma, outra = Turma.objects.exclude(pk=self.turma.pk).order_by('pk')
+        self.assertGreater(Presenca.objects.filter(matricula__turma=turma).count(), 400)
+        resumos_outra = list(ResumoDiarioPresenca.objects.filter(turma=outra).values_list('data', 'presentes'))
+        
+        with CaptureQueriesContext(connection) as consultas:
+            turma.delete()
+        self.assertLessEqual(len(consultas), 8)
+        self.assertFalse(Presenca.objects.filter(matricula__turma_id=turma.pk).exists())
+        self.assertFalse(ResumoDiarioPresenca.objects.filter(turma_id=turma.pk).exists())
+        self.assertEqual(
+            list(ResumoDiarioPresenca.objects.filter(turma=outra).values_list('data', 'presentes')), resumos_outra
+        )
+    
+    def test_estatisticas_leem_resumo(self):
+        """Testa que as estatísticas públicas usam o resumo diário."""
+        for m in self.matriculas:
+            Presenca.objects.create(matricula=m, data=self.hoje, status='Presente')
+        response = self.client.get(reverse('estatisticas'))
+        self.assertEqual(response.json()['taxa_presenca_geral'], 100)
+        self.assertEqual(response.json()['melhor_turma']['nome'], self.turma.nome)
+
+
+class DadosSinteticosTestCase(TestCase):
+    def gerar(self, seed):
+        gerar_dados_sinteticos(
+            professores=2, alunos=20, turmas=3, alunos_por_turma=5, dias=10,
+            seed=seed, data_final=date(2025, 3, 14)
+        )
+        return list(Presenca.objects.order_by('matricula__turma__nome', 'matricula__aluno__nome', 'data')
+                    .values_list('matricula__turma__nome', 'matricula__aluno__nome', 'data', 'status'))
+
+    def test_mesma_seed_gera_mesmos_dados(self):
+        """Testa que a mesma seed reproduz exatamente o mesmo conjunto."""
+        primeiro = self.gerar(7)
+        limpar_dados(7)
+        self.assertEqual(self.gerar(7), primeiro)
+
+    def test_comando_repetido_exige_clear(self):
+        """Testa que gerar de novo com a mesma seed pede --clear em vez de violar a unicidade."""
+        opcoes = {'professores': 2, 'alunos': 20, 'turmas': 3, 'alunos_por_turma': 5, 'days': 10, 'stdout': io.StringIO()}
+        call_command('generate_analytics_data', **opcoes)
+        with self.assertRaisesMessage(CommandError, '--clear'):
+            call_command('generate_analytics_data', **opcoes)
+        
+        total = Presenca.objects.count()
+        call_command('generate_analytics_data', clear=True, **opcoes)
+        self.assertEqual(Presenca.objects.count(), total)
+        call_command('generate_analytics_data', seed=43, **opcoes)
+        self.assertEqual(Professor.objects.count(), 4)
+    
+    def test_clear_remove_so_a_seed(self):
+        """Testa que --clear mantém os dados reais e os de outras seeds; --clear-all remove tudo."""
+        opcoes = {'professores': 2, 'alunos': 20, 'turmas': 3, 'alunos_por_turma': 5, 'days': 10, 'stdout': io.StringIO()}
+        professor = Professor.objects.create(nome='Real', email='real@ifb.edu', departamento='Computação')
+        turma = Turma.objects.create(
+            nome='Turma real', professor=professor,
+            data_inicio=date(2025, 2, 1), data_fim=date(2025, 6, 30)
+        )
+        aluno = Aluno.objects.create(
+            nome='Aluno real', matricula='R001', email='aluno.real@ifb.edu',
+            curso='Física', data_nascimento=date(2000, 1, 1), genero='F'
+        )
+        Presenca.objects.create(matricula=Matricula.objects.create(turma=turma, aluno=aluno), data=date(2025, 3, 3))
+        call_command('generate_analytics_data', seed=43, **opcoes)
+        antes = {modelo: modelo.objects.count() for modelo in (Professor, Aluno, Turma, Matricula, Presenca)}
+        
+        call_command('generate_analytics_data', **opcoes)
+        limpar_dados(42)
+        self.assertEqual({modelo: modelo.objects.count() for modelo in antes}, antes)
+        self.assertTrue(Presenca.objects.filter(matricula__aluno=aluno).exists())
+        
+        call_command('generate_analytics_data', clear_all=True, **opcoes)
+        self.assertFalse(Aluno.objects.filter(pk=aluno.pk).exists())
+        self.assertEqual(Professor.objects.count(), 2)
+    
+    def test_agregados_preenchidos(self):
+        """Testa que contadores e resumos diários batem com as presenças geradas."""
+        self.gerar(3)
+        total = Presenca.objects.count()
+        self.assertEqual(Matricula.objects.aggregate(t=Sum('total_aulas'))['t'], total)
+        self.assertEqual(ResumoDiarioPresenca.objects.aggregate(**ResumoDiarioPresenca.somas())['total'], total)
+
+
+class CachePublicoTestCase(APITestCase):
+    """Testes para o cache das rotas públicas."""
+
+    def setUp(self):
+        cache.clear()
+        self.professor = Professor.objects.create(nome='Professor Teste', email='professor@test.com', departamento='Computação')
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=self.professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        self.aluno = Aluno.objects.create(
+            nome='Aluno 1', matricula='20240001', email='aluno1@test.com',
+            curso='Engenharia de Software', data_nascimento=date(2000, 1, 1), genero='F'
+        )
+
+    def test_segunda_requisicao_sem_queries(self):
+        """Testa que a resposta repetida vem do cache."""
+        primeira = self.client.get(reverse('estatisticas'))
+        with self.assertNumQueries(0):
+            segunda = self.client.get(reverse('estatisticas'))
+        self.assertEqual(segunda.json(), primeira.json())
+
+    def test_parametros_diferentes_chaves_diferentes(self):
+        """Testa que os parâmetros de consulta fazem parte da chave."""
+        self.assertEqual(len(self.client.get(reverse('turmas-ativas')).json()['results']), 1)
+        self.assertEqual(len(self.client.get(reverse('turmas-ativas'), {'search': 'Java'}).json()['results']), 0)
+
+    def test_escrita_invalida_cache(self):
+        """Testa que salvar um modelo invalida as respostas em cache."""
+        self.assertEqual(self.client.get(reverse('estatisticas')).json()['total_alunos'], 1)
+        self.aluno.delete()
+        self.assertEqual(self.client.get(reverse('estatisticas')).json()['total_alunos'], 0)
+
+        Professor.objects.create(nome='Outro', email='outro@test.com', departamento='Física')
+        nomes = [p['nome'] for p in self.client.get(reverse('professores-publicos')).json()['results']]
+        self.assertIn('Outro', nomes)
+
+    def test_chamada_em_lote_invalida_cache(self):
+        """Testa que a chamada em lote (sem sinais) também invalida o cache."""
+        Matricula.objects.create(turma=self.turma, aluno=self.aluno)
+        self.assertEqual(self.client.get(reverse('estatisticas')).json()['taxa_presenca_geral'], 0)
+
+        admin = User.objects.create_superuser('admin', 'admin@test.com', 'admin123')
+        self.client.force_authenticate(user=admin)
+        self.client.post(reverse('presenca-marcar-presenca'), {
+            'turma_id': self.turma.id,
+            'registros': [{'aluno_id': self.aluno.id, 'status': 'Presente'}]
+        }, format='json')
+        self.assertEqual(self.client.get(reverse('estatisticas')).json()['taxa_presenca_geral'], 100)
+
+    def test_paginacao_turmas_ativas(self):
+        """Testa que as páginas de turmas ativas seguem a ordem da turma, sem repetir nem pular linhas."""
+        for i in range(24):
+            Turma.objects.create(
+                nome='Turma', professor=self.professor,
+                data_inicio=self.turma.data_inicio, data_fim=self.turma.data_fim
+            )
+        ids = []
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            url = reverse('turmas-ativas')
+            while url:
+                pagina = self.client.get(url).json()
+                ids.extend(turma['id'] for turma in pagina['results'])
+                url = pagina['next']
+        esperado = list(Turma.objects.filter(status='Ativa').order_by(*Turma._meta.ordering, 'pk').values_list('pk', flat=True))
+        self.assertEqual(ids, esperado)
+    
+    def test_uma_invalidacao_por_transacao(self):
+        """Testa que remover vários objetos em uma transação troca a geração só agora e no commit."""
+        for i in range(5):
+            aluno = Aluno.objects.create(
+                nome=f'Aluno {i + 2}', matricula=f'2024010{i}', email=f'extra{i}@test.com',
+                curso='Física', data_nascimento=date(2000, 1, 1), genero='M'
+            )
+            Matricula.objects.create(turma=self.turma, aluno=aluno)
+        
+        with mock.patch('api.cache._trocar_geracao') as trocar:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self.turma.delete()
+            self.assertEqual(trocar.call_count, 2)
+        
+        # Depois de um rollback a próxima transação invalida de novo
+        with mock.patch('api.cache._trocar_geracao') as trocar:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        Aluno.objects.filter(pk=self.aluno.pk).get().delete()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                with transaction.atomic():
+                    self.aluno.delete()
+            self.assertEqual(trocar.call_count, 3)
+    
+    @override_settings(API_CACHE_PUBLICO_SEGUNDOS=0)
+    def test_cache_desativado(self):
+        """Testa que tempo máximo zero desativa o cache."""
+        self.client.get(reverse('estatisticas'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('estatisticas'))
+        self.assertGreater(len(queries), 0)
+
+
+class EtagTurmaTestCase(APITestCase):
+    """Testes para o GET condicional das rotas da turma."""
+
+    def setUp(self):
+        self.professor = Professor.objects.create(nome='Professor Teste', email='professor@test.com', departamento='Computação')
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=self.professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        self.aluno = Aluno.objects.create(
+            nome='Aluno 1', matricula='20240001', email='aluno1@test.com',
+            curso='Engenharia de Software', data_nascimento=date(2000, 1, 1), genero='F'
+        )
+        self.matricula = Matricula.objects.create(turma=self.turma, aluno=self.aluno)
+        self.client.force_authenticate(user=User.objects.create_superuser('admin', 'admin@test.com', 'admin123'))
+        self.url = reverse('turma-dashboard', kwargs={'pk': self.turma.pk})
+
+    def test_304_sem_alteracoes(self):
+        """Testa que a mesma ETag responde 304 com uma única query."""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_por_acao(self):
+        """Testa que dashboard e alunos têm ETags distintas."""
+        url_alunos = reverse('turma-alunos', kwargs={'pk': self.turma.pk})
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(url_alunos, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url_alunos, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_alteracoes_mudam_etag(self):
+        """Testa que presenças, matrículas e representante geram nova versão."""
+        etags = [self.client.get(self.url)['ETag']]
+
+        presenca = Presenca.objects.create(matricula=self.matricula, data=date.today(), status='Presente')
+        etags.append(self.client.get(self.url)['ETag'])
+
+        presenca.delete()
+        etags.append(self.client.get(self.url)['ETag'])
+
+        self.turma.representante = self.aluno
+        self.turma.save()
+        etags.append(self.client.get(self.url)['ETag'])
+
+        outro = Aluno.objects.create(
+            nome='Aluno 2', matricula='20240002', email='aluno2@test.com',
+            curso='Física', data_nascimento=date(2000, 1, 1), genero='M'
+        )
+        Matricula.objects.create(turma=self.turma, aluno=outro)
+        etags.append(self.client.get(self.url)['ETag'])
+
+        self.client.post(reverse('presenca-marcar-presenca'), {
+            'turma_id': self.turma.id,
+            'registros': [{'aluno_id': outro.id, 'status': 'Ausente'}]
+        }, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etags.append(response['ETag'])
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_dados_do_professor_mudam_etag(self):
+        """Testa que o usuário e as outras turmas do professor (total_turmas) geram nova versão."""
+        self.professor.usuario = User.objects.create_user('professor', 'professor@test.com', 'senha123')
+        self.professor.save()
+        etags = [self.client.get(self.url)['ETag']]
+        
+        self.professor.usuario.first_name = 'Ada'
+        self.professor.usuario.save()
+        etags.append(self.client.get(self.url)['ETag'])
+        
+        outra = Turma.objects.create(
+            nome='Django', professor=self.professor,
+            data_inicio=self.turma.data_inicio, data_fim=self.turma.data_fim
+        )
+        etags.append(self.client.get(self.url)['ETag'])
+        
+        outro_professor = Professor.objects.create(nome='Outro', email='outro@test.com', departamento='Física')
+        outra = Turma.objects.get(pk=outra.pk)
+        outra.professor = outro_professor
+        outra.save()
+        etags.append(self.client.get(self.url)['ETag'])
+        
+        outra.professor = self.professor
+        outra.save()
+        etags.append(self.client.get(self.url)['ETag'])
+        
+        Turma.objects.filter(pk=outra.pk).delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etags.append(response['ETag'])
+        
+        self.assertEqual(len(set(etags)), len(etags))
+    
+    def test_turma_inexistente(self):
+        """Testa que a rota condicional mantém o 404."""
+        response = self.client.get(reverse('turma-dashboard', kwargs={'pk': 999}), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PaginacaoPresencasTestCase(APITestCase):
+    """Testes para a paginação por cursor das presenças."""
+
+    def setUp(self):
+        professor = Professor.objects.create(nome='Professor Teste', email='professor@test.com', departamento='Computação')
+        turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        self.alunos = []
+        for i in range(3):
+            aluno = Aluno.objects.create(
+                nome=f'Aluno {i}', matricula=f'2024{i:04d}', email=f'aluno{i}@test.com',
+                curso='Física', data_nascimento=date(2000, 1, 1), genero='F'
+            )
+            matricula = Matricula.objects.create(turma=turma, aluno=aluno)
+            # Vários alunos na mesma data: empates desfeitos pelo id
+            for dias in range(4):
+                Presenca.objects.create(matricula=matricula, data=date.today() - timedelta(days=dias), status='Presente')
+            self.alunos.append(aluno)
+        self.esperado = list(Presenca.objects.order_by('-data', '-id').values_list('id', flat=True))
+        self.client.force_authenticate(user=User.objects.create_superuser('admin', 'admin@test.com', 'admin123'))
+
+    def percorrer(self, url, link='next', **params):
+        ids, paginas = [], 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [p['id'] for p in response.json()['results']]
+            paginas += 1
+            if not response.json()[link]:
+                return ids, paginas, response
+            response = self.client.get(response.json()[link])
+
+    def test_percorre_todas_sem_repetir(self):
+        """Testa que as páginas cobrem todas as presenças na ordem (data, id)."""
+        ids, paginas, _ = self.percorrer(reverse('presenca-list'), page_size=5)
+        self.assertEqual(ids, self.esperado)
+        self.assertEqual(paginas, 3)
+
+    def test_volta_pelas_paginas_anteriores(self):
+        """Testa que o link 'previous' refaz o caminho na mesma ordem."""
+        _, _, ultima = self.percorrer(reverse('presenca-list'), page_size=5)
+        ids = [p['id'] for p in ultima.json()['results']]
+        response = ultima
+        while response.json()['previous']:
+            response = self.client.get(response.json()['previous'])
+            ids = [p['id'] for p in response.json()['results']] + ids
+        self.assertEqual(ids, self.esperado)
+
+    def test_pagina_profunda_custo_constante(self):
+        """Testa que uma página após o cursor usa uma única query."""
+        response = self.client.get(reverse('presenca-list'), {'page_size': 2})
+        with self.assertNumQueries(1):
+            self.client.get(response.json()['next'])
+
+    def test_presencas_do_aluno_paginadas(self):
+        """Testa a paginação por cursor na ação presencas do aluno."""
+        ids, paginas, _ = self.percorrer(reverse('aluno-presencas', kwargs={'pk': self.alunos[0].pk}), page_size=3)
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(paginas, 2)
+
+    def test_cursor_invalido(self):
+        """Testa que um cursor adulterado responde 404."""
+        response = self.client.get(reverse('presenca-list'), {'cursor': 'bGl4bw=='})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PrincipalTestCase(APITestCase):
+    """Testes para a resolução do perfil do usuário uma vez por requisição."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.professor_user = User.objects.create_user(username='professor', password='prof12345')
+        self.professor = Professor.objects.create(
+            nome='Professor Teste',
+            email='professor@test.com',
+            departamento='Computação',
+            usuario=self.professor_user
+        )
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=self.professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+
+    def requisicao(self, usuario):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = usuario
+        return request
+
+    def test_perfis_resolvidos_uma_vez(self):
+        """Testa que várias verificações de perfil custam uma única consulta."""
+        request = self.requisicao(User.objects.get(pk=self.professor_user.pk))
+        with self.assertNumQueries(1):
+            principal = obter_principal(request)
+            self.assertTrue(principal.is_professor)
+            self.assertFalse(principal.is_aluno)
+            self.assertEqual(principal.professor_id, self.professor.pk)
+            self.assertIs(obter_principal(request), principal)
+            self.assertEqual(principal.papel, 'professor')
+
+    def test_admin_sem_consulta(self):
+        """Testa que verificar administrador não consulta os perfis."""
+        admin = User.objects.create_superuser('admin', 'admin@test.com', 'admin123')
+        with self.assertNumQueries(0):
+            self.assertTrue(obter_principal(self.requisicao(admin)).is_admin)
+
+    def test_anonimo(self):
+        """Testa o principal de uma requisição sem autenticação."""
+        principal = obter_principal(self.requisicao(AnonymousUser()))
+        self.assertFalse(principal.autenticado)
+        self.assertFalse(principal.is_professor)
+        self.assertEqual(principal.papel, 'anonimo')
+
+    def test_permissoes_usam_principal(self):
+        """Testa que as permissões de lista e de objeto resolvem o perfil uma só vez."""
+        aluno = Aluno.objects.create(
+            nome='Aluno Teste', matricula='20240001', email='aluno@test.com',
+            curso='Engenharia de Software', data_nascimento=date(2000, 1, 1), genero='F'
+        )
+        self.client.force_authenticate(user=User.objects.get(pk=self.professor_user.pk))
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.post(
+                reverse('turma-matricular-aluno', kwargs={'pk': self.turma.pk}), {'aluno_id': aluno.pk}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        consultas_perfil = [
+            consulta for consulta in contexto.captured_queries
+            if 'FROM "auth_user"' in consulta['sql'] and 'api_aluno' in consulta['sql']
+        ]
+        self.assertEqual(len(consultas_perfil), 1)
+
+
+class TokenCacheTestCase(APITestCase):
+    """Testes para a autenticação por token com cache."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.user = User.objects.create_user(username='professor', password='prof12345')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_em_cache_sem_consultas(self):
+        """Testa que a segunda requisição com o mesmo token não consulta o banco."""
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['username'], 'professor')
+
+    def test_logout_invalida_token(self):
+        """Testa que o token deixa de valer logo após o logout."""
+        self.client.get(reverse('profile'))
+        self.assertEqual(self.client.post(reverse('logout')).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_usuario_desativado_invalida_token(self):
+        """Testa que alterar o usuário remove o token do cache."""
+        self.client.get(reverse('profile'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_perfil_carregado_com_o_token(self):
+        """Testa que o perfil de professor criado depois do cache é visto pelas permissões."""
+        self.client.get(reverse('profile'))
+        Professor.objects.create(
+            nome='Professor Teste', email='professor@test.com', departamento='Computação', usuario=self.user
+        )
+        response = self.client.get(reverse('dashboard-professor'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cache_local_limitado(self):
+        """Testa a expiração e o limite de itens do cache local."""
+        cache_local = CacheLocalTokens(maximo=2)
+        cache_local.set('a', 1, timeout=60)
+        cache_local.set('b', 2, timeout=60)
+        cache_local.get('a')
+        cache_local.set('c', 3, timeout=60)
+        self.assertIsNone(cache_local.get('b'))  # menos usado recentemente
+        self.assertEqual(cache_local.get('a'), 1)
+        cache_local.set('d', 4, timeout=0)
+        self.assertIsNone(cache_local.get('d'))
+
+
+class BackendSqliteTestCase(TestCase):
+    """Backend config.sqlite: PRAGMAs por conexão e BEGIN IMMEDIATE nas transações."""
+    
+    def test_pragmas_aplicados(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+    
+    def test_transacao_immediate(self):
+        self.assertEqual(connection.vendor, 'sqlite')
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class RoteadorReplicaTestCase(SimpleTestCase):
+    """Testes para o roteamento de leituras para a réplica."""
+    
+    def setUp(self):
+        self.roteador = RoteadorReplica()
+    
+    def test_leituras_marcadas_vao_para_replica(self):
+        """Testa que só as leituras dentro de ler_da_replica() vão para a réplica."""
+        with mock.patch('api.replica.alias_replica', return_value='replica'):
+            self.assertEqual(self.roteador.db_for_read(Turma), 'default')
+            with ler_da_replica():
+                self.assertEqual(self.roteador.db_for_read(Turma), 'replica')
+                self.assertEqual(self.roteador.db_for_write(Turma), 'default')
+                with ler_do_primario():
+                    self.assertEqual(self.roteador.db_for_read(Turma), 'default')
+            self.assertFalse(self.roteador.allow_migrate('replica', 'api'))
+            self.assertTrue(self.roteador.allow_migrate('default', 'api'))
+    
+    def test_sem_replica_configurada(self):
+        """Testa que, sem o alias da réplica, tudo fica no principal."""
+        with ler_da_replica():
+            self.assertEqual(self.roteador.db_for_read(Turma), 'default')
+
+
+class FixacaoPrimarioTestCase(APITestCase):
+    """Testes para a leitura no principal logo depois de uma escrita."""
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@test.com', 'admin123')
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_escrita_fixa_no_principal(self):
+        """Testa que uma escrita bem-sucedida prende o usuário ao principal."""
+        self.client.get(reverse('estatisticas'))
+        self.assertFalse(fixado_no_primario(self.admin))
+        
+        response = self.client.post(reverse('professor-list'), {
+            'nome': 'Professor Novo', 'email': 'novo@test.com', 'departamento': 'Computação'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(fixado_no_primario(self.admin))
+    
+    def test_relatorio_nao_fixa(self):
+        """Testa que o POST somente leitura de relatórios não conta como escrita."""
+        response = self.client.post(reverse('relatorio-presenca'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(fixado_no_primario(self.admin))
+    
+    @override_settings(DATABASE_REPLICA_FIXACAO_SEGUNDOS=0)
+    def test_fixacao_desativada(self):
+        """Testa que DATABASE_REPLICA_FIXACAO_SEGUNDOS=0 desativa a fixação."""
+        self.client.post(reverse('professor-list'), {
+            'nome': 'Professor Novo', 'email': 'novo@test.com', 'departamento': 'Computação'
+        }, format='json')
+        self.assertFalse(fixado_no_primario(self.admin))
+    
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'padrao'},
+            'fixacao': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fixacao'},
+        },
+        DATABASE_REPLICA_FIXACAO_CACHE='fixacao',
+    )
+    def test_fixacao_no_cache_configurado(self):
+        """Testa que a fixação vai para o alias DATABASE_REPLICA_FIXACAO_CACHE."""
+        fixar_no_primario(self.admin)
+        self.assertTrue(caches['fixacao'].get(chave_fixacao(self.admin.pk)))
+        self.assertIsNone(caches['default'].get(chave_fixacao(self.admin.pk)))
+    
+    def test_replica_exige_cache_compartilhado(self):
+        """Testa que, com réplica, um cache local do processo é recusado fora do DEBUG."""
+        with mock.patch('api.replica.alias_replica', return_value='replica'):
+            with self.assertRaises(ImproperlyConfigured):
+                verificar_cache_fixacao()
+            with override_settings(DEBUG=True):
+                verificar_cache_fixacao()
+            with override_settings(
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'fixacao': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'api_cache_fixacao'},
+                },
+                DATABASE_REPLICA_FIXACAO_CACHE='fixacao',
+            ):
+                verificar_cache_fixacao()
+    
+    def test_transacao_le_do_principal(self):
+        """Testa que leituras dentro de uma transação nunca vão para a réplica."""
+        with mock.patch('api.replica.alias_replica', return_value='replica'), ler_da_replica():
+            self.assertEqual(RoteadorReplica().db_for_read(Turma), 'default')
+
+
+@override_settings(API_PERFIL_REQUISICOES=True)
+class PerfilRequisicaoTestCase(APITestCase):
+    """Testes para o middleware de perfil das requisições."""
+    
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@test.com', 'admin123')
+        self.client.force_authenticate(user=admin)
+        professor = Professor.objects.create(nome='Professor Teste', email='professor@test.com', departamento='Computação')
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+    
+    def test_server_timing_e_log(self):
+        """Testa o cabeçalho Server-Timing e a linha de log da requisição."""
+        url = reverse('turma-dashboard', kwargs={'pk': self.turma.pk})
+        with self.assertLogs('api.perfil', level='INFO') as logs, CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metricas = {item.split(';')[0].strip(): item for item in response['Server-Timing'].split(',')}
+        self.assertEqual(set(metricas), {'total', 'db', 'app', 'render'})
+        self.assertIn(f'desc="{len(contexto.captured_queries)} consultas"', metricas['db'])
+        
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual(registro['caminho'], url)
+        self.assertEqual(registro['status'], 200)
+        self.assertEqual(registro['consultas'], len(contexto.captured_queries))
+        self.assertGreaterEqual(registro['total_ms'], registro['db_ms'])
+        self.assertGreater(registro['render_ms'], 0)
+    
+    @override_settings(API_PERFIL_MEMORIA=True)
+    def test_pico_de_memoria(self):
+        """Testa que API_PERFIL_MEMORIA acrescenta o pico de memória."""
+        self.addCleanup(tracemalloc.stop)
+        response = self.client.get(reverse('turma-dashboard', kwargs={'pk': self.turma.pk}))
+        self.assertIn('mem;desc=', response['Server-Timing'])
+    
+    @override_settings(API_PERFIL_REQUISICOES=False)
+    def test_desativado(self):
+        """Testa que, desativado, o middleware não acrescenta o cabeçalho."""
+        response = self.client.get(reverse('turma-dashboard', kwargs={'pk': self.turma.pk}))
+        self.assertNotIn('Server-Timing', response)
+
+
+@unittest.skipIf(prometheus_client is None, 'prometheus_client não instalado')
+@override_settings(API_METRICAS=True, API_METRICAS_TOKEN='')
+class MetricasTestCase(APITestCase):
+    """Testes para as métricas do Prometheus."""
+    
+    def setUp(self):
+        self.professor_user = User.objects.create_user(username='professor', password='prof12345')
+        professor = Professor.objects.create(
+            nome='Professor Teste', email='professor@test.com', departamento='Computação', usuario=self.professor_user
+        )
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        aluno = Aluno.objects.create(
+            nome='Aluno Teste', matricula='20240001', email='aluno@test.com',
+            curso='Engenharia de Software', data_nascimento=date(2000, 1, 1), genero='F'
+        )
+        Matricula.objects.create(turma=self.turma, aluno=aluno)
+        self.aluno = aluno
+        self.client.force_authenticate(user=self.professor_user)
+    
+    @staticmethod
+    def amostra(nome, **rotulos):
+        return prometheus_client.REGISTRY.get_sample_value(nome, rotulos) or 0
+    
+    def test_marcar_presenca_instrumentada(self):
+        """Testa requisição, operação e registros contados na chamada."""
+        rotulos = {'view': 'PresencaViewSet', 'acao': 'marcar_presenca'}
+        antes = {
+            'requisicoes': self.amostra('api_requisicoes_total', metodo='POST', status='2xx', **rotulos),
+            'consultas': self.amostra('api_requisicao_consultas_sum', **rotulos),
+            'operacao': self.amostra('api_operacao_segundos_count', operacao='marcar_presenca'),
+            'sucesso': self.amostra('api_chamada_registros_total', resultado='sucesso'),
+            'erro': self.amostra('api_chamada_registros_total', resultado='erro'),
+        }
+        
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.post(reverse('presenca-marcar-presenca'), {
+                'turma_id': self.turma.id,
+                'registros': [{'aluno_id': self.aluno.id}, {'aluno_id': 'abc'}],
+            }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.amostra('api_requisicoes_total', metodo='POST', status='2xx', **rotulos), antes['requisicoes'] + 1)
+        self.assertEqual(
+            self.amostra('api_requisicao_consultas_sum', **rotulos),
+            antes['consultas'] + len(contexto.captured_queries)
+        )
+        self.assertEqual(self.amostra('api_operacao_segundos_count', operacao='marcar_presenca'), antes['operacao'] + 1)
+        self.assertEqual(self.amostra('api_chamada_registros_total', resultado='sucesso'), antes['sucesso'] + 1)
+        self.assertEqual(self.amostra('api_chamada_registros_total', resultado='erro'), antes['erro'] + 1)
+    
+    def test_erros_por_classe_de_status(self):
+        """Testa que respostas de erro são contadas pela classe do status."""
+        rotulos = {'view': 'DashboardProfessorView', 'acao': 'get', 'metodo': 'GET', 'status': '4xx'}
+        antes = self.amostra('api_requisicoes_total', **rotulos)
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('dashboard-professor'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.amostra('api_requisicoes_total', **rotulos), antes + 1)
+    
+    def test_endpoint_metrics(self):
+        """Testa o texto do /metrics e a proteção por token."""
+        self.client.get(reverse('estatisticas'))
+        response = self.client.get(reverse('metricas'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'api_requisicao_segundos_bucket{acao="get",le="0.005",view="EstatisticasView"}', response.content)
+        
+        with self.settings(API_METRICAS_TOKEN='segredo'):
+            self.assertEqual(self.client.get(reverse('metricas')).status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.client.get(reverse('metricas'), headers={'Authorization': 'Bearer segredo'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    @override_settings(API_METRICAS=False)
+    def test_desativado(self):
+        """Testa que, desativadas, as métricas não têm endpoint."""
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CamposDinamicosTestCase(APITestCase):
+    """Testes para a seleção de campos (?fields= e ?omit=)."""
+    
+    def setUp(self):
+        professor = Professor.objects.create(nome='Professor Teste', email='professor@test.com', departamento='Computação')
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            descricao='Uma descrição longa ' * 50,
+            professor=professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        for i in range(3):
+            aluno = Aluno.objects.create(
+                nome=f'Aluno {i}', matricula=f'2024{i:04d}', email=f'aluno{i}@test.com',
+                curso='Física', data_nascimento=date(2000, 1, 1), genero='F'
+            )
+            matricula = Matricula.objects.create(turma=self.turma, aluno=aluno)
+            Presenca.objects.create(matricula=matricula, data=date.today(), status='Presente', observacao='Chegou atrasado')
+        self.client.force_authenticate(user=User.objects.create_superuser('admin', 'admin@test.com', 'admin123'))
+    
+    def get_com_sql(self, url, params):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, ' '.join(query['sql'] for query in contexto.captured_queries), len(contexto)
+    
+    def test_fields_seleciona_campos_e_colunas(self):
+        """Testa que só os campos pedidos são devolvidos e lidos do banco."""
+        response, sql, _ = self.get_com_sql(reverse('turma-list'), {'fields': 'id,nome'})
+        self.assertEqual(response.data['results'], [{'id': self.turma.pk, 'nome': 'Python Avançado'}])
+        self.assertNotIn('"descricao"', sql)
+        self.assertNotIn('"api_professor"', sql)
+    
+    def test_omit_sem_queries_extras(self):
+        """Testa que omitir campos não cria queries por linha."""
+        _, sql_completo, completo = self.get_com_sql(reverse('presenca-list'), {})
+        response, sql, parcial = self.get_com_sql(reverse('presenca-list'), {'omit': 'observacao,turma_nome'})
+        
+        self.assertIn('"observacao"', sql_completo)
+        self.assertNotIn('"observacao"', sql)
+        self.assertEqual(parcial, completo)
+        self.assertEqual(set(response.data['results'][0]), {
+            'id', 'matricula', 'aluno_nome', 'aluno_matricula', 'data', 'status', 'data_registro'
+        })
+    
+    def test_campo_calculado_nao_pedido(self):
+        """Testa que campos calculados fora da seleção não são calculados."""
+        with mock.patch.object(Matricula, 'calcular_taxa_presenca', return_value=0) as taxa:
+            self.client.get(reverse('matricula-list'), {'fields': 'id,aluno_nome'})
+            taxa.assert_not_called()
+            response, _, _ = self.get_com_sql(reverse('matricula-list'), {'fields': 'id,taxa_presenca'})
+        self.assertEqual(taxa.call_count, 3)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'taxa_presenca'})
+    
+    def test_detalhe_com_serializer_aninhado(self):
+        """Testa a seleção no detalhe, mantendo o serializer aninhado completo."""
+        url = reverse('turma-detail', kwargs={'pk': self.turma.pk})
+        response, sql, _ = self.get_com_sql(url, {'fields': 'id,professor'})
+        self.assertEqual(set(response.data), {'id', 'professor'})
+        self.assertEqual(response.data['professor']['nome'], 'Professor Teste')
+        self.assertNotIn('"descricao"', sql)
+    
+    def test_campo_desconhecido(self):
+        """Testa que um campo inexistente responde 400."""
+        response = self.client.get(reverse('aluno-list'), {'fields': 'id,senha'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('senha', response.data['error'])
+    
+    def test_rotas_de_relacionamento(self):
+        """Testa a seleção nos alunos e no dashboard da turma e nas presenças do aluno."""
+        alunos = self.client.get(reverse('turma-alunos', kwargs={'pk': self.turma.pk}), {'fields': 'aluno_nome,taxa_presenca'})
+        self.assertEqual(set(alunos.data[0]), {'aluno_nome', 'taxa_presenca'})
+        
+        dashboard = self.client.get(reverse('turma-dashboard', kwargs={'pk': self.turma.pk}), {'omit': 'turma,turma_nome'})
+        self.assertEqual(len(dashboard.data['alunos']), 3)
+        self.assertNotIn('turma_nome', dashboard.data['alunos'][0])
+        self.assertEqual(dashboard.data['turma']['nome'], 'Python Avançado')
+        
+        aluno = Aluno.objects.order_by('id').first()
+        presencas = self.client.get(reverse('aluno-presencas', kwargs={'pk': aluno.pk}), {'fields': 'data,status'})
+        self.assertEqual(presencas.data['results'], [{'data': date.today().isoformat(), 'status': 'Presente'}])
+    
+    def test_escrita_ignora_selecao(self):
+        """Testa que escritas validam e devolvem todos os campos."""
+        response = self.client.patch(
+            reverse('turma-detail', kwargs={'pk': self.turma.pk}) + '?fields=id', {'nome': 'Python'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('descricao', response.data)
+
+
+class ListaRapidaTestCase(APITestCase):
+    """Testes para as listagens serializadas direto de values()."""
+    
+    def setUp(self):
+        gerar_dados_sinteticos(professores=2, alunos=12, turmas=3, alunos_por_turma=6, dias=4)
+        Presenca.objects.filter(pk=Presenca.objects.order_by('id').first().pk).update(observacao='Atestado médico')
+        self.client.force_authenticate(user=User.objects.create_superuser('admin', 'admin@test.com', 'admin123'))
+    
+    def comparar(self, url, params):
+        """Percorre as páginas pelos dois caminhos e compara as respostas."""
+        respostas = {}
+        for rapida in (True, False):
+            with self.settings(API_LISTA_RAPIDA=rapida):
+                paginas = [self.client.get(url, params).json()]
+                while paginas[-1].get('next'):
+                    paginas.append(self.client.get(paginas[-1]['next']).json())
+            respostas[rapida] = paginas
+        self.assertEqual(respostas[True], respostas[False])
+        return respostas[True]
+    
+    def test_presencas_mesmo_json(self):
+        """Testa o mesmo JSON (e os mesmos cursores) do PresencaSerializer."""
+        paginas = self.comparar(reverse('presenca-list'), {'page_size': 20})
+        self.assertEqual(sum(len(pagina['results']) for pagina in paginas), Presenca.objects.count())
+        self.comparar(reverse('presenca-list'), {'status': 'Presente', 'fields': 'id,aluno_nome,data'})
+    
+    def test_cursor_sem_campos_da_chave(self):
+        """Testa que o cursor funciona quando ?fields=/?omit= deixam de fora data e id."""
+        for params in ({'fields': 'aluno_nome'}, {'omit': 'data,id'}):
+            paginas = self.comparar(reverse('presenca-list'), {**params, 'page_size': 20})
+            self.assertGreater(len(paginas), 1)
+            self.assertEqual(sum(len(pagina['results']) for pagina in paginas), Presenca.objects.count())
+            self.assertNotIn('data', paginas[0]['results'][0])
+    
+    def test_matriculas_mesmo_json(self):
+        """Testa o mesmo JSON do MatriculaSerializer, com filtros e ordenação."""
+        Matricula.objects.filter(pk=Matricula.objects.order_by('id').first().pk).update(total_aulas=0, presenca_acumulada=0)
+        self.comparar(reverse('matricula-list'), {})
+        self.comparar(reverse('matricula-list'), {'ordering': 'data_matricula', 'omit': 'turma_nome'})
+    
+    def test_queries_da_pagina(self):
+        """Testa que a página de presenças continua em uma única query."""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('presenca-list'), {'page_size': 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_campo_desconhecido(self):
+        """Testa que a seleção inválida responde 400 também no caminho rápido."""
+        response = self.client.get(reverse('matricula-list'), {'fields': 'id,nota'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -2,15 +2,31 @@
 Testes para as views de análises.
 """
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import date, timedelta
+import csv
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from unittest import mock
 
-from .models import Professor, Aluno, Turma, Matricula, Presenca
+from . import exportacao
+from .consultas_lentas import consultas_capturadas, impressao_digital, limpar
+from .dados_sinteticos import gerar_dados_sinteticos
+from .models import Professor, Aluno, Turma, Matricula, Presenca, TarefaRelatorio
+from .paralelo import executar_em_paralelo
+from .relatorios import processar_tarefa
 
 
 class AnalyticsTestCase(APITestCase):
@@ -133,6 +149,43 @@ class AnalyticsTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['professor']['id'], self.professor.id)
     
+    def test_dashboard_professor_agregados(self):
+        """Testa os agregados do dashboard do professor (turmas e alunos com mais faltas)."""
+        outro = Aluno.objects.create(
+            nome='Aluno Faltoso', matricula='20240003', email='faltoso@test.com',
+            curso='Matemática', data_nascimento=date(2001, 1, 1), genero='F'
+        )
+        matricula = Matricula.objects.create(turma=self.turma, aluno=outro)
+        for i in range(4):
+            Presenca.objects.create(
+                matricula=matricula,
+                data=date.today() - timedelta(days=i),
+                status='Presente' if i == 0 else 'Ausente'
+            )
+        Turma.objects.create(
+            nome='Turma Vazia', professor=self.professor, status='Concluída',
+            data_inicio=date.today() - timedelta(days=60), data_fim=date.today() - timedelta(days=31)
+        )
+        
+        self.client.force_authenticate(user=self.professor_user)
+        response = self.client.get(reverse('dashboard-professor'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        gerais = response.data['estatisticas_gerais']
+        self.assertEqual(gerais['total_turmas'], 2)
+        self.assertEqual(gerais['turmas_ativas'], 1)
+        self.assertEqual(gerais['turmas_concluidas'], 1)
+        self.assertEqual(gerais['total_alunos'], 2)
+        self.assertEqual(gerais['taxa_presenca_geral'], round(9 / 14 * 100, 2))
+        self.assertEqual(response.data['turmas'][0]['total_alunos'], 2)
+        self.assertEqual(response.data['turmas'][1]['taxa_presenca'], 0)
+        
+        faltas = response.data['alunos_com_mais_faltas']
+        self.assertEqual([item['aluno_id'] for item in faltas], [outro.id, self.aluno.id])
+        self.assertEqual(faltas[0]['faltas'], 3)
+        self.assertEqual(faltas[0]['total_aulas'], 4)
+        self.assertEqual(faltas[0]['taxa_ausencia'], 75.0)
+    
     def test_dashboard_aluno_por_id(self):
         """Testa dashboard do aluno por ID."""
         self.client.force_authenticate(user=self.admin_user)
@@ -142,6 +195,33 @@ class AnalyticsTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['aluno']['id'], self.aluno.id)
     
+    def test_dashboard_aluno_media_da_turma(self):
+        """Testa a média da turma no dashboard do aluno e sua invalidação por novas presenças."""
+        cache.clear()
+        outro = Aluno.objects.create(
+            nome='Colega', matricula='20240004', email='colega@test.com',
+            curso='Matemática', data_nascimento=date(2001, 1, 1), genero='F'
+        )
+        matricula = Matricula.objects.create(turma=self.turma, aluno=outro)
+        Presenca.objects.create(matricula=matricula, data=date.today(), status='Ausente')
+        
+        self.client.force_authenticate(user=self.aluno_user)
+        desempenho = self.client.get(reverse('dashboard-aluno')).data['desempenho_por_turma'][0]
+        self.assertEqual(desempenho['minha_presenca'], 80.0)
+        self.assertEqual(desempenho['media_turma'], round(8 / 11 * 100, 2))
+        self.assertEqual(desempenho['professor'], 'Professor Teste')
+        
+        # Segunda leitura: perfil do usuário, matrículas e evolução mensal; a média vem do cache
+        with self.assertNumQueries(3):
+            self.client.get(reverse('dashboard-aluno'))
+        
+        # Nova presença na turma invalida a média
+        Presenca.objects.create(
+            matricula=matricula, data=date.today() - timedelta(days=1), status='Presente'
+        )
+        desempenho = self.client.get(reverse('dashboard-aluno')).data['desempenho_por_turma'][0]
+        self.assertEqual(desempenho['media_turma'], round(9 / 12 * 100, 2))
+    
     def test_dashboard_aluno_outro_aluno(self):
         """Testa que aluno não pode ver dashboard de outro aluno."""
         outro_aluno_user = User.objects.create_user(
@@ -162,4 +242,426 @@ class AnalyticsTestCase(APITestCase):
         response = self.client.get(
             reverse('dashboard-aluno-id', kwargs={'aluno_id': outro_aluno.id})
         )
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class RankingFaltasTestCase(APITestCase):
+    """Testes para o ranking de faltas (geral e por turma)."""
+    
+    def setUp(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='admin123')
+        self.client.force_authenticate(user=admin)
+        professor = Professor.objects.create(nome='Professor Teste', email='professor@test.com', departamento='Computação')
+        turmas = [
+            Turma.objects.create(
+                nome=nome, professor=professor,
+                data_inicio=date.today() - timedelta(days=30),
+                data_fim=date.today() + timedelta(days=30)
+            )
+            for nome in ('Turma A', 'Turma B')
+        ]
+        self.alunos = [
+            Aluno.objects.create(
+                nome=f'Aluno {i}', matricula=f'2024000{i}', email=f'aluno{i}@test.com',
+                curso='Computação', data_nascimento=date(2000, 1, 1), genero='M'
+            )
+            for i in range(3)
+        ]
+        
+        # (aluno, turma): sequência de status; aluno 2 não tem aulas na Turma B
+        historico = {
+            (0, 0): ['Ausente', 'Ausente', 'Presente', 'Presente'],
+            (1, 0): ['Ausente', 'Presente', 'Presente', 'Presente'],
+            (2, 0): ['Ausente', 'Presente', 'Ausente', 'Justificado'],
+            (0, 1): ['Presente', 'Presente'],
+            (2, 1): [],
+        }
+        presencas = []
+        for (aluno, turma), situacoes in historico.items():
+            matricula = Matricula.objects.create(aluno=self.alunos[aluno], turma=turmas[turma])
+            presencas += [
+                Presenca(matricula=matricula, data=date.today() - timedelta(days=dia), status=situacao)
+                for dia, situacao in enumerate(situacoes)
+            ]
+        Presenca.objects.bulk_create(presencas)
+        Matricula.recalcular_contadores()
+    
+    def test_ranking_geral(self):
+        """Testa a posição de cada aluno pela taxa somada em todas as turmas."""
+        response = self.client.get(reverse('ranking-faltas'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [(item['aluno_id'], item['posicao'], item['taxa_ausencia']) for item in response.data['results']],
+            [(self.alunos[2].id, 1, 50.0), (self.alunos[0].id, 2, 33.33), (self.alunos[1].id, 3, 25.0)]
+        )
+    
+    def test_taxa_minima_mantem_posicoes(self):
+        """Testa que o corte por taxa mínima não altera as posições."""
+        response = self.client.get(reverse('ranking-faltas'), {'taxa_minima': 30, 'page_size': 1})
+        
+        self.assertEqual(response.data['count'], 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(response.data['results'][0]['aluno_id'], self.alunos[2].id)
+        
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['posicao'], 2)
+    
+    def test_ranking_por_turma(self):
+        """Testa empates (RANK) e o corte dos N primeiros de cada turma (ROW_NUMBER)."""
+        response = self.client.get(reverse('ranking-faltas'), {'escopo': 'turma'})
+        
+        self.assertEqual(
+            [(item['turma_nome'], item['aluno_id'], item['posicao']) for item in response.data['results']],
+            [
+                ('Turma A', self.alunos[0].id, 1),
+                ('Turma A', self.alunos[2].id, 1),
+                ('Turma A', self.alunos[1].id, 3),
+                ('Turma B', self.alunos[0].id, 1),
+            ]
+        )
+        
+        response = self.client.get(reverse('ranking-faltas'), {'escopo': 'turma', 'por_turma': 1})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([item['aluno_id'] for item in response.data['results']], [self.alunos[0].id] * 2)
+    
+    def test_parametros_invalidos(self):
+        """Testa a validação dos parâmetros."""
+        for parametros in ({'escopo': 'curso'}, {'taxa_minima': 'muito'}):
+            with self.subTest(parametros=parametros):
+                response = self.client.get(reverse('ranking-faltas'), parametros)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('error', response.data)
+    
+    def test_alertas_usam_ranking(self):
+        """Testa que os alertas de faltas consideram todos os alunos (mais de 30%)."""
+        response = self.client.get(reverse('analytics-geral'))
+        
+        self.assertEqual(
+            [item['aluno_id'] for item in response.data['alertas']['alunos_muitas_faltas']],
+            [self.alunos[2].id, self.alunos[0].id]
+        )
+
+
+class DadosRelatorioMixin:
+    """Turma com um aluno e cinco dias de presença; parâmetros cobrindo os quatro últimos."""
+    
+    def setUp(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='admin123')
+        self.client.force_authenticate(user=admin)
+        professor = Professor.objects.create(nome='Professor Teste', email='professor@test.com', departamento='Computação')
+        self.turma = Turma.objects.create(
+            nome='Python Avançado',
+            professor=professor,
+            data_inicio=date.today() - timedelta(days=30),
+            data_fim=date.today() + timedelta(days=30)
+        )
+        aluno = Aluno.objects.create(
+            nome='Aluno, "Teste"', matricula='20240001', email='aluno@test.com',
+            curso='Física', data_nascimento=date(2000, 1, 1), genero='F'
+        )
+        matricula = Matricula.objects.create(turma=self.turma, aluno=aluno)
+        for i in range(5):
+            Presenca.objects.create(
+                matricula=matricula,
+                data=date.today() - timedelta(days=i),
+                status='Presente' if i else 'Ausente'
+            )
+        self.parametros = {
+            'data_inicio': (date.today() - timedelta(days=3)).isoformat(),
+            'data_fim': date.today().isoformat(),
+            'turma_id': self.turma.id,
+        }
+
+
+class RelatorioExportacaoTestCase(DadosRelatorioMixin, APITestCase):
+    """Testes para a exportação linha a linha do relatório de presenças."""
+    
+    def test_exportacao_csv(self):
+        """Testa o CSV em streaming, com uma linha por presença do período."""
+        response = self.client.post(reverse('relatorio-presenca'), {**self.parametros, 'formato': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        
+        linhas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(linhas[0], ['aluno', 'matricula', 'turma', 'professor', 'data', 'status'])
+        self.assertEqual(len(linhas), 5)
+        self.assertEqual(linhas[1][0], 'Aluno, "Teste"')
+        self.assertEqual(linhas[-1][4:], [date.today().isoformat(), 'Ausente'])
+    
+    def test_exportacao_ndjson(self):
+        """Testa o NDJSON em streaming."""
+        response = self.client.post(reverse('relatorio-presenca'), {**self.parametros, 'formato': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        registros = [json.loads(linha) for linha in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(len(registros), 4)
+        self.assertEqual(registros[0]['turma'], 'Python Avançado')
+        self.assertEqual(registros[0]['professor'], 'Professor Teste')
+    
+    def test_exportacao_turma_inexistente(self):
+        """Testa que parâmetros inválidos são recusados antes do streaming."""
+        response = self.client.post(reverse('relatorio-presenca'), {**self.parametros, 'turma_id': 999, 'formato': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class RelatorioAssincronoTestCase(DadosRelatorioMixin, APITestCase):
+    """Testes para os relatórios em segundo plano (fila + run_report_worker)."""
+    
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=self.media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+    
+    def enfileirar(self, **extras):
+        response = self.client.post(
+            reverse('relatorio-presenca'), {**self.parametros, 'assincrono': True, **extras}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response.data
+    
+    def test_fluxo_completo(self):
+        """Testa enfileirar, processar com o worker, consultar o status e baixar o CSV."""
+        tarefa = self.enfileirar(formato='csv')
+        self.assertEqual(self.client.get(tarefa['status_url']).data['status'], 'Pendente')
+        
+        call_command('run_report_worker', '--once', stdout=io.StringIO())
+        
+        situacao = self.client.get(tarefa['status_url']).data
+        self.assertEqual(situacao['status'], 'Concluída')
+        download = self.client.get(situacao['download_url'])
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        linhas = list(csv.reader(io.StringIO(b''.join(download.streaming_content).decode('utf-8'))))
+        self.assertEqual(len(linhas), 5)
+    
+    def test_relatorio_json_e_erro(self):
+        """Testa o relatório agregado em arquivo e o registro de falhas."""
+        ok = self.enfileirar()
+        TarefaRelatorio.objects.create(parametros={'data_inicio': 'invalida'})
+        call_command('run_report_worker', '--once', stdout=io.StringIO())
+        
+        situacao = self.client.get(ok['status_url']).data
+        download = self.client.get(situacao['download_url'])
+        self.assertEqual(json.loads(b''.join(download.streaming_content))['totais']['total'], 4)
+        self.assertEqual(TarefaRelatorio.objects.filter(status='Erro').count(), 1)
+    
+    def test_download_antes_de_concluir(self):
+        """Testa que o download de tarefa pendente responde 409."""
+        tarefa = self.enfileirar(formato='csv')
+        response = self.client.get(reverse('relatorio-tarefa-download', kwargs={'tarefa_id': tarefa['id']}))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIsNone(self.client.get(tarefa['status_url']).data['download_url'])
+    
+    def test_reivindicacao_exclusiva(self):
+        """Testa que cada tarefa é reivindicada por um único worker, e as abandonadas voltam à fila."""
+        primeira = TarefaRelatorio.objects.create(parametros={})
+        segunda = TarefaRelatorio.objects.create(parametros={})
+        
+        self.assertEqual(TarefaRelatorio.reivindicar('a').pk, primeira.pk)
+        self.assertEqual(TarefaRelatorio.reivindicar('b').pk, segunda.pk)
+        self.assertIsNone(TarefaRelatorio.reivindicar('c'))
+        
+        # Worker 'a' parou no meio: após o tempo limite a tarefa volta para a fila
+        TarefaRelatorio.objects.filter(pk=primeira.pk).update(
+            iniciado_em=timezone.now() - TarefaRelatorio.TEMPO_LIMITE - timedelta(minutes=1)
+        )
+        retomada = TarefaRelatorio.reivindicar('c')
+        self.assertEqual((retomada.pk, retomada.worker, retomada.tentativas), (primeira.pk, 'c', 2))
+    
+    def test_renovacao_mantem_tarefa_com_o_worker(self):
+        """Testa que a tarefa renovada não volta para a fila e que o worker antigo perde a renovação."""
+        TarefaRelatorio.objects.create(parametros={})
+        tarefa = TarefaRelatorio.reivindicar('a')
+        atrasada = timezone.now() - TarefaRelatorio.TEMPO_LIMITE - timedelta(minutes=1)
+        
+        TarefaRelatorio.objects.filter(pk=tarefa.pk).update(iniciado_em=atrasada)
+        tarefa.iniciado_em = atrasada
+        self.assertTrue(tarefa.renovar())
+        self.assertIsNone(TarefaRelatorio.reivindicar('b'))
+        
+        TarefaRelatorio.objects.filter(pk=tarefa.pk).update(iniciado_em=atrasada)
+        self.assertEqual(TarefaRelatorio.reivindicar('b').worker, 'b')
+        tarefa.iniciado_em = atrasada
+        self.assertFalse(tarefa.renovar())
+    
+    def test_limite_de_tentativas(self):
+        """Testa que a tarefa que sempre interrompe o worker vai para Erro em vez de voltar à fila."""
+        tarefa = TarefaRelatorio.objects.create(
+            parametros={}, status='Processando', tentativas=TarefaRelatorio.MAXIMO_TENTATIVAS,
+            iniciado_em=timezone.now() - TarefaRelatorio.TEMPO_LIMITE - timedelta(minutes=1)
+        )
+        self.assertIsNone(TarefaRelatorio.reivindicar('a'))
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, 'Erro')
+        self.assertIn('interrompido', tarefa.erro)
+    
+    def test_worker_renova_durante_o_processamento(self):
+        """Testa que o processamento renova a tarefa periodicamente."""
+        tarefa = self.enfileirar(formato='csv')
+        gerar = exportacao.exportar
+        
+        def exportar_devagar(*args, **kwargs):
+            time.sleep(0.2)
+            return gerar(*args, **kwargs)
+        
+        with mock.patch('api.relatorios.exportar', exportar_devagar), \
+                mock.patch.object(TarefaRelatorio, 'renovar', autospec=True) as renovar:
+            processar_tarefa(TarefaRelatorio.reivindicar('a'), timedelta(milliseconds=20))
+        self.assertGreater(renovar.call_count, 1)
+        self.assertEqual(self.client.get(tarefa['status_url']).data['status'], 'Concluída')
+
+
+@override_settings(API_CONSULTAS_PARALELAS=4)
+class ExecucaoParalelaTestCase(SimpleTestCase):
+    """Testes para a execução em paralelo de blocos independentes."""
+    
+    def test_blocos_em_threads_do_pool(self):
+        """Testa que cada bloco roda no pool e os resultados voltam pelo nome."""
+        variavel = ContextVar('variavel', default='fora')
+        variavel.set('requisição')
+        resultados = executar_em_paralelo(
+            a=lambda: (threading.current_thread().name, variavel.get()),
+            b=lambda: 2,
+        )
+        self.assertTrue(resultados['a'][0].startswith('consultas'))
+        self.assertEqual(resultados['a'][1], 'requisição')
+        self.assertEqual(resultados['b'], 2)
+    
+    @override_settings(API_CONSULTAS_PARALELAS=1)
+    def test_desativado_roda_em_sequencia(self):
+        """Testa que API_CONSULTAS_PARALELAS=1 roda os blocos na própria thread."""
+        resultados = executar_em_paralelo(a=lambda: threading.current_thread().name, b=lambda: 2)
+        self.assertEqual(resultados['a'], threading.current_thread().name)
+    
+    def test_excecao_do_bloco(self):
+        """Testa que a exceção de um bloco chega à thread da requisição."""
+        with self.assertRaises(ZeroDivisionError):
+            executar_em_paralelo(a=lambda: 1 / 0, b=lambda: 2)
+    
+    def test_pool_ocupado_roda_na_requisicao(self):
+        """Testa que, com o pool ocupado por outra requisição, os blocos não entram na fila."""
+        liberar = threading.Event()
+        ocupados = threading.Barrier(5)
+        
+        def ocupar():
+            ocupados.wait(timeout=5)
+            liberar.wait(timeout=5)
+        
+        outra = threading.Thread(
+            target=executar_em_paralelo,
+            kwargs={nome: ocupar for nome in ('a', 'b', 'c', 'd')},
+        )
+        outra.start()
+        try:
+            # As 4 threads do pool estão presas nos blocos da outra requisição
+            ocupados.wait(timeout=5)
+            resultados = executar_em_paralelo(
+                a=lambda: threading.current_thread().name,
+                b=lambda: threading.current_thread().name,
+            )
+        finally:
+            liberar.set()
+            outra.join()
+        self.assertEqual(resultados['a'], threading.current_thread().name)
+        self.assertEqual(resultados['b'], threading.current_thread().name)
+
+
+@override_settings(API_CACHE_PUBLICO_SEGUNDOS=0, API_CONSULTAS_PARALELAS=4)
+class DashboardsParalelosTestCase(TransactionTestCase):
+    """Testes para os dashboards com as consultas em paralelo (dados confirmados no banco)."""
+    
+    def setUp(self):
+        cache.clear()
+        gerar_dados_sinteticos(professores=3, alunos=30, turmas=4, alunos_por_turma=10, dias=10)
+        admin = User.objects.create_superuser('admin', 'admin@test.com', 'admin123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=admin)
+    
+    def test_mesmo_resultado_em_paralelo_e_em_sequencia(self):
+        """Testa que os dashboards respondem o mesmo com e sem paralelismo."""
+        matricula = Matricula.objects.order_by('id').first()
+        urls = [
+            reverse('analytics-geral'),
+            reverse('estatisticas'),
+            reverse('dashboard-professor-id', kwargs={'professor_id': matricula.turma.professor_id}),
+            reverse('dashboard-aluno-id', kwargs={'aluno_id': matricula.aluno_id}),
+            reverse('turma-dashboard', kwargs={'pk': matricula.turma_id}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                paralelo = self.client.get(url)
+                with override_settings(API_CONSULTAS_PARALELAS=1):
+                    sequencial = self.client.get(url)
+                self.assertEqual(paralelo.status_code, status.HTTP_200_OK)
+                dados, esperado = paralelo.json(), sequencial.json()
+                dados.pop('ultima_atualizacao', None)
+                esperado.pop('ultima_atualizacao', None)
+                self.assertEqual(dados, esperado)
+
+
+@override_settings(API_CONSULTAS_LENTAS_MS=0.001, API_CACHE_PUBLICO_SEGUNDOS=0)
+class ConsultasLentasTestCase(APITestCase):
+    """Testes para a captura de consultas lentas (limite mínimo: captura todas)."""
+    
+    def setUp(self):
+        limpar()
+        self.addCleanup(limpar)
+        gerar_dados_sinteticos(professores=2, alunos=10, turmas=2, alunos_por_turma=5, dias=5)
+        self.admin = User.objects.create_superuser('admin', 'admin@test.com', 'admin123')
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_impressao_digital(self):
+        """Testa que valores e listas IN não separam a mesma consulta."""
+        self.assertEqual(
+            impressao_digital("SELECT * FROM t WHERE a = 10 AND b IN (%s, %s, %s)  AND c = 'x'"),
+            impressao_digital("SELECT * FROM t WHERE a = 2 AND b IN (%s) AND c = 'yy'"),
+        )
+        self.assertEqual(impressao_digital('SELECT * FROM t WHERE b IN (%s, %s)'), 'SELECT * FROM t WHERE b IN (...)')
+    
+    def test_view_e_origem_da_consulta(self):
+        """Testa a view e a linha de código registradas para cada consulta."""
+        self.client.get(reverse('analytics-geral'))
+        response = self.client.get(reverse('consultas-lentas'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        impressoes = response.data['impressoes']
+        self.assertEqual(response.data['capturadas'], sum(linha['execucoes'] for linha in impressoes))
+        totais = [linha['total_ms'] for linha in impressoes]
+        self.assertEqual(totais, sorted(totais, reverse=True))
+        
+        da_view = [linha for linha in impressoes if 'AnalyticsGeralView.get' in linha['views']]
+        self.assertTrue(da_view)
+        self.assertTrue(any(
+            origem.startswith('api/views_analystics.py:') for linha in da_view for origem in linha['origens']
+        ))
+        consulta = consultas_capturadas()[0]
+        self.assertNotIn('params', consulta)
+        self.assertEqual(len(consulta['parametros'] or ''), 12 if consulta['parametros'] else 0)
+    
+    @override_settings(API_CONSULTAS_LENTAS_MAXIMO=3)
+    def test_buffer_limitado(self):
+        """Testa que o buffer guarda só as consultas mais recentes."""
+        self.client.get(reverse('analytics-geral'))
+        self.assertEqual(len(consultas_capturadas()), 3)
+    
+    def test_somente_admin_e_limpeza(self):
+        """Testa a permissão do endpoint e a limpeza do buffer."""
+        self.client.get(reverse('estatisticas'))
+        self.assertEqual(self.client.delete(reverse('consultas-lentas')).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(consultas_capturadas(), [])
+        
+        usuario = User.objects.create_user('comum', password='comum123')
+        self.client.force_authenticate(user=usuario)
+        self.assertEqual(self.client.get(reverse('consultas-lentas')).status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_comando(self):
+        """Testa o comando consultas_lentas executando as requisições no processo."""
+        saida = io.StringIO()
+        call_command('consultas_lentas', requisitar=[reverse('estatisticas')], stdout=saida)
+        texto = saida.getvalue()
+        self.assertIn(f'GET {reverse("estatisticas")}: 200', texto)
+        self.assertIn('views: EstatisticasView.get', texto)
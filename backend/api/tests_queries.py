@@ -0,0 +1,198 @@
+"""
+Orçamento de queries por endpoint.
+
+Executa todas as rotas de api/urls.py (e as views de análises) contra um
+conjunto de dados pequeno e outro maior, e verifica que o número de queries
+não cresce com o tamanho do resultado. Um serializer que passe a fazer
+queries por linha (N+1) quebra estes testes.
+"""
+
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.urls import URLPattern, URLResolver, NoReverseMatch, reverse
+from rest_framework.test import APIClient
+
+from . import urls as api_urls
+from .dados_sinteticos import gerar_dados_sinteticos, limpar_dados
+from .models import Professor, Aluno, Turma, Matricula, Presenca, TarefaRelatorio
+
+
+DATA_FINAL = date(2025, 3, 14)
+
+# Dois tamanhos de dados: o resultado de cada endpoint cresce entre eles
+CONJUNTOS = {
+    'pequeno': {'professores': 2, 'alunos': 10, 'turmas': 2, 'alunos_por_turma': 3, 'dias': 7},
+    'grande': {'professores': 3, 'alunos': 40, 'turmas': 6, 'alunos_por_turma': 12, 'dias': 21},
+}
+
+# Máximo de queries por endpoint (nome da rota -> orçamento).
+# Listas com PageNumberPagination incluem o COUNT; presenças (cursor) não.
+# None: o endpoint ainda faz queries por linha; mede, mas não reprova.
+ORCAMENTOS = {
+    'professor-list': 2,
+    'professor-detail': 2,
+    'professor-turmas': 2,
+    'aluno-list': 2,
+    'aluno-detail': 2,
+    'aluno-presencas': 2,
+    'turma-list': 2,
+    'turma-detail': 3,
+    'turma-alunos': 3,
+    'turma-matricular-aluno': 5,
+    'turma-representante': 2,
+    'turma-dashboard': 5,
+    'matricula-list': 2,
+    'matricula-detail': 1,
+    'presenca-list': 1,
+    'presenca-detail': 1,
+    'presenca-marcar-presenca': 13,
+    'profile': 2,
+    'turmas-ativas': 2,
+    'professores-publicos': 2,
+    'estatisticas': 5,
+    'analytics-geral': 11,
+    'ranking-faltas': 2,
+    'relatorio-presenca': 2,
+    'relatorio-tarefa': 1,
+    'dashboard-professor-id': 5,
+    'dashboard-aluno-id': 5,
+    'consultas-lentas': 0,
+}
+
+# Rotas que não listam dados do domínio
+IGNORADAS = {
+    'api-root': 'índice do router',
+    'schema': 'documentação',
+    'swagger-ui': 'documentação',
+    'redoc': 'documentação',
+    'register': 'escrita de usuário',
+    'login': 'autenticação',
+    'logout': 'autenticação',
+    'change-password': 'escrita de usuário',
+    'relatorio-tarefa-download': 'envio de arquivo',
+    'dashboard-professor': 'mesma view de dashboard-professor-id, para o professor autenticado',
+    'dashboard-aluno': 'mesma view de dashboard-aluno-id, para o aluno autenticado',
+}
+
+
+def nomes_das_rotas(padroes):
+    """Nomes de todas as rotas de um urlpatterns, incluindo os includes."""
+    nomes = set()
+    for padrao in padroes:
+        if isinstance(padrao, URLResolver):
+            nomes |= nomes_das_rotas(padrao.url_patterns)
+        elif isinstance(padrao, URLPattern) and padrao.name:
+            nomes.add(padrao.name)
+    return nomes
+
+
+@override_settings(API_CACHE_PUBLICO_SEGUNDOS=0)
+class OrcamentoQueriesTestCase(TestCase):
+    """Número de queries constante em relação ao tamanho dos dados (sem o cache das rotas públicas)."""
+
+    def requisicoes(self):
+        """Monta (nome da rota, método, url, payload) com os dados atuais."""
+        professor = Professor.objects.annotate(n=Count('turmas')).order_by('-n', 'id').first()
+        aluno = Aluno.objects.annotate(n=Count('matriculas')).order_by('-n', 'id').first()
+        turma = Turma.objects.annotate(n=Count('matriculas')).order_by('-n', 'id').first()
+        matricula = Matricula.objects.filter(turma=turma).order_by('id').first()
+        presenca = Presenca.objects.filter(matricula=matricula).order_by('id').first()
+        nao_matriculado = Aluno.objects.exclude(matriculas__turma=turma).order_by('id').first()
+        tarefa = TarefaRelatorio.objects.create(parametros={'formato': 'csv'}, solicitante=self.admin)
+
+        rotas = [
+            ('professor-list', 'get', {}, None),
+            ('professor-detail', 'get', {'pk': professor.pk}, None),
+            ('professor-turmas', 'get', {'pk': professor.pk}, None),
+            ('aluno-list', 'get', {}, None),
+            ('aluno-detail', 'get', {'pk': aluno.pk}, None),
+            ('aluno-presencas', 'get', {'pk': aluno.pk}, None),
+            ('turma-list', 'get', {}, None),
+            ('turma-detail', 'get', {'pk': turma.pk}, None),
+            ('turma-alunos', 'get', {'pk': turma.pk}, None),
+            ('turma-matricular-aluno', 'post', {'pk': turma.pk}, {'aluno_id': nao_matriculado.pk}),
+            ('turma-representante', 'get', {'pk': turma.pk}, None),
+            ('turma-dashboard', 'get', {'pk': turma.pk}, None),
+            ('matricula-list', 'get', {}, None),
+            ('matricula-detail', 'get', {'pk': matricula.pk}, None),
+            ('presenca-list', 'get', {}, None),
+            ('presenca-detail', 'get', {'pk': presenca.pk}, None),
+            ('presenca-marcar-presenca', 'post', {}, {
+                'turma_id': turma.pk,
+                'data': DATA_FINAL.isoformat(),
+                'registros': [
+                    {'aluno_id': aluno_id, 'status': 'Presente'}
+                    for aluno_id in turma.matriculas.values_list('aluno_id', flat=True)
+                ],
+            }),
+            ('profile', 'get', {}, None),
+            ('turmas-ativas', 'get', {}, None),
+            ('professores-publicos', 'get', {}, None),
+            ('estatisticas', 'get', {}, None),
+            ('analytics-geral', 'get', {}, None),
+            ('ranking-faltas', 'get', {}, None),
+            ('relatorio-presenca', 'post', {}, {
+                'data_inicio': (DATA_FINAL - timedelta(days=60)).isoformat(),
+                'data_fim': DATA_FINAL.isoformat(),
+            }),
+            ('relatorio-tarefa', 'get', {'tarefa_id': tarefa.pk}, None),
+            ('dashboard-professor-id', 'get', {'professor_id': professor.pk}, None),
+            ('dashboard-aluno-id', 'get', {'aluno_id': aluno.pk}, None),
+            ('consultas-lentas', 'get', {}, None),
+        ]
+
+        for nome, metodo, kwargs, payload in rotas:
+            try:
+                url = reverse(nome, kwargs=kwargs)
+            except NoReverseMatch:
+                url = None
+            yield nome, metodo, url, payload
+
+    def medir(self, parametros):
+        """Gera o conjunto de dados e conta as queries de cada endpoint."""
+        limpar_dados()
+        gerar_dados_sinteticos(seed=1, data_final=DATA_FINAL, **parametros)
+
+        client = APIClient()
+
+        medidas = {}
+        for nome, metodo, url, payload in self.requisicoes():
+            if url is None:
+                continue
+            # Usuário novo a cada requisição, como na autenticação real: nada fica em cache na instância
+            client.force_authenticate(User.objects.get(pk=self.admin.pk))
+            contador = []
+            with connection.execute_wrapper(lambda execute, *args: contador.append(1) or execute(*args)):
+                response = getattr(client, metodo)(url, payload, format='json')
+            self.assertLess(response.status_code, 400, f'{nome}: {response.status_code}')
+            medidas[nome] = len(contador)
+        return medidas
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@test.com', 'admin123')
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        """Testa que toda rota nova declara um orçamento (ou o motivo de ficar de fora)."""
+        sem_orcamento = nomes_das_rotas(api_urls.urlpatterns) - set(ORCAMENTOS) - set(IGNORADAS)
+        self.assertEqual(sem_orcamento, set(), 'Declare o orçamento de queries destas rotas em ORCAMENTOS')
+
+    def test_queries_constantes(self):
+        """Testa que o número de queries não cresce com o resultado e respeita o orçamento."""
+        pequeno = self.medir(CONJUNTOS['pequeno'])
+        grande = self.medir(CONJUNTOS['grande'])
+
+        for nome, orcamento in ORCAMENTOS.items():
+            with self.subTest(endpoint=nome):
+                if nome not in grande:
+                    self.skipTest(f'rota {nome} não publicada')
+                if orcamento is None:
+                    continue
+                self.assertEqual(
+                    grande[nome], pequeno[nome],
+                    f'{nome}: {pequeno[nome]} queries no conjunto pequeno, {grande[nome]} no grande (N+1?)'
+                )
+                self.assertLessEqual(grande[nome], orcamento, f'{nome}: acima do orçamento')
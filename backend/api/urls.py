@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
 from . import views
+from . import views_analystics
 from .views_auth import RegisterView, LoginView, LogoutView, ProfileView, ChangePasswordView
 
 # Configurar router para viewsets
@@ -29,6 +30,20 @@ urlpatterns = [
     path('professores-publicos/', views.ProfessoresPublicosView.as_view(), name='professores-publicos'),
     path('estatisticas/', views.EstatisticasView.as_view(), name='estatisticas'),
     
+    # Análises
+    path('analytics/geral/', views_analystics.AnalyticsGeralView.as_view(), name='analytics-geral'),
+    path('analytics/professor/dashboard/', views_analystics.DashboardProfessorView.as_view(), name='dashboard-professor'),
+    path('analytics/professor/<int:professor_id>/dashboard/', views_analystics.DashboardProfessorView.as_view(), name='dashboard-professor-id'),
+    path('analytics/aluno/dashboard/', views_analystics.DashboardAlunoView.as_view(), name='dashboard-aluno'),
+    path('analytics/aluno/<int:aluno_id>/dashboard/', views_analystics.DashboardAlunoView.as_view(), name='dashboard-aluno-id'),
+    path('analytics/ranking-faltas/', views_analystics.RankingFaltasView.as_view(), name='ranking-faltas'),
+    path('analytics/relatorio-presenca/', views_analystics.RelatorioPresencaView.as_view(), name='relatorio-presenca'),
+    path('analytics/relatorios/<int:tarefa_id>/', views_analystics.RelatorioTarefaView.as_view(), name='relatorio-tarefa'),
+    path('analytics/relatorios/<int:tarefa_id>/download/', views_analystics.RelatorioTarefaDownloadView.as_view(), name='relatorio-tarefa-download'),
+    
+    # Diagnóstico
+    path('diagnostico/consultas-lentas/', views_analystics.ConsultasLentasView.as_view(), name='consultas-lentas'),
+    
     # Documentação
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
     path('docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
@@ -11,16 +11,26 @@ from rest_framework.authentication import TokenAuthentication, SessionAuthentica
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Avg, Q
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, F, ExpressionWrapper, FloatField, Prefetch
 from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
 from datetime import date
 
-from .models import Professor, Aluno, Turma, Matricula, Presenca
+from .models import Professor, Aluno, Turma, Matricula, Presenca, ResumoDiarioPresenca
+from .cache import cache_publico
+from .chamada import registrar_chamada
+from .metricas import contar_registros_chamada, instrumentar
+from .pagination import PresencaPaginacao
+from .paralelo import executar_em_paralelo
+from .principal import obter_principal
+from .replica import usar_replica
 from .serializers import (
-    ProfessorSerializer, AlunoSerializer, TurmaSerializer,
+    CamposDinamicosMixin, ProfessorSerializer, AlunoSerializer, TurmaSerializer,
     MatriculaSerializer, PresencaSerializer,
     ProfessorDetailSerializer, AlunoDetailSerializer, TurmaDetailSerializer,
-    DashboardTurmaSerializer
+    DashboardTurmaSerializer, MatriculaRapida, PresencaRapida
 )
 from .permissions import (
     IsAdminOrReadOnly, IsProfessorOrAdmin, IsAlunoOrAdmin, 
@@ -29,9 +39,166 @@ from .permissions import (
 )
 
 
+# ========== QUERYSETS ==========
+# Carregam de uma vez as relações e contagens lidas pelos serializers,
+# para que listas e detalhes rodem com um número fixo de queries.
+# O annotate com Count agrupa as linhas e descarta o Meta.ordering: a ordem é
+# repetida (com o id para desempate) para que a paginação seja estável.
+
+def professores_com_totais():
+    """Professores com usuário e total de turmas (ProfessorSerializer)."""
+    return (
+        Professor.objects.select_related('usuario')
+        .annotate(total_turmas=Count('turmas'))
+        .order_by(*Professor._meta.ordering, 'pk')
+    )
+
+
+def alunos_com_totais():
+    """Alunos com usuário e total de matrículas (AlunoSerializer)."""
+    return (
+        Aluno.objects.select_related('usuario')
+        .annotate(total_turmas=Count('matriculas'))
+        .order_by(*Aluno._meta.ordering, 'pk')
+    )
+
+
+def turmas_com_totais():
+    """Turmas com professor, representante e total de alunos (TurmaSerializer)."""
+    return (
+        Turma.objects.select_related('professor', 'representante')
+        .annotate(total_alunos=Count('matriculas'))
+        .order_by(*Turma._meta.ordering, 'pk')
+    )
+
+
+def matriculas_com_relacionados():
+    """Matrículas com aluno e turma (MatriculaSerializer)."""
+    return Matricula.objects.select_related('aluno', 'turma')
+
+
+def presencas_com_relacionados():
+    """Presenças com a matrícula, o aluno e a turma (PresencaSerializer)."""
+    return Presenca.objects.select_related('matricula__aluno', 'matricula__turma')
+
+
+# ========== CAMPOS DINÂMICOS ==========
+# Com ?fields= ou ?omit= (CamposDinamicosMixin) a queryset carrega só as
+# colunas e relações lidas pelos campos pedidos.
+
+def _caminhos_select_related(arvore, prefixo=''):
+    """'professor__usuario', 'representante'... a partir de query.select_related."""
+    caminhos = []
+    for nome, filhos in arvore.items():
+        caminho = f'{prefixo}{nome}'
+        caminhos.extend(_caminhos_select_related(filhos, f'{caminho}__') or [caminho])
+    return caminhos
+
+
+def restringir_colunas(queryset, colunas):
+    """
+    Adia as colunas que nenhum campo lê (do modelo e das relações do
+    select_related) e deixa de juntar ou pré-carregar as relações não usadas.
+    `colunas` vem de CamposDinamicosMixin.colunas_do_modelo(); um caminho igual
+    ao nome de uma relação ('usuario') pede a relação inteira.
+    """
+    modelo = queryset.model
+    relacoes = queryset.query.select_related
+    if relacoes is True:
+        return queryset  # select_related() sem argumentos: relações desconhecidas
+    
+    primeiros = {coluna.split('__')[0] for coluna in colunas}
+    for nome in primeiros:
+        try:
+            modelo._meta.get_field(nome.removesuffix('_id'))
+        except FieldDoesNotExist:
+            return queryset  # propriedade sem dependências declaradas
+    
+    def passa_por(caminho):
+        return any(
+            coluna == caminho or coluna.startswith(f'{caminho}__') or caminho.startswith(f'{coluna}__')
+            for coluna in colunas
+        )
+    
+    juntadas = [caminho for caminho in _caminhos_select_related(relacoes or {}) if passa_por(caminho)]
+    prefetches = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if getattr(lookup, 'prefetch_to', lookup).split('__')[0] in primeiros
+    ]
+    
+    # Modelo principal e cada relação juntada (com as intermediárias: matricula de matricula__aluno)
+    prefixos = {''}
+    for caminho in juntadas:
+        partes = caminho.split('__')
+        prefixos.update('__'.join(partes[:i]) for i in range(1, len(partes) + 1))
+    
+    adiadas = []
+    for prefixo in prefixos:
+        if prefixo and any(prefixo == coluna or prefixo.startswith(f'{coluna}__') for coluna in colunas):
+            continue  # relação inteira (serializer aninhado)
+        modelo_prefixo = modelo
+        for parte in filter(None, prefixo.split('__')):
+            modelo_prefixo = modelo_prefixo._meta.get_field(parte).related_model
+        lidas = {
+            (coluna[len(prefixo) + 2:] if prefixo else coluna).split('__')[0]
+            for coluna in colunas
+            if not prefixo or coluna.startswith(f'{prefixo}__')
+        }
+        for campo in modelo_prefixo._meta.concrete_fields:
+            caminho = f'{prefixo}__{campo.name}' if prefixo else campo.name
+            if campo.primary_key or campo.name in lidas or campo.attname in lidas or caminho in prefixos:
+                continue
+            adiadas.append(caminho)
+    
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if juntadas:
+        queryset = queryset.select_related(*juntadas)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset.defer(*adiadas)
+
+
+class CamposDinamicosViewMixin:
+    """Listagens e detalhes com ?fields=/?omit= leem do banco só o necessário."""
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if getattr(self, 'action', 'list') in ('list', 'retrieve') and hasattr(serializer_class, 'colunas_do_modelo'):
+            colunas = serializer_class.colunas_do_modelo(self.request)
+            if colunas is not None:
+                queryset = restringir_colunas(queryset, colunas)
+        return queryset
+
+
+class ListaRapidaMixin:
+    """
+    A ação list serializa as linhas com `lista_rapida` (SerializadorRapido),
+    direto de values(): mesmo JSON do serializer_class, sem um serializer do
+    DRF por linha. API_LISTA_RAPIDA=False volta ao serializer do DRF.
+    """
+    
+    lista_rapida = None
+    
+    def list(self, request, *args, **kwargs):
+        if self.lista_rapida is None or not getattr(settings, 'API_LISTA_RAPIDA', True):
+            return super().list(request, *args, **kwargs)
+        
+        rapida = self.lista_rapida(request)
+        # O cursor do PaginacaoKeyset é montado a partir das colunas da chave,
+        # que precisam vir em values() mesmo fora de ?fields=
+        if hasattr(self.paginator, 'campos'):
+            rapida.incluir(self.paginator.campos())
+        linhas = rapida.valores(self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(linhas)
+        if pagina is not None:
+            return self.get_paginated_response(rapida.serializar(pagina))
+        return Response(rapida.serializar(linhas))
+
+
 # ========== VIEWSETS PADRÃO ==========
 
-class ProfessorViewSet(viewsets.ModelViewSet):
+class ProfessorViewSet(CamposDinamicosViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para o modelo Professor.
     
@@ -60,6 +227,18 @@ class ProfessorViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
     
+    def get_queryset(self):
+        """
+        Carrega as relações usadas pelo serializer de cada ação.
+        """
+        if self.action == 'turmas':
+            # A ação só precisa do professor; as turmas são buscadas à parte
+            return Professor.objects.all()
+        queryset = professores_com_totais()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch('turmas', queryset=turmas_com_totais()))
+        return queryset
+    
     def get_serializer_class(self):
         """
         Retorna serializer diferente para detail view.
@@ -75,12 +254,12 @@ class ProfessorViewSet(viewsets.ModelViewSet):
         Endpoint: GET /api/professores/{id}/turmas/
         """
         professor = self.get_object()
-        turmas = professor.turmas.all()
-        serializer = TurmaSerializer(turmas, many=True)
+        turmas = turmas_com_totais().filter(professor=professor)
+        serializer = TurmaSerializer(turmas, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
 
-class AlunoViewSet(viewsets.ModelViewSet):
+class AlunoViewSet(CamposDinamicosViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para o modelo Aluno.
     
@@ -113,6 +292,18 @@ class AlunoViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
     
+    def get_queryset(self):
+        """
+        Carrega as relações usadas pelo serializer de cada ação.
+        """
+        if self.action == 'presencas':
+            # A ação só precisa do aluno; as presenças são buscadas à parte
+            return Aluno.objects.all()
+        queryset = alunos_com_totais()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch('matriculas', queryset=matriculas_com_relacionados()))
+        return queryset
+    
     def get_serializer_class(self):
         """
         Retorna serializer diferente para detail view.
@@ -124,19 +315,20 @@ class AlunoViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], permission_classes=[IsAlunoOrAdmin])
     def presencas(self, request, pk=None):
         """
-        Lista presenças de um aluno específico.
+        Lista presenças de um aluno específico (paginação por cursor).
         Endpoint: GET /api/alunos/{id}/presencas/
         """
         aluno = self.get_object()
-        matriculas = aluno.matriculas.all()
         
-        # Coletar todas as presenças do aluno
-        presencas = Presenca.objects.filter(matricula__in=matriculas)
-        serializer = PresencaSerializer(presencas, many=True)
-        return Response(serializer.data)
+        # Coletar as presenças do aluno, uma página por vez
+        presencas = presencas_com_relacionados().filter(matricula__aluno=aluno)
+        paginator = PresencaPaginacao()
+        pagina = paginator.paginate_queryset(presencas, request, view=self)
+        serializer = PresencaSerializer(pagina, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
 
 
-class TurmaViewSet(viewsets.ModelViewSet):
+class TurmaViewSet(CamposDinamicosViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para o modelo Turma.
     
@@ -173,6 +365,21 @@ class TurmaViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
     
+    def get_queryset(self):
+        """
+        Carrega as relações usadas pelo serializer de cada ação.
+        """
+        if self.action in ['alunos', 'matricular_aluno']:
+            # Ações que só precisam da turma
+            return Turma.objects.all()
+        queryset = turmas_com_totais()
+        if self.action in ['retrieve', 'dashboard']:
+            # Professor serializado por completo (com usuário)
+            queryset = queryset.select_related('professor__usuario')
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch('matriculas', queryset=matriculas_com_relacionados()))
+        return queryset
+    
     def get_serializer_class(self):
         """
         Retorna serializer diferente para detail view.
@@ -181,6 +388,42 @@ class TurmaViewSet(viewsets.ModelViewSet):
             return TurmaDetailSerializer
         return TurmaSerializer
     
+    # ========== GET CONDICIONAL ==========
+    
+    def etag_turma(self):
+        """
+        ETag da ação atual, derivada da versão da turma (uma query leve).
+        Retorna None se a turma não existir, deixando o 404 para get_object.
+        """
+        try:
+            versao = Turma.objects.filter(pk=self.kwargs['pk']).values_list('versao', flat=True).first()
+        except (TypeError, ValueError):
+            return None
+        if versao is None:
+            return None
+        formato = self.request.accepted_renderer.format
+        return quote_etag(f'turma-{self.kwargs["pk"]}-v{versao}-{self.action}-{formato}')
+    
+    def nao_modificado(self, etag):
+        """Verifica o If-None-Match da requisição contra a ETag atual."""
+        if etag is None:
+            return False
+        etags = parse_etags(self.request.headers.get('If-None-Match', ''))
+        return etag in etags or '*' in etags
+    
+    def resposta_condicional(self, gerar_resposta):
+        """
+        Responde 304 Not Modified se o cliente já tem a versão atual;
+        senão gera a resposta completa e anexa a ETag.
+        """
+        etag = self.etag_turma()
+        if self.nao_modificado(etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = gerar_resposta()
+        if etag is not None and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+    
     # ========== ROTAS DE RELACIONAMENTO ==========
     
     @action(detail=True, methods=['get'])
@@ -188,10 +431,14 @@ class TurmaViewSet(viewsets.ModelViewSet):
         """
         Lista alunos matriculados na turma.
         Endpoint: GET /api/turmas/{id}/alunos/
+        Suporta If-None-Match (ETag pela versão da turma).
         """
+        return self.resposta_condicional(self.listar_alunos)
+    
+    def listar_alunos(self):
         turma = self.get_object()
-        matriculas = turma.matriculas.all()
-        serializer = MatriculaSerializer(matriculas, many=True)
+        matriculas = matriculas_com_relacionados().filter(turma=turma)
+        serializer = MatriculaSerializer(matriculas, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsProfessorOrAdmin])
@@ -226,7 +473,7 @@ class TurmaViewSet(viewsets.ModelViewSet):
         
         # Criar matrícula
         matricula = Matricula.objects.create(turma=turma, aluno=aluno)
-        serializer = MatriculaSerializer(matricula)
+        serializer = MatriculaSerializer(matricula, context=self.get_serializer_context())
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['get', 'put'])
@@ -241,7 +488,7 @@ class TurmaViewSet(viewsets.ModelViewSet):
         
         if request.method == 'GET':
             if turma.representante:
-                serializer = AlunoSerializer(turma.representante)
+                serializer = AlunoSerializer(turma.representante, context=self.get_serializer_context())
                 return Response(serializer.data)
             return Response({'message': 'Nenhum representante definido'})
         
@@ -273,7 +520,7 @@ class TurmaViewSet(viewsets.ModelViewSet):
             turma.representante = aluno
             turma.save()
             
-            serializer = AlunoSerializer(aluno)
+            serializer = AlunoSerializer(aluno, context=self.get_serializer_context())
             return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
@@ -281,33 +528,42 @@ class TurmaViewSet(viewsets.ModelViewSet):
         """
         Retorna dashboard completo da turma.
         Endpoint: GET /api/turmas/{id}/dashboard/
+        Suporta If-None-Match (ETag pela versão da turma).
+        ?fields=/?omit= selecionam os campos de cada aluno, como em /alunos/;
+        turma e professor vêm completos.
         """
+        return self.resposta_condicional(self.montar_dashboard)
+    
+    def montar_dashboard(self):
         turma = self.get_object()
         
-        # Dados da turma
+        # Dados da turma (sem o request: a seleção de campos vale para os alunos)
         turma_serializer = TurmaSerializer(turma)
         
         # Dados do professor
         professor_serializer = ProfessorSerializer(turma.professor)
         
-        # Alunos matriculados
-        matriculas = turma.matriculas.all()
-        alunos_serializer = MatriculaSerializer(matriculas, many=True)
+        # Alunos matriculados e presenças da turma (resumo diário), em paralelo
+        resultados = executar_em_paralelo(
+            alunos=lambda: MatriculaSerializer(
+                matriculas_com_relacionados().filter(turma=turma), many=True,
+                context=self.get_serializer_context()
+            ).data,
+            totais=lambda: ResumoDiarioPresenca.objects.filter(turma=turma).aggregate(
+                **ResumoDiarioPresenca.somas()
+            ),
+        )
         
         # Estatísticas
-        total_alunos = matriculas.count()
+        total_alunos = turma.total_alunos
         
-        # Calcular presenças desta turma
-        presencas_turma = Presenca.objects.filter(matricula__turma=turma)
-        total_presencas = presencas_turma.count()
+        totais = resultados['totais']
+        total_presencas = totais['total']
         
         if total_presencas > 0:
-            presentes = presencas_turma.filter(status='Presente').count()
-            taxa_presente = (presentes / total_presencas) * 100
-            ausentes = presencas_turma.filter(status='Ausente').count()
-            taxa_ausente = (ausentes / total_presencas) * 100
-            justificados = presencas_turma.filter(status='Justificado').count()
-            taxa_justificado = (justificados / total_presencas) * 100
+            taxa_presente = (totais['total_presentes'] / total_presencas) * 100
+            taxa_ausente = (totais['total_ausentes'] / total_presencas) * 100
+            taxa_justificado = (totais['total_justificados'] / total_presencas) * 100
         else:
             taxa_presente = 0
             taxa_ausente = 0
@@ -326,14 +582,14 @@ class TurmaViewSet(viewsets.ModelViewSet):
         data = {
             'turma': turma_serializer.data,
             'professor': professor_serializer.data,
-            'alunos': alunos_serializer.data,
+            'alunos': resultados['alunos'],
             'estatisticas': estatisticas
         }
         
         return Response(data)
 
 
-class MatriculaViewSet(viewsets.ModelViewSet):
+class MatriculaViewSet(ListaRapidaMixin, CamposDinamicosViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para o modelo Matricula.
     
@@ -342,8 +598,9 @@ class MatriculaViewSet(viewsets.ModelViewSet):
     - POST/PUT/DELETE: Apenas administradores
     """
     
-    queryset = Matricula.objects.all()
+    queryset = matriculas_com_relacionados()
     serializer_class = MatriculaSerializer
+    lista_rapida = MatriculaRapida
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['turma', 'aluno']
     ordering_fields = ['data_matricula']
@@ -360,7 +617,7 @@ class MatriculaViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class PresencaViewSet(viewsets.ModelViewSet):
+class PresencaViewSet(ListaRapidaMixin, CamposDinamicosViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para o modelo Presenca.
     
@@ -370,12 +627,13 @@ class PresencaViewSet(viewsets.ModelViewSet):
     - DELETE: Apenas administradores
     """
     
-    queryset = Presenca.objects.all()
+    queryset = presencas_com_relacionados()
     serializer_class = PresencaSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    lista_rapida = PresencaRapida
+    # Paginação por cursor em (data, id): a ordenação é fixa
+    pagination_class = PresencaPaginacao
+    filter_backends = [DjangoFilterBackend]
     filterset_fields = ['matricula', 'data', 'status']
-    ordering_fields = ['data', 'data_registro']
-    ordering = ['-data']
     
     def get_permissions(self):
         """
@@ -396,6 +654,7 @@ class PresencaViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     @action(detail=False, methods=['post'], permission_classes=[CanMarcarPresenca])
+    @instrumentar('marcar_presenca')
     def marcar_presenca(self, request):
         """
         Marca presença para múltiplos alunos de uma vez.
@@ -420,70 +679,41 @@ class PresencaViewSet(viewsets.ModelViewSet):
             )
         
         # Verificar se o professor tem permissão (se não for admin)
-        if not request.user.is_staff and hasattr(request.user, 'professor'):
-            if turma.professor != request.user.professor:
+        principal = obter_principal(request)
+        if not principal.is_admin and principal.is_professor:
+            if turma.professor_id != principal.professor_id:
                 return Response(
                     {'error': 'Você não tem permissão para marcar presença nesta turma'}, 
                     status=status.HTTP_403_FORBIDDEN
                 )
         
-        resultados = []
-        for registro in registros:
-            aluno_id = registro.get('aluno_id')
-            status_presenca = registro.get('status', 'Presente')
-            observacao = registro.get('observacao', '')
-            
-            try:
-                matricula = Matricula.objects.get(turma=turma, aluno_id=aluno_id)
-                
-                presenca, created = Presenca.objects.update_or_create(
-                    matricula=matricula,
-                    data=data_aula,
-                    defaults={
-                        'status': status_presenca,
-                        'observacao': observacao
-                    }
-                )
-                
-                resultados.append({
-                    'aluno_id': aluno_id,
-                    'status': 'sucesso',
-                    'presenca_id': presenca.id,
-                    'criado': created
-                })
-                
-            except Matricula.DoesNotExist:
-                resultados.append({
-                    'aluno_id': aluno_id,
-                    'status': 'erro',
-                    'mensagem': 'Aluno não matriculado nesta turma'
-                })
-            except Exception as e:
-                resultados.append({
-                    'aluno_id': aluno_id,
-                    'status': 'erro',
-                    'mensagem': str(e)
-                })
+        resultados = registrar_chamada(turma, data_aula, registros)
+        contar_registros_chamada(resultados)
         
         return Response({'resultados': resultados})
 
 
 # ========== VIEWS PARA ROTAS PÚBLICAS ==========
 
-class TurmasAtivasView(ListAPIView):
+class TurmasAtivasView(CamposDinamicosViewMixin, ListAPIView):
     """
     Lista apenas turmas ativas (acesso público).
     Endpoint: GET /api/turmas-ativas/
     """
     
-    queryset = Turma.objects.filter(status='Ativa')
+    queryset = turmas_com_totais().filter(status='Ativa')
     serializer_class = TurmaSerializer
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter]
     search_fields = ['nome', 'descricao']
+    
+    @cache_publico
+    @usar_replica
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
-class ProfessoresPublicosView(ListAPIView):
+class ProfessoresPublicosView(CamposDinamicosViewMixin, ListAPIView):
     """
     Lista professores (apenas nome e departamento - acesso público).
     Endpoint: GET /api/professores-publicos/
@@ -492,11 +722,16 @@ class ProfessoresPublicosView(ListAPIView):
     queryset = Professor.objects.filter(ativo=True)
     permission_classes = [AllowAny]
     
+    @cache_publico
+    @usar_replica
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
     def get_serializer_class(self):
         """
         Serializer limitado para dados públicos.
         """
-        class ProfessorPublicoSerializer(serializers.ModelSerializer):
+        class ProfessorPublicoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
             class Meta:
                 model = Professor
                 fields = ['id', 'nome', 'departamento']
@@ -512,39 +747,43 @@ class EstatisticasView(APIView):
     
     permission_classes = [AllowAny]
     
+    @cache_publico
+    @usar_replica
     def get(self, request):
-        total_professores = Professor.objects.filter(ativo=True).count()
-        total_alunos = Aluno.objects.count()
-        total_turmas = Turma.objects.filter(status='Ativa').count()
+        # Consultas independentes, executadas em paralelo
+        resultados = executar_em_paralelo(
+            total_professores=Professor.objects.filter(ativo=True).count,
+            total_alunos=Aluno.objects.count,
+            total_turmas=Turma.objects.filter(status='Ativa').count,
+            totais=lambda: ResumoDiarioPresenca.objects.aggregate(**ResumoDiarioPresenca.somas()),
+            # Turma com maior presença
+            melhor_turma=ResumoDiarioPresenca.objects.values('turma_id', 'turma__nome').annotate(
+                **ResumoDiarioPresenca.somas()
+            ).filter(total__gt=0).annotate(
+                taxa=ExpressionWrapper(F('total_presentes') * 100.0 / F('total'), output_field=FloatField())
+            ).order_by('-taxa').first,
+        )
         
         # Calcular taxa média de presença
-        total_presencas = Presenca.objects.count()
+        totais = resultados['totais']
+        total_presencas = totais['total']
         if total_presencas > 0:
-            presencas_presente = Presenca.objects.filter(status='Presente').count()
-            taxa_presenca_geral = (presencas_presente / total_presencas) * 100
+            taxa_presenca_geral = (totais['total_presentes'] / total_presencas) * 100
         else:
             taxa_presenca_geral = 0
         
-        # Turma com maior presença
-        turmas_com_presenca = Turma.objects.annotate(
-            total_presencas=Count('matriculas__presencas'),
-            presentes=Count('matriculas__presencas', filter=Q(matriculas__presencas__status='Presente'))
-        ).filter(total_presencas__gt=0)
-        
-        if turmas_com_presenca.exists():
-            melhor_turma = turmas_com_presenca.annotate(
-                taxa=Avg('presentes') / Avg('total_presencas') * 100
-            ).order_by('-taxa').first()
-            melhor_turma_nome = melhor_turma.nome
-            melhor_turma_taxa = round(melhor_turma.taxa, 2) if melhor_turma.taxa else 0
+        melhor_turma = resultados['melhor_turma']
+        if melhor_turma:
+            melhor_turma_nome = melhor_turma['turma__nome']
+            melhor_turma_taxa = round(melhor_turma['taxa'], 2) if melhor_turma['taxa'] else 0
         else:
             melhor_turma_nome = "Nenhuma"
             melhor_turma_taxa = 0
         
         data = {
-            'total_professores': total_professores,
-            'total_alunos': total_alunos,
-            'total_turmas_ativas': total_turmas,
+            'total_professores': resultados['total_professores'],
+            'total_alunos': resultados['total_alunos'],
+            'total_turmas_ativas': resultados['total_turmas'],
             'taxa_presenca_geral': round(taxa_presenca_geral, 2),
             'melhor_turma': {
                 'nome': melhor_turma_nome,
@@ -6,33 +6,53 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework import status
-from django.db.models import Count, Avg, Q, F, Sum, Case, When, Value, FloatField
-from django.db.models.functions import TruncMonth, TruncWeek, ExtractWeekDay
+from django.db.models import Count, Avg, Q, F, Sum, Case, When, Value, FloatField, ExpressionWrapper, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek, ExtractWeekDay
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from datetime import datetime, timedelta, date
+import os
 import statistics
 
-from .models import Professor, Aluno, Turma, Matricula, Presenca
+from .models import Professor, Aluno, Turma, Matricula, Presenca, ResumoDiarioPresenca, TarefaRelatorio
+from .cache import medias_turmas
+from .consultas_lentas import limpar as limpar_consultas_lentas, resumo as resumo_consultas_lentas
+from .exportacao import FORMATOS_EXPORTACAO, exportar, linhas_presenca
+from .metricas import instrumentar
+from .pagination import RankingPaginacao
+from .paralelo import executar_em_paralelo
+from .principal import obter_principal
+from .ranking import ranking_alunos, ranking_por_turma
+from .replica import ler_do_primario, usar_replica
+from .relatorios import interpretar_parametros, montar_relatorio, nome_arquivo
 from .serializers import (
     ProfessorSerializer, AlunoSerializer, TurmaSerializer,
-    MatriculaSerializer, PresencaSerializer
+    MatriculaSerializer, PresencaSerializer, TarefaRelatorioSerializer
 )
 
 
 class DashboardProfessorView(APIView):
     """
     Dashboard específico para professor.
-    Endpoint: GET /api/analytics/professor/{id}/dashboard/
+    Endpoints: GET /api/analytics/professor/dashboard/ (professor autenticado)
+               GET /api/analytics/professor/{id}/dashboard/
+    Número de consultas constante: turmas, dias da semana e alunos com mais
+    faltas vêm cada um de uma consulta agrupada, executadas em paralelo.
     """
     
     permission_classes = [IsAuthenticated]
     
+    @instrumentar('dashboard_professor')
+    @usar_replica
     def get(self, request, professor_id=None):
         try:
+            principal = obter_principal(request)
             if professor_id:
                 professor = Professor.objects.get(id=professor_id)
-            elif hasattr(request.user, 'professor'):
-                professor = request.user.professor
+            elif principal.is_professor:
+                professor = principal.professor
             else:
                 return Response(
                     {'error': 'Professor não encontrado ou usuário não é professor'},
@@ -40,77 +60,98 @@ class DashboardProfessorView(APIView):
                 )
             
             # Verificar permissão (admin ou professor dono)
-            if not request.user.is_staff and not hasattr(request.user, 'professor'):
+            if not principal.is_admin and not principal.is_professor:
                 return Response(
                     {'error': 'Permissão negada'},
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            if hasattr(request.user, 'professor') and request.user.professor != professor:
+            if principal.is_professor and principal.professor_id != professor.id:
                 return Response(
                     {'error': 'Você só pode acessar seu próprio dashboard'},
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # Turmas do professor
-            turmas = professor.turmas.all()
-            
-            # Estatísticas gerais
-            total_turmas = turmas.count()
-            turmas_ativas = turmas.filter(status='Ativa').count()
-            turmas_concluidas = turmas.filter(status='Concluída').count()
+            data_30_dias_atras = timezone.now().date() - timedelta(days=30)
             
-            # Total de alunos em todas as turmas
-            total_alunos = Matricula.objects.filter(turma__in=turmas).count()
+            # As três consultas agrupadas são independentes: executadas em paralelo
+            resultados = executar_em_paralelo(
+                # Turmas com alunos e presenças, a partir dos contadores da
+                # matrícula (um JOIN só: as somas não se multiplicam)
+                turmas=lambda: list(
+                    professor.turmas.order_by().annotate(
+                        total_alunos=Count('matriculas'),
+                        total_presentes=Coalesce(Sum('matriculas__presenca_acumulada'), Value(0)),
+                        total_registros=Coalesce(Sum('matriculas__total_aulas'), Value(0)),
+                    ).values(
+                        'id', 'nome', 'status', 'data_inicio', 'data_fim',
+                        'total_alunos', 'total_presentes', 'total_registros'
+                    )
+                ),
+                # Presenças por dia da semana (últimos 30 dias), agrupadas no resumo diário
+                presencas_30_dias=lambda: list(
+                    ResumoDiarioPresenca.objects.filter(
+                        turma__professor=professor,
+                        data__gte=data_30_dias_atras
+                    ).annotate(
+                        dia_semana=ExtractWeekDay('data')
+                    ).values('dia_semana').annotate(
+                        **ResumoDiarioPresenca.somas()
+                    ).order_by('dia_semana')
+                ),
+                # Alunos com maior taxa de faltas: ordenados e limitados no banco
+                alunos_com_faltas=lambda: list(
+                    Matricula.objects.filter(turma__professor=professor).annotate(
+                        taxa_ausencia=Case(
+                            When(total_aulas__gt=0, then=ExpressionWrapper(
+                                F('ausencia_acumulada') * 100.0 / F('total_aulas'),
+                                output_field=FloatField()
+                            )),
+                            default=Value(0.0),
+                            output_field=FloatField()
+                        )
+                    ).order_by('-taxa_ausencia', '-ausencia_acumulada', 'id').values(
+                        'aluno_id', 'aluno__nome', 'turma__nome',
+                        'total_aulas', 'ausencia_acumulada', 'taxa_ausencia'
+                    )[:5]
+                ),
+            )
+            turmas = resultados['turmas']
             
-            # Calcular presenças nas turmas do professor
-            presencas_turmas = Presenca.objects.filter(matricula__turma__in=turmas)
-            total_presencas = presencas_turmas.count()
+            # Estatísticas gerais
+            total_turmas = len(turmas)
+            turmas_ativas = sum(1 for turma in turmas if turma['status'] == 'Ativa')
+            turmas_concluidas = sum(1 for turma in turmas if turma['status'] == 'Concluída')
+            total_alunos = sum(turma['total_alunos'] for turma in turmas)
+            total_presentes = sum(turma['total_presentes'] for turma in turmas)
+            total_presencas = sum(turma['total_registros'] for turma in turmas)
             
             if total_presencas > 0:
-                presentes = presencas_turmas.filter(status='Presente').count()
-                taxa_presenca_geral = (presentes / total_presencas) * 100
+                taxa_presenca_geral = (total_presentes / total_presencas) * 100
             else:
                 taxa_presenca_geral = 0
             
             # Turmas com melhor/maior presença
             turmas_com_estatisticas = []
             for turma in turmas:
-                matriculas_turma = turma.matriculas.all()
-                presencas_turma = Presenca.objects.filter(matricula__turma=turma)
-                total_presencas_turma = presencas_turma.count()
-                
-                if total_presencas_turma > 0:
-                    presentes_turma = presencas_turma.filter(status='Presente').count()
-                    taxa_presenca_turma = (presentes_turma / total_presencas_turma) * 100
+                if turma['total_registros'] > 0:
+                    taxa_presenca_turma = (turma['total_presentes'] / turma['total_registros']) * 100
                 else:
                     taxa_presenca_turma = 0
                 
                 turmas_com_estatisticas.append({
-                    'id': turma.id,
-                    'nome': turma.nome,
-                    'status': turma.status,
-                    'total_alunos': matriculas_turma.count(),
+                    'id': turma['id'],
+                    'nome': turma['nome'],
+                    'status': turma['status'],
+                    'total_alunos': turma['total_alunos'],
                     'taxa_presenca': round(taxa_presenca_turma, 2),
-                    'data_inicio': turma.data_inicio,
-                    'data_fim': turma.data_fim
+                    'data_inicio': turma['data_inicio'],
+                    'data_fim': turma['data_fim']
                 })
             
             # Ordenar turmas por taxa de presença (decrescente)
             turmas_com_estatisticas.sort(key=lambda x: x['taxa_presenca'], reverse=True)
             
-            # Presenças por dia da semana (últimos 30 dias)
-            data_30_dias_atras = timezone.now().date() - timedelta(days=30)
-            presencas_30_dias = Presenca.objects.filter(
-                matricula__turma__in=turmas,
-                data__gte=data_30_dias_atras
-            ).annotate(
-                dia_semana=ExtractWeekDay('data')
-            ).values('dia_semana').annotate(
-                total=Count('id'),
-                presentes=Count('id', filter=Q(status='Presente'))
-            ).order_by('dia_semana')
-            
             dias_semana_map = {
                 1: 'Domingo',
                 2: 'Segunda',
@@ -122,9 +163,9 @@ class DashboardProfessorView(APIView):
             }
             
             presencas_por_dia = []
-            for item in presencas_30_dias:
+            for item in resultados['presencas_30_dias']:
                 if item['total'] > 0:
-                    taxa = (item['presentes'] / item['total']) * 100
+                    taxa = (item['total_presentes'] / item['total']) * 100
                 else:
                     taxa = 0
                 
@@ -134,31 +175,17 @@ class DashboardProfessorView(APIView):
                     'taxa_presenca': round(taxa, 2)
                 })
             
-            # Alunos com maior número de faltas
-            alunos_com_faltas = []
-            matriculas_professor = Matricula.objects.filter(turma__in=turmas)
-            
-            for matricula in matriculas_professor[:10]:  # Top 10
-                presencas_aluno = Presenca.objects.filter(matricula=matricula)
-                total_presencas_aluno = presencas_aluno.count()
-                
-                if total_presencas_aluno > 0:
-                    ausentes = presencas_aluno.filter(status='Ausente').count()
-                    taxa_ausencia = (ausentes / total_presencas_aluno) * 100
-                else:
-                    taxa_ausencia = 0
-                
-                alunos_com_faltas.append({
-                    'aluno_id': matricula.aluno.id,
-                    'aluno_nome': matricula.aluno.nome,
-                    'turma': matricula.turma.nome,
-                    'total_aulas': total_presencas_aluno,
-                    'faltas': ausentes if 'ausentes' in locals() else 0,
-                    'taxa_ausencia': round(taxa_ausencia, 2)
-                })
-            
-            # Ordenar por taxa de ausência (decrescente)
-            alunos_com_faltas.sort(key=lambda x: x['taxa_ausencia'], reverse=True)
+            alunos_com_faltas = [
+                {
+                    'aluno_id': item['aluno_id'],
+                    'aluno_nome': item['aluno__nome'],
+                    'turma': item['turma__nome'],
+                    'total_aulas': item['total_aulas'],
+                    'faltas': item['ausencia_acumulada'],
+                    'taxa_ausencia': round(item['taxa_ausencia'], 2)
+                }
+                for item in resultados['alunos_com_faltas']
+            ]
             
             data = {
                 'professor': {
@@ -176,7 +203,7 @@ class DashboardProfessorView(APIView):
                 },
                 'turmas': turmas_com_estatisticas[:5],  # Top 5 turmas
                 'presencas_por_dia_semana': presencas_por_dia,
-                'alunos_com_mais_faltas': alunos_com_faltas[:5],  # Top 5 alunos
+                'alunos_com_mais_faltas': alunos_com_faltas,  # Top 5 alunos
                 'periodo_analise': {
                     'inicio': data_30_dias_atras.isoformat(),
                     'fim': timezone.now().date().isoformat()
@@ -195,17 +222,21 @@ class DashboardProfessorView(APIView):
 class DashboardAlunoView(APIView):
     """
     Dashboard específico para aluno.
-    Endpoint: GET /api/analytics/aluno/{id}/dashboard/
+    Endpoints: GET /api/analytics/aluno/dashboard/ (aluno autenticado)
+               GET /api/analytics/aluno/{id}/dashboard/
     """
     
     permission_classes = [IsAuthenticated]
     
+    @instrumentar('dashboard_aluno')
+    @usar_replica
     def get(self, request, aluno_id=None):
         try:
+            principal = obter_principal(request)
             if aluno_id:
                 aluno = Aluno.objects.get(id=aluno_id)
-            elif hasattr(request.user, 'aluno'):
-                aluno = request.user.aluno
+            elif principal.is_aluno:
+                aluno = principal.aluno
             else:
                 return Response(
                     {'error': 'Aluno não encontrado ou usuário não é aluno'},
@@ -213,38 +244,50 @@ class DashboardAlunoView(APIView):
                 )
             
             # Verificar permissão (admin ou aluno dono)
-            if not request.user.is_staff and not hasattr(request.user, 'aluno'):
+            if not principal.is_admin and not principal.is_aluno:
                 return Response(
                     {'error': 'Permissão negada'},
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            if hasattr(request.user, 'aluno') and request.user.aluno != aluno:
+            if principal.is_aluno and principal.aluno_id != aluno.id:
                 return Response(
                     {'error': 'Você só pode acessar seu próprio dashboard'},
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # Matrículas do aluno
-            matriculas = aluno.matriculas.all()
-            turmas_ids = matriculas.values_list('turma_id', flat=True)
+            data_6_meses_atras = timezone.now().date() - timedelta(days=180)
+            
+            resultados = executar_em_paralelo(
+                # Matrículas do aluno com turma e professor: os contadores da
+                # matrícula já trazem as presenças do aluno em cada turma
+                matriculas=lambda: list(aluno.matriculas.select_related('turma__professor')),
+                # Presenças por mês (últimos 6 meses)
+                presencas_6_meses=lambda: list(
+                    Presenca.objects.filter(
+                        matricula__aluno=aluno,
+                        data__gte=data_6_meses_atras
+                    ).annotate(
+                        mes=TruncMonth('data')
+                    ).values('mes').annotate(
+                        total=Count('id'),
+                        presentes=Count('id', filter=Q(status='Presente'))
+                    ).order_by('mes')
+                ),
+            )
+            matriculas = resultados['matriculas']
             
             # Estatísticas gerais
-            total_turmas = matriculas.count()
-            turmas_ativas = Turma.objects.filter(
-                id__in=turmas_ids,
-                status='Ativa'
-            ).count()
+            total_turmas = len(matriculas)
+            turmas_ativas = sum(1 for matricula in matriculas if matricula.turma.status == 'Ativa')
             
             # Calcular presenças do aluno
-            presencas_aluno = Presenca.objects.filter(matricula__aluno=aluno)
-            total_presencas = presencas_aluno.count()
+            total_presencas = sum(matricula.total_aulas for matricula in matriculas)
+            presentes = sum(matricula.presenca_acumulada for matricula in matriculas)
+            ausentes = sum(matricula.ausencia_acumulada for matricula in matriculas)
+            justificados = sum(matricula.justificado_acumulado for matricula in matriculas)
             
             if total_presencas > 0:
-                presentes = presencas_aluno.filter(status='Presente').count()
-                ausentes = presencas_aluno.filter(status='Ausente').count()
-                justificados = presencas_aluno.filter(status='Justificado').count()
-                
                 taxa_presenca = (presentes / total_presencas) * 100
                 taxa_ausencia = (ausentes / total_presencas) * 100
                 taxa_justificados = (justificados / total_presencas) * 100
@@ -253,33 +296,19 @@ class DashboardAlunoView(APIView):
                 taxa_ausencia = 0
                 taxa_justificados = 0
             
+            # Médias das turmas: cache compartilhado entre os alunos, com uma
+            # consulta agrupada para as turmas que não estão no cache
+            medias = medias_turmas(
+                [matricula.turma_id for matricula in matriculas],
+                self.calcular_medias_turmas
+            )
+            
             # Desempenho por turma
             desempenho_por_turma = []
             for matricula in matriculas:
                 turma = matricula.turma
-                presencas_turma = Presenca.objects.filter(matricula=matricula)
-                total_presencas_turma = presencas_turma.count()
-                
-                if total_presencas_turma > 0:
-                    presentes_turma = presencas_turma.filter(status='Presente').count()
-                    taxa_presenca_turma = (presentes_turma / total_presencas_turma) * 100
-                else:
-                    taxa_presenca_turma = 0
-                
-                # Comparar com média da turma
-                todas_matriculas_turma = turma.matriculas.all()
-                taxa_presenca_turma_geral = 0
-                if todas_matriculas_turma.count() > 0:
-                    total_presencas_geral = Presenca.objects.filter(
-                        matricula__turma=turma
-                    ).count()
-                    
-                    if total_presencas_geral > 0:
-                        presentes_geral = Presenca.objects.filter(
-                            matricula__turma=turma,
-                            status='Presente'
-                        ).count()
-                        taxa_presenca_turma_geral = (presentes_geral / total_presencas_geral) * 100
+                taxa_presenca_turma = matricula.taxa_presenca()
+                taxa_presenca_turma_geral = medias.get(turma.id, 0)
                 
                 desempenho_por_turma.append({
                     'turma_id': turma.id,
@@ -292,20 +321,8 @@ class DashboardAlunoView(APIView):
                     'presenca_acumulada': matricula.presenca_acumulada
                 })
             
-            # Presenças por mês (últimos 6 meses)
-            data_6_meses_atras = timezone.now().date() - timedelta(days=180)
-            presencas_6_meses = Presenca.objects.filter(
-                matricula__aluno=aluno,
-                data__gte=data_6_meses_atras
-            ).annotate(
-                mes=TruncMonth('data')
-            ).values('mes').annotate(
-                total=Count('id'),
-                presentes=Count('id', filter=Q(status='Presente'))
-            ).order_by('mes')
-            
             presencas_por_mes = []
-            for item in presencas_6_meses:
+            for item in resultados['presencas_6_meses']:
                 if item['total'] > 0:
                     taxa = (item['presentes'] / item['total']) * 100
                 else:
@@ -320,12 +337,14 @@ class DashboardAlunoView(APIView):
             
             # Próximas aulas (próximos 7 dias)
             hoje = timezone.now().date()
-            proxima_semana = hoje + timedelta(days=7)
             
-            turmas_ativas_aluno = Turma.objects.filter(
-                id__in=turmas_ids,
-                status='Ativa',
-                data_fim__gte=hoje
+            # Turmas já carregadas com o professor, na ordem padrão de Turma
+            turmas_ativas_aluno = sorted(
+                (
+                    matricula.turma for matricula in matriculas
+                    if matricula.turma.status == 'Ativa' and matricula.turma.data_fim >= hoje
+                ),
+                key=lambda turma: (-turma.data_inicio.toordinal(), turma.nome)
             )
             
             # Dias da semana com aula (simulação - na prática viria de um modelo de horário)
@@ -355,9 +374,9 @@ class DashboardAlunoView(APIView):
                     'total_turmas': total_turmas,
                     'turmas_ativas': turmas_ativas,
                     'total_aulas': total_presencas,
-                    'presencas': presentes if 'presentes' in locals() else 0,
-                    'ausencias': ausentes if 'ausentes' in locals() else 0,
-                    'justificados': justificados if 'justificados' in locals() else 0,
+                    'presencas': presentes,
+                    'ausencias': ausentes,
+                    'justificados': justificados,
                     'taxa_presenca': round(taxa_presenca, 2),
                     'taxa_ausencia': round(taxa_ausencia, 2),
                     'taxa_justificados': round(taxa_justificados, 2)
@@ -376,6 +395,22 @@ class DashboardAlunoView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
     
+    @staticmethod
+    def calcular_medias_turmas(turma_ids):
+        """
+        Taxa de presença de cada turma, em uma consulta agrupada sobre o resumo diário.
+        Lida no principal: o resultado fica em cache e não pode herdar o atraso da réplica.
+        """
+        medias = dict.fromkeys(turma_ids, 0)
+        with ler_do_primario():
+            somas = list(ResumoDiarioPresenca.objects.filter(turma_id__in=turma_ids).order_by().values(
+                'turma_id'
+            ).annotate(**ResumoDiarioPresenca.somas()))
+        for item in somas:
+            if item['total'] > 0:
+                medias[item['turma_id']] = (item['total_presentes'] / item['total']) * 100
+        return medias
+    
     def gerar_recomendacoes(self, taxa_presenca, desempenho_por_turma):
         """Gera recomendações personalizadas para o aluno."""
         recomendacoes = []
@@ -413,46 +448,77 @@ class AnalyticsGeralView(APIView):
     
     permission_classes = [IsAdminUser]
     
+    @instrumentar('analytics_geral')
+    @usar_replica
     def get(self, request):
         # Período para análise (último mês)
         data_30_dias_atras = timezone.now().date() - timedelta(days=30)
         
-        # Estatísticas básicas
-        total_professores = Professor.objects.filter(ativo=True).count()
-        total_alunos = Aluno.objects.count()
-        total_turmas = Turma.objects.filter(status='Ativa').count()
-        total_matriculas = Matricula.objects.count()
-        
-        # Taxa de presença geral
-        total_presencas = Presenca.objects.count()
-        if total_presencas > 0:
-            presentes = Presenca.objects.filter(status='Presente').count()
-            taxa_presenca_geral = (presentes / total_presencas) * 100
-        else:
-            taxa_presenca_geral = 0
-        
-        # Evolução de matrículas (últimos 6 meses)
         data_6_meses_atras = timezone.now().date() - timedelta(days=180)
-        matriculas_por_mes = Matricula.objects.filter(
-            data_matricula__gte=data_6_meses_atras
+        
+        # Turmas com maior evasão (taxa de presença < 70%), com o número de alunos na mesma consulta
+        alunos_da_turma = Matricula.objects.filter(
+            turma_id=OuterRef('turma_id')
+        ).order_by().values('turma_id').annotate(total=Count('id')).values('total')
+        turmas_baixa_presenca = ResumoDiarioPresenca.objects.filter(
+            turma__status='Ativa'
+        ).values(
+            'turma_id', 'turma__nome', 'turma__professor__nome'
         ).annotate(
-            mes=TruncMonth('data_matricula')
-        ).values('mes').annotate(
-            total=Count('id')
-        ).order_by('mes')
+            **ResumoDiarioPresenca.somas()
+        ).filter(total__gt=0).annotate(
+            taxa=ExpressionWrapper(F('total_presentes') * 100.0 / F('total'), output_field=FloatField()),
+            total_alunos=Coalesce(Subquery(alunos_da_turma), Value(0))
+        ).filter(taxa__lt=70).order_by('taxa')
         
-        # Presenças por departamento
-        presencas_por_departamento = Professor.objects.values('departamento').annotate(
-            total_turmas=Count('turmas'),
-            total_alunos=Count('turmas__matriculas'),
-            total_presencas=Count('turmas__matriculas__presencas'),
-            presentes=Count('turmas__matriculas__presencas', filter=Q(turmas__matriculas__presencas__status='Presente'))
+        # Alunos com maior taxa de faltas (mais de 30%), entre todos os alunos
+        ranking_faltas = ranking_alunos().filter(taxa_ausencia__gt=30)
+        
+        # Consultas independentes, executadas em paralelo
+        resultados = executar_em_paralelo(
+            total_professores=Professor.objects.filter(ativo=True).count,
+            total_alunos=Aluno.objects.count,
+            total_turmas=Turma.objects.filter(status='Ativa').count,
+            total_matriculas=Matricula.objects.count,
+            # Taxa de presença geral
+            totais=lambda: ResumoDiarioPresenca.objects.aggregate(**ResumoDiarioPresenca.somas()),
+            # Evolução de matrículas (últimos 6 meses)
+            matriculas_por_mes=lambda: list(Matricula.objects.filter(
+                data_matricula__gte=data_6_meses_atras
+            ).annotate(
+                mes=TruncMonth('data_matricula')
+            ).values('mes').annotate(
+                total=Count('id')
+            ).order_by('mes')),
+            # Presenças por departamento
+            presencas_por_departamento=lambda: list(Professor.objects.values('departamento').annotate(
+                total_turmas=Count('turmas', distinct=True),
+                total_alunos=Count('turmas__matriculas', distinct=True)
+            ).order_by('departamento')),
+            totais_por_departamento=lambda: {
+                item['turma__professor__departamento']: item
+                for item in ResumoDiarioPresenca.objects.order_by().values(
+                    'turma__professor__departamento'
+                ).annotate(**ResumoDiarioPresenca.somas())
+            },
+            turmas_baixa_presenca=lambda: list(turmas_baixa_presenca),
+            total_alunos_com_faltas=ranking_faltas.count,
+            alunos_com_faltas=lambda: list(ranking_faltas[:10]),  # Top 10
         )
         
+        totais = resultados['totais']
+        total_presencas = totais['total']
+        if total_presencas > 0:
+            taxa_presenca_geral = (totais['total_presentes'] / total_presencas) * 100
+        else:
+            taxa_presenca_geral = 0
+        
+        totais_por_departamento = resultados['totais_por_departamento']
         departamentos_com_taxa = []
-        for depto in presencas_por_departamento:
-            if depto['total_presencas'] > 0:
-                taxa = (depto['presentes'] / depto['total_presencas']) * 100
+        for depto in resultados['presencas_por_departamento']:
+            totais_depto = totais_por_departamento.get(depto['departamento'])
+            if totais_depto and totais_depto['total'] > 0:
+                taxa = (totais_depto['total_presentes'] / totais_depto['total']) * 100
             else:
                 taxa = 0
             
@@ -463,58 +529,36 @@ class AnalyticsGeralView(APIView):
                 'taxa_presenca': round(taxa, 2)
             })
         
-        # Turmas com maior evasão (taxa de presença < 70%)
-        turmas_com_baixa_presenca = []
-        for turma in Turma.objects.filter(status='Ativa'):
-            presencas_turma = Presenca.objects.filter(matricula__turma=turma)
-            total_presencas_turma = presencas_turma.count()
-            
-            if total_presencas_turma > 0:
-                presentes_turma = presencas_turma.filter(status='Presente').count()
-                taxa_presenca_turma = (presentes_turma / total_presencas_turma) * 100
-                
-                if taxa_presenca_turma < 70:
-                    turmas_com_baixa_presenca.append({
-                        'turma_id': turma.id,
-                        'turma_nome': turma.nome,
-                        'professor': turma.professor.nome,
-                        'total_alunos': turma.matriculas.count(),
-                        'taxa_presenca': round(taxa_presenca_turma, 2)
-                    })
-        
-        # Ordenar por taxa de presença (crescente)
-        turmas_com_baixa_presenca.sort(key=lambda x: x['taxa_presenca'])
-        
-        # Alunos com maior número de faltas
-        alunos_com_faltas = []
-        for aluno in Aluno.objects.all()[:20]:  # Analisar os 20 primeiros
-            presencas_aluno = Presenca.objects.filter(matricula__aluno=aluno)
-            total_presencas_aluno = presencas_aluno.count()
-            
-            if total_presencas_aluno > 0:
-                ausentes = presencas_aluno.filter(status='Ausente').count()
-                taxa_ausencia = (ausentes / total_presencas_aluno) * 100
-                
-                if taxa_ausencia > 30:  # Mais de 30% de faltas
-                    alunos_com_faltas.append({
-                        'aluno_id': aluno.id,
-                        'aluno_nome': aluno.nome,
-                        'matricula': aluno.matricula,
-                        'curso': aluno.curso,
-                        'total_aulas': total_presencas_aluno,
-                        'faltas': ausentes,
-                        'taxa_ausencia': round(taxa_ausencia, 2)
-                    })
+        turmas_com_baixa_presenca = [
+            {
+                'turma_id': item['turma_id'],
+                'turma_nome': item['turma__nome'],
+                'professor': item['turma__professor__nome'],
+                'total_alunos': item['total_alunos'],
+                'taxa_presenca': round(item['taxa'], 2)
+            }
+            for item in resultados['turmas_baixa_presenca']
+        ]
         
-        # Ordenar por taxa de ausência (decrescente)
-        alunos_com_faltas.sort(key=lambda x: x['taxa_ausencia'], reverse=True)
+        alunos_com_faltas = [
+            {
+                'aluno_id': item['aluno_id'],
+                'aluno_nome': item['aluno__nome'],
+                'matricula': item['aluno__matricula'],
+                'curso': item['aluno__curso'],
+                'total_aulas': item['aulas'],
+                'faltas': item['faltas'],
+                'taxa_ausencia': round(item['taxa_ausencia'], 2)
+            }
+            for item in resultados['alunos_com_faltas']
+        ]
         
         data = {
             'estatisticas_gerais': {
-                'total_professores': total_professores,
-                'total_alunos': total_alunos,
-                'total_turmas_ativas': total_turmas,
-                'total_matriculas': total_matriculas,
+                'total_professores': resultados['total_professores'],
+                'total_alunos': resultados['total_alunos'],
+                'total_turmas_ativas': resultados['total_turmas'],
+                'total_matriculas': resultados['total_matriculas'],
                 'taxa_presenca_geral': round(taxa_presenca_geral, 2),
                 'periodo_analise': {
                     'inicio': data_30_dias_atras.isoformat(),
@@ -526,23 +570,23 @@ class AnalyticsGeralView(APIView):
                     'mes': item['mes'].strftime('%Y-%m'),
                     'total': item['total']
                 }
-                for item in matriculas_por_mes
+                for item in resultados['matriculas_por_mes']
             ],
             'desempenho_por_departamento': departamentos_com_taxa,
             'alertas': {
                 'turmas_baixa_presenca': turmas_com_baixa_presenca[:5],  # Top 5
-                'alunos_muitas_faltas': alunos_com_faltas[:10]  # Top 10
+                'alunos_muitas_faltas': alunos_com_faltas
             },
             'recomendacoes_administrativas': self.gerar_recomendacoes_administrativas(
                 taxa_presenca_geral, 
                 turmas_com_baixa_presenca,
-                alunos_com_faltas
+                resultados['total_alunos_com_faltas']
             )
         }
         
         return Response(data)
     
-    def gerar_recomendacoes_administrativas(self, taxa_presenca_geral, turmas_com_baixa_presenca, alunos_com_faltas):
+    def gerar_recomendacoes_administrativas(self, taxa_presenca_geral, turmas_com_baixa_presenca, total_alunos_com_faltas):
         """Gera recomendações para a administração."""
         recomendacoes = []
         
@@ -562,11 +606,11 @@ class AnalyticsGeralView(APIView):
                 'acao': 'Reunir-se com os professores dessas turmas para identificar problemas.'
             })
         
-        if alunos_com_faltas:
+        if total_alunos_com_faltas:
             recomendacoes.append({
                 'prioridade': 'media',
                 'titulo': 'Alunos com muitas faltas',
-                'descricao': f'Existem {len(alunos_com_faltas)} alunos com mais de 30% de faltas.',
+                'descricao': f'Existem {total_alunos_com_faltas} alunos com mais de 30% de faltas.',
                 'acao': 'Entrar em contato com esses alunos e seus coordenadores de curso.'
             })
         
@@ -581,107 +625,212 @@ class AnalyticsGeralView(APIView):
         return recomendacoes
 
 
+class RankingFaltasView(APIView):
+    """
+    Ranking de faltas de todos os alunos, paginado.
+    Endpoint: GET /api/analytics/ranking-faltas/
+    
+    escopo=aluno (padrão): taxa de ausência somada em todas as turmas do aluno.
+    escopo=turma: posição do aluno dentro de cada turma; aceita turma={id} e
+    por_turma=N (só os N primeiros de cada turma).
+    taxa_minima (%) e aulas_minimas filtram o resultado sem alterar as posições.
+    """
+    
+    permission_classes = [IsAdminUser]
+    
+    @instrumentar('ranking_faltas')
+    @usar_replica
+    def get(self, request):
+        params = request.query_params
+        escopo = params.get('escopo', 'aluno')
+        if escopo not in ('aluno', 'turma'):
+            return Response(
+                {'error': "escopo deve ser 'aluno' ou 'turma'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            taxa_minima = float(params.get('taxa_minima', 0))
+            aulas_minimas = int(params.get('aulas_minimas', 1))
+            por_turma = int(params['por_turma']) if params.get('por_turma') else None
+            turma_id = int(params['turma']) if params.get('turma') else None
+        except ValueError:
+            return Response(
+                {'error': 'taxa_minima, aulas_minimas, por_turma e turma devem ser números'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if escopo == 'turma':
+            ranking = ranking_por_turma(taxa_minima, aulas_minimas, por_turma, turma_id)
+            formatar = self.formatar_matricula
+        else:
+            ranking = ranking_alunos(taxa_minima, aulas_minimas)
+            formatar = self.formatar_aluno
+        
+        paginator = RankingPaginacao()
+        pagina = paginator.paginate_queryset(ranking, request, view=self)
+        return paginator.get_paginated_response([formatar(item) for item in pagina])
+    
+    @staticmethod
+    def formatar_aluno(item):
+        return {
+            'posicao': item['posicao'],
+            'aluno_id': item['aluno_id'],
+            'aluno_nome': item['aluno__nome'],
+            'matricula': item['aluno__matricula'],
+            'curso': item['aluno__curso'],
+            'total_aulas': item['aulas'],
+            'faltas': item['faltas'],
+            'taxa_ausencia': round(item['taxa_ausencia'], 2)
+        }
+    
+    @staticmethod
+    def formatar_matricula(item):
+        return {
+            'posicao': item['posicao'],
+            'turma_id': item['turma_id'],
+            'turma_nome': item['turma__nome'],
+            'aluno_id': item['aluno_id'],
+            'aluno_nome': item['aluno__nome'],
+            'matricula': item['aluno__matricula'],
+            'total_aulas': item['aulas'],
+            'faltas': item['faltas'],
+            'taxa_ausencia': round(item['taxa_ausencia'], 2)
+        }
+
+
 class RelatorioPresencaView(APIView):
     """
     Gera relatório detalhado de presenças.
     Endpoint: POST /api/analytics/relatorio-presenca/
+    
+    formato 'json' (padrão): totais e agregados por turma.
+    formato 'csv' ou 'ndjson': presenças linha a linha, enviadas em streaming.
+    assincrono=true: enfileira o relatório (202) para o comando run_report_worker;
+    o status fica em GET /api/analytics/relatorios/{id}/.
     """
     
     permission_classes = [IsAdminUser]
     
+    @instrumentar('relatorio_presenca')
     def post(self, request):
-        # Parâmetros do relatório
-        data_inicio = request.data.get('data_inicio')
-        data_fim = request.data.get('data_fim')
-        turma_id = request.data.get('turma_id')
-        formato = request.data.get('formato', 'json')  # json, csv
-        
         try:
-            # Converter datas
-            if data_inicio:
-                data_inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
-            else:
-                data_inicio = timezone.now().date() - timedelta(days=30)
+            # Parâmetros do relatório
+            parametros = interpretar_parametros(request.data)
             
-            if data_fim:
-                data_fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
-            else:
-                data_fim = timezone.now().date()
+            if str(request.data.get('assincrono', '')).lower() in ('1', 'true'):
+                return self.enfileirar(request, parametros)
             
-            # Filtrar presenças
-            filtros = Q(data__gte=data_inicio, data__lte=data_fim)
-            
-            if turma_id:
-                filtros &= Q(matricula__turma_id=turma_id)
-                turma = Turma.objects.get(id=turma_id)
-                titulo_relatorio = f"Relatório de Presenças - {turma.nome}"
-            else:
-                titulo_relatorio = "Relatório Geral de Presenças"
-            
-            presencas = Presenca.objects.filter(filtros)
-            
-            # Agrupar por turma
-            presencas_por_turma = presencas.values(
-                'matricula__turma__id',
-                'matricula__turma__nome',
-                'matricula__turma__professor__nome'
-            ).annotate(
-                total=Count('id'),
-                presentes=Count('id', filter=Q(status='Presente')),
-                ausentes=Count('id', filter=Q(status='Ausente')),
-                justificados=Count('id', filter=Q(status='Justificado'))
-            ).order_by('matricula__turma__nome')
-            
-            # Calcular totais
-            totais = {
-                'total': presencas.count(),
-                'presentes': presencas.filter(status='Presente').count(),
-                'ausentes': presencas.filter(status='Ausente').count(),
-                'justificados': presencas.filter(status='Justificado').count()
-            }
-            
-            if totais['total'] > 0:
-                totais['taxa_presenca'] = (totais['presentes'] / totais['total']) * 100
-                totais['taxa_ausencia'] = (totais['ausentes'] / totais['total']) * 100
-                totais['taxa_justificados'] = (totais['justificados'] / totais['total']) * 100
-            else:
-                totais['taxa_presenca'] = 0
-                totais['taxa_ausencia'] = 0
-                totais['taxa_justificados'] = 0
-            
-            # Formatar dados
-            relatorio = {
-                'titulo': titulo_relatorio,
-                'periodo': {
-                    'inicio': data_inicio.isoformat(),
-                    'fim': data_fim.isoformat()
-                },
-                'parametros': {
-                    'turma_id': turma_id,
-                    'formato': formato
-                },
-                'totais': totais,
-                'detalhes_por_turma': [
-                    {
-                        'turma_id': item['matricula__turma__id'],
-                        'turma_nome': item['matricula__turma__nome'],
-                        'professor': item['matricula__turma__professor__nome'],
-                        'total': item['total'],
-                        'presentes': item['presentes'],
-                        'ausentes': item['ausentes'],
-                        'justificados': item['justificados'],
-                        'taxa_presenca': round((item['presentes'] / item['total'] * 100), 2) if item['total'] > 0 else 0
-                    }
-                    for item in presencas_por_turma
-                ],
-                'gerado_em': timezone.now().isoformat(),
-                'gerado_por': request.user.username if request.user else 'Sistema'
-            }
-            
-            return Response(relatorio)
+            return self.gerar(request, parametros)
             
         except Exception as e:
             return Response(
                 {'error': f'Erro ao gerar relatório: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
-            )
\ No newline at end of file
+            )
+    
+    @usar_replica
+    def gerar(self, request, parametros):
+        """Relatório síncrono: só leituras, feitas na réplica."""
+        if parametros['formato'] in FORMATOS_EXPORTACAO:
+            return self.exportar_linhas(parametros)
+        
+        relatorio = montar_relatorio(
+            parametros,
+            gerado_por=request.user.username if request.user else 'Sistema'
+        )
+        return Response(relatorio)
+    
+    def exportar_linhas(self, parametros):
+        """Presenças do período, uma por linha, em memória constante."""
+        linhas = linhas_presenca(parametros['data_inicio'], parametros['data_fim'], parametros['turma_id'])
+        return StreamingHttpResponse(
+            exportar(parametros['formato'], linhas),
+            content_type=FORMATOS_EXPORTACAO[parametros['formato']],
+            headers={'Content-Disposition': f'attachment; filename="{nome_arquivo(parametros)}"'}
+        )
+    
+    def enfileirar(self, request, parametros):
+        """Cria a tarefa na fila e responde 202 com o endereço de acompanhamento."""
+        tarefa = TarefaRelatorio.objects.create(
+            parametros={
+                'data_inicio': parametros['data_inicio'].isoformat(),
+                'data_fim': parametros['data_fim'].isoformat(),
+                'turma_id': parametros['turma_id'],
+                'formato': parametros['formato'],
+            },
+            solicitante=request.user
+        )
+        status_url = request.build_absolute_uri(
+            reverse('relatorio-tarefa', kwargs={'tarefa_id': tarefa.pk})
+        )
+        return Response(
+            {'id': tarefa.pk, 'status': tarefa.status, 'status_url': status_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': status_url}
+        )
+
+
+class RelatorioTarefaView(APIView):
+    """
+    Status de um relatório em segundo plano, com o link de download quando concluído.
+    Endpoint: GET /api/analytics/relatorios/{id}/
+    """
+    
+    permission_classes = [IsAdminUser]
+    
+    @instrumentar('relatorio_tarefa')
+    def get(self, request, tarefa_id):
+        tarefa = get_object_or_404(TarefaRelatorio, pk=tarefa_id)
+        return Response(TarefaRelatorioSerializer(tarefa, context={'request': request}).data)
+
+
+class RelatorioTarefaDownloadView(APIView):
+    """
+    Download do arquivo de um relatório concluído.
+    Endpoint: GET /api/analytics/relatorios/{id}/download/
+    """
+    
+    permission_classes = [IsAdminUser]
+    
+    @instrumentar('relatorio_download')
+    def get(self, request, tarefa_id):
+        tarefa = get_object_or_404(TarefaRelatorio, pk=tarefa_id)
+        if tarefa.status != 'Concluída' or not tarefa.arquivo:
+            return Response(
+                {'error': 'Relatório ainda não disponível', 'status': tarefa.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        formato = tarefa.parametros.get('formato')
+        return FileResponse(
+            tarefa.arquivo.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(tarefa.arquivo.name),
+            content_type=FORMATOS_EXPORTACAO.get(formato, 'application/json')
+        )
+
+
+class ConsultasLentasView(APIView):
+    """
+    Consultas lentas capturadas por este processo (api/consultas_lentas.py),
+    agrupadas por impressão digital e ordenadas pelo tempo total.
+    Endpoint: GET /api/diagnostico/consultas-lentas/?top=20
+    DELETE limpa o buffer.
+    """
+    
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        dados = resumo_consultas_lentas()
+        top = request.query_params.get('top')
+        if top:
+            try:
+                dados['impressoes'] = dados['impressoes'][:int(top)]
+            except ValueError:
+                return Response({'error': 'top deve ser um número inteiro'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(dados)
+    
+    def delete(self, request):
+        limpar_consultas_lentas()
+        return Response(status=status.HTTP_204_NO_CONTENT)
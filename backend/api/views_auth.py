@@ -5,6 +5,7 @@ from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from .autenticacao import invalidar_tokens
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
 
 class RegisterView(generics.CreateAPIView):
@@ -70,7 +71,9 @@ class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
-        # Deletar token
+        # Deletar token (e tirá-lo do cache de autenticação)
+        if isinstance(request.auth, Token):
+            invalidar_tokens([request.auth.key])
         Token.objects.filter(user=request.user).delete()
         
         # Fazer logout da sessão
@@ -84,7 +87,7 @@ class ProfileView(APIView):
     
     def get(self, request):
         user = request.user
-        serializer = UserSerializer(user)
+        serializer = UserSerializer(user, context={'request': request})
         return Response(serializer.data)
     
     def put(self, request):
@@ -10,4 +10,7 @@ echo "Coletando arquivos estáticos..."
 python manage.py collectstatic --noinput
 
 echo "Aplicando migrações..."
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+echo "Criando tabelas de cache..."
+python manage.py createcachetable
\ No newline at end of file
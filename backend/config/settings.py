@@ -52,6 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.perfil.PerfilRequisicaoMiddleware',
+    'api.metricas.MetricasMiddleware',
+    'api.consultas_lentas.ConsultasLentasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.replica.FixacaoPrimarioMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -85,13 +89,37 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
 # USAR SQLITE TEMPORARIAMENTE
+# Backend SQLite ajustado (config/sqlite): WAL, synchronous=NORMAL e BEGIN IMMEDIATE,
+# para vários workers gravando chamadas ao mesmo tempo
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'config.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+            'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -20000)),
+            'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 134217728)),
+        },
     }
 }
 
+# Réplica de leitura local: um segundo arquivo SQLite, atualizado por
+# "python manage.py sincronizar_replica"
+if os.getenv('SQLITE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / os.getenv('SQLITE_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Análises, rotas públicas e relatórios leem da réplica (api/replica.py), se configurada;
+# depois de uma escrita o usuário lê do principal por DATABASE_REPLICA_FIXACAO_SEGUNDOS
+DATABASE_ROUTERS = ['api.replica.RoteadorReplica']
+DATABASE_REPLICA_ALIAS = 'replica'
+DATABASE_REPLICA_FIXACAO_SEGUNDOS = int(os.getenv('DATABASE_REPLICA_FIXACAO_SEGUNDOS', 5))
+# Alias de CACHES com as fixações; com vários processos precisa ser compartilhado
+DATABASE_REPLICA_FIXACAO_CACHE = os.getenv('DATABASE_REPLICA_FIXACAO_CACHE', 'default')
+
 # COMENTE o PostgreSQL por enquanto:
 '''
 DATABASES = {
@@ -143,6 +171,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Arquivos gerados (relatórios em segundo plano)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
 
@@ -152,11 +184,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.autenticacao.TokenCacheAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.IsAuthenticatedOrReadOnly',
+        'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -167,6 +199,48 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Cache (em memória do processo)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sistema-chamada',
+    }
+}
+
+# Idade máxima (segundos) das respostas em cache das rotas públicas; 0 desativa
+API_CACHE_PUBLICO_SEGUNDOS = int(os.getenv('API_CACHE_PUBLICO_SEGUNDOS', 60))
+
+# Cache da autenticação por token: segundos (0 desativa), máximo de tokens no
+# cache local e, opcionalmente, um alias de CACHES compartilhado entre processos
+API_TOKEN_CACHE_SEGUNDOS = int(os.getenv('API_TOKEN_CACHE_SEGUNDOS', 60))
+API_TOKEN_CACHE_MAXIMO = int(os.getenv('API_TOKEN_CACHE_MAXIMO', 1000))
+API_TOKEN_CACHE_ALIAS = os.getenv('API_TOKEN_CACHE_ALIAS') or None
+
+# Threads para as consultas independentes dos dashboards (api/paralelo.py); 1 desativa.
+# Cada thread usa uma conexão própria com o banco. Com o SQLite local as consultas
+# não esperam rede e o paralelismo não compensa (ver "manage.py bench_dashboards")
+API_CONSULTAS_PARALELAS = int(os.getenv('API_CONSULTAS_PARALELAS', 1))
+
+# Listagens de presenças e matrículas serializadas direto de values() (mesmo JSON,
+# sem um serializer do DRF por linha); False volta ao serializer do DRF
+API_LISTA_RAPIDA = os.getenv('API_LISTA_RAPIDA', 'True') == 'True'
+
+# Perfil das requisições (api/perfil.py): cabeçalho Server-Timing e uma linha de log
+# por requisição no logger 'api.perfil'. API_PERFIL_MEMORIA mede também o pico de
+# memória (tracemalloc, deixa o processo mais lento)
+API_PERFIL_REQUISICOES = os.getenv('API_PERFIL_REQUISICOES', 'False') == 'True'
+API_PERFIL_MEMORIA = os.getenv('API_PERFIL_MEMORIA', 'False') == 'True'
+
+# Métricas no formato do Prometheus em /metrics (api/metricas.py, requer
+# prometheus_client). Com API_METRICAS_TOKEN o endpoint exige "Authorization: Bearer <token>"
+API_METRICAS = os.getenv('API_METRICAS', 'False') == 'True'
+API_METRICAS_TOKEN = os.getenv('API_METRICAS_TOKEN', '')
+
+# Consultas lentas (api/consultas_lentas.py): consultas acima de API_CONSULTAS_LENTAS_MS
+# (0 desativa) vão para um buffer em memória com as API_CONSULTAS_LENTAS_MAXIMO mais recentes
+API_CONSULTAS_LENTAS_MS = float(os.getenv('API_CONSULTAS_LENTAS_MS', 0))
+API_CONSULTAS_LENTAS_MAXIMO = int(os.getenv('API_CONSULTAS_LENTAS_MAXIMO', 500))
+
 # drf-spectacular settings
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Sistema de Chamada de Alunos API',
@@ -185,18 +259,6 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_PATH_PREFIX': '/api/',
 }
 
-# Configurações de autenticação
-REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
-    ],
-    'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.IsAuthenticated',
-    ],
-}
-
 # Se quiser usar JWT em vez de Token (opcional)
 # INSTALLED_APPS += ['rest_framework_simplejwt']
 # REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] += ['rest_framework_simplejwt.authentication.JWTAuthentication']
@@ -207,11 +269,3 @@ if DEBUG:
     INSTALLED_APPS += ['corsheaders']
     MIDDLEWARE.insert(0, 'corsheaders.middleware.CorsMiddleware')
     CORS_ALLOW_ALL_ORIGINS = True
-    
-    # Database development
-    DATABASES = {
-        'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
-        }
-    }
\ No newline at end of file
@@ -23,6 +23,29 @@ DATABASES = {
     )
 }
 
+# Réplica de leitura (opcional) para análises, rotas públicas e relatórios
+if os.environ.get('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.config(
+        env='DATABASE_REPLICA_URL',
+        conn_max_age=600,
+        conn_health_checks=True,
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+    # A fixação no principal depois de uma escrita precisa valer em todos os
+    # workers: fica em uma tabela de cache no banco principal ("manage.py createcachetable")
+    CACHES['fixacao'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache_fixacao',
+    }
+    DATABASE_REPLICA_FIXACAO_CACHE = os.environ.get('DATABASE_REPLICA_FIXACAO_CACHE', 'fixacao')
+
+# Consultas independentes dos dashboards em paralelo (banco em rede)
+API_CONSULTAS_PARALELAS = int(os.environ.get('API_CONSULTAS_PARALELAS', 4))
+
+# Consultas acima de 200 ms ficam no buffer de consultas lentas (0 desativa)
+API_CONSULTAS_LENTAS_MS = float(os.environ.get('API_CONSULTAS_LENTAS_MS', 200))
+
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -0,0 +1,58 @@
+"""
+Backend SQLite ajustado para implantações em um único servidor.
+
+Igual ao backend padrão do Django, com PRAGMAs aplicados a cada conexão:
+
+- journal_mode=WAL: leitores não bloqueiam o escritor (nem o contrário);
+- synchronous=NORMAL: seguro com WAL, sem fsync a cada commit;
+- busy_timeout, cache_size e mmap_size configuráveis;
+
+e transações (atomic) abertas com BEGIN IMMEDIATE: a trava de escrita é
+obtida no início, e uma transação que lê e depois escreve espera pela vez
+(busy_timeout) em vez de falhar com "database is locked" no meio.
+
+Uso em settings.DATABASES: 'ENGINE': 'config.sqlite', com os PRAGMAs em
+OPTIONS (ex.: {'mmap_size': 268435456}). 'transaction_mode' continua
+aceito e sobrescreve o IMMEDIATE.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+# PRAGMAs aplicados por padrão; cada um pode ser trocado em OPTIONS
+PRAGMAS_PADRAO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,       # ms
+    'cache_size': -20000,       # negativo: KiB (20 MB por conexão)
+    'mmap_size': 134217728,     # bytes (128 MB)
+}
+
+
+def aplicar_pragmas(conexao, pragmas):
+    """Executa os PRAGMAs em uma conexão sqlite3 (valores None são ignorados)."""
+    for nome, valor in pragmas.items():
+        if valor is not None:
+            conexao.execute(f'PRAGMA {nome} = {valor}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        opcoes = self.settings_dict['OPTIONS']
+        self.pragmas = {
+            nome: opcoes.get(nome, padrao)
+            for nome, padrao in PRAGMAS_PADRAO.items()
+        }
+        kwargs = super().get_connection_params()
+        for nome in PRAGMAS_PADRAO:
+            kwargs.pop(nome, None)
+
+        if 'transaction_mode' not in opcoes:
+            self.transaction_mode = 'IMMEDIATE'
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conexao = super().get_new_connection(conn_params)
+        aplicar_pragmas(conexao, self.pragmas)
+        return conexao
@@ -18,12 +18,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from api.metricas import exportar_metricas
 from api.views_home import HomeView  # Importar a nova view
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),  # Página inicial
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),  # Incluir URLs da API
+    path('metrics', exportar_metricas, name='metricas'),  # Prometheus
 ]
 
 # Servir arquivos estáticos em desenvolvimento
@@ -0,0 +1,31 @@
+"""
+Configuração do gunicorn (carregada automaticamente quando ele é iniciado em backend/).
+
+As métricas do Prometheus (api/metricas.py) ficam em memória em cada worker;
+para que GET /metrics some as de todos, cada worker grava as suas em arquivos
+em PROMETHEUS_MULTIPROC_DIR. O diretório é limpo ao iniciar o servidor e os
+arquivos de um worker encerrado são marcados como mortos.
+"""
+
+import os
+import shutil
+import tempfile
+
+
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'chamada-alunos-metricas')
+)
+
+
+def on_starting(server):
+    diretorio = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.makedirs(diretorio, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -8,7 +8,10 @@ from django.utils import timezone
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
-from api.models import Professor, Aluno, Turma, Matricula, Presenca
+from api.models import Professor, Aluno, Turma, Matricula, Presenca, ResumoDiarioPresenca
+
+# Semente fixa: execuções repetidas geram os mesmos dados
+rng = random.Random(int(os.environ.get('SEED', 42)))
 
 def criar_professores():
     professores = [
@@ -17,8 +20,7 @@ def criar_professores():
         {'nome': 'Roberto Alves', 'email': 'roberto.alves@universidade.edu', 'departamento': 'Estatística'},
     ]
     
-    for prof in professores:
-        Professor.objects.create(**prof)
+    Professor.objects.bulk_create([Professor(**prof) for prof in professores])
     
     print(f"{len(professores)} professores criados.")
 
@@ -31,13 +33,12 @@ def criar_alunos():
             'nome': f'Aluno {i} Teste',
             'matricula': f'2024000{i:02d}',
             'email': f'aluno{i}@universidade.edu',
-            'curso': random.choice(cursos),
+            'curso': rng.choice(cursos),
             'data_nascimento': date(2000 + i % 5, (i % 12) + 1, (i % 28) + 1),
-            'genero': random.choice(['M', 'F']),
+            'genero': rng.choice(['M', 'F']),
         })
     
-    for aluno in alunos_data:
-        Aluno.objects.create(**aluno)
+    Aluno.objects.bulk_create([Aluno(**aluno) for aluno in alunos_data])
     
     print(f"{len(alunos_data)} alunos criados.")
 
@@ -51,8 +52,8 @@ def criar_turmas():
     ]
     
     hoje = date.today()
-    for i, turma_info in enumerate(turmas_data):
-        Turma.objects.create(
+    Turma.objects.bulk_create([
+        Turma(
             nome=turma_info['nome'],
             descricao=turma_info['descricao'],
             professor=professores[i % len(professores)],
@@ -60,6 +61,8 @@ def criar_turmas():
             data_fim=hoje + timedelta(days=60),
             status='Ativa'
         )
+        for i, turma_info in enumerate(turmas_data)
+    ])
     
     print(f"{len(turmas_data)} turmas criadas.")
 
@@ -67,43 +70,52 @@ def criar_matriculas():
     turmas = Turma.objects.all()
     alunos = Aluno.objects.all()
     
+    alunos = list(alunos)
+    matriculas = []
     for turma in turmas:
         # Matricular 5-10 alunos em cada turma
-        alunos_turma = random.sample(list(alunos), random.randint(5, 10))
-        for aluno in alunos_turma:
-            Matricula.objects.get_or_create(turma=turma, aluno=aluno)
+        alunos_turma = rng.sample(alunos, rng.randint(5, 10))
+        matriculas.extend(Matricula(turma=turma, aluno=aluno) for aluno in alunos_turma)
+    Matricula.objects.bulk_create(matriculas, ignore_conflicts=True)
     
     print("Matrículas criadas.")
 
 def definir_representantes():
     turmas = Turma.objects.all()
+    # Um aluno só pode representar uma turma
+    ja_representam = set(Turma.objects.filter(representante__isnull=False).values_list('representante_id', flat=True))
     for turma in turmas:
         if not turma.representante:
             # Escolher um aluno matriculado como representante
-            matriculas = turma.matriculas.all()
-            if matriculas.exists():
-                turma.representante = matriculas.first().aluno
+            matricula = turma.matriculas.exclude(aluno_id__in=ja_representam).first()
+            if matricula:
+                turma.representante_id = matricula.aluno_id
+                ja_representam.add(matricula.aluno_id)
                 turma.save()
     
     print("Representantes definidos.")
 
 def criar_presencas():
-    matriculas = Matricula.objects.all()
+    matriculas = Matricula.objects.order_by('id').values_list('id', flat=True)
     hoje = timezone.now().date()
+    presencas = []
     
-    for matricula in matriculas:
+    for matricula_id in matriculas:
         # Criar presenças para os últimos 10 dias
         for dias_atras in range(10):
             data_aula = hoje - timedelta(days=dias_atras)
             
             # 80% de chance de estar presente
-            status = 'Presente' if random.random() < 0.8 else 'Ausente'
+            status = 'Presente' if rng.random() < 0.8 else 'Ausente'
             
-            Presenca.objects.get_or_create(
-                matricula=matricula,
-                data=data_aula,
-                defaults={'status': status}
-            )
+            presencas.append(Presenca(matricula_id=matricula_id, data=data_aula, status=status))
+    
+    # Em lote (sem Presenca.save); registros já existentes são mantidos
+    Presenca.objects.bulk_create(presencas, batch_size=1000, ignore_conflicts=True)
+    
+    # Preencher contadores das matrículas e resumos diários
+    Matricula.recalcular_contadores()
+    ResumoDiarioPresenca.recalcular()
     
     print("Registros de presença criados.")
 